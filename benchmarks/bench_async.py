@@ -0,0 +1,189 @@
+"""Sync vs async handler under concurrent load.
+
+Seeds a scratch PostgreSQL database (see pg_seed.py) and sends the same request
+mix (see load_test.py) twice with --concurrency requests in flight:
+
+- sync: user_status.main on --sync-threads threads, the way the Functions host
+  runs a sync handler (PYTHON_THREADPOOL_THREAD_COUNT, 1 by default here)
+- async: user_status_async.main on one event loop
+
+Reports p50/p95/p99 latency and requests per second of each side and stores
+them as JSON. The async side needs psycopg 3 (pip install "psycopg[binary]").
+
+    python benchmarks/bench_async.py --dsn postgresql://localhost/scratch \
+        [--rows 100000] [--requests 5000] [--concurrency 32] [--sync-threads 1] \
+        [--mix get_id=40,list=20,...] [--output benchmarks/results/async.json] [--no-seed]
+
+The database is dropped and recreated unless --no-seed is given: use a throwaway one.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import load_test  # noqa: E402
+import pg_seed  # noqa: E402
+
+
+def sample(operation, response, expected, ms):
+    return {
+        "operation": operation,
+        "ms": ms,
+        "status": response.status_code,
+        "ok": response.status_code in expected,
+        "round_trips": 0,
+    }
+
+
+def summarize(samples, elapsed, operations):
+    def stats(selected):
+        result = load_test.summarize(selected, elapsed)
+        # Round trips are only counted by load_test.py (psycopg2 cursors)
+        result.pop("db_round_trips_per_request")
+        return result
+
+    return {
+        "overall": stats(samples),
+        "operations": {
+            operation: stats([item for item in samples if item["operation"] == operation]) for operation in operations
+        },
+    }
+
+
+def run_sync(main, workload, plan, warmup, threads):
+    def run(operation):
+        req, expected = workload.build(operation)
+        started = time.perf_counter()
+        response = main(req)
+        ms = (time.perf_counter() - started) * 1000
+        if operation == "post" and response.status_code == 201:
+            workload.created(req.get_json()["domain_rhonda_id"])
+        return sample(operation, response, expected, ms)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(run, plan[:warmup]))
+        started = time.perf_counter()
+        samples = list(executor.map(run, plan[warmup:]))
+        return samples, time.perf_counter() - started
+
+
+async def run_async(main, workload, plan, warmup, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run(operation):
+        async with slots:
+            req, expected = workload.build(operation)
+            started = time.perf_counter()
+            response = await main(req)
+            ms = (time.perf_counter() - started) * 1000
+        if operation == "post" and response.status_code == 201:
+            workload.created(req.get_json()["domain_rhonda_id"])
+        return sample(operation, response, expected, ms)
+
+    await asyncio.gather(*[run(operation) for operation in plan[:warmup]])
+    started = time.perf_counter()
+    samples = await asyncio.gather(*[run(operation) for operation in plan[warmup:]])
+    return list(samples), time.perf_counter() - started
+
+
+def reset_posts(connection, count):
+    load_test.seed_post_users(connection, count)
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM user_status WHERE domain_rhonda_id LIKE %s;", (load_test.POST_ID_PREFIX + "%",))
+    connection.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", help="libpq connection string, RP_HOST/RP_DATABASE/... when omitted")
+    parser.add_argument("--rows", type=int, default=100000, help="employees seeded")
+    parser.add_argument("--requests", type=int, default=5000, help="requests sent per handler")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight")
+    parser.add_argument("--sync-threads", type=int, default=1, help="threads running the sync handler")
+    parser.add_argument("--warmup", type=int, default=100, help="requests sent before measuring")
+    parser.add_argument("--mix", default=load_test.DEFAULT_MIX, help="operation=weight list")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the workload")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the database as it is")
+    parser.add_argument("--output", help="JSON results file, benchmarks/results/async-<commit>-<time>.json by default")
+    args = parser.parse_args()
+
+    if args.dsn:
+        load_test.use_dsn(args.dsn)
+    connection = pg_seed.connect(args.dsn)
+    if not args.no_seed:
+        pg_seed.build(connection, args.rows)
+
+    import azure.functions as func
+    import user_status
+    import user_status_async
+    from user_status import async_db_pool, db_pool
+
+    mix = load_test.parse_mix(args.mix)
+    operations = list(mix)
+    plan = random.Random(args.seed).choices(operations, [mix[op] for op in operations], k=args.warmup + args.requests)
+
+    reset_posts(connection, args.requests + args.warmup)
+    workload = load_test.Workload(args.rows, func, args.seed)
+    sync_samples, sync_elapsed = run_sync(user_status.main, workload, plan, args.warmup, args.sync_threads)
+    db_pool.close_pool()
+
+    # Same requests again, the POSTed ids are removed first so they don't conflict
+    reset_posts(connection, args.requests + args.warmup)
+    connection.close()
+    workload = load_test.Workload(args.rows, func, args.seed)
+
+    async def measure_async():
+        try:
+            return await run_async(user_status_async.main, workload, plan, args.warmup, args.concurrency)
+        finally:
+            await async_db_pool.close_pool()
+
+    async_samples, async_elapsed = asyncio.run(measure_async())
+
+    result = {
+        "commit": load_test.git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "rows": args.rows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "sync_threads": args.sync_threads,
+            "warmup": args.warmup,
+            "mix": mix,
+            "seed": args.seed,
+            "pool_max_size": db_pool.POOL_MAX_SIZE,
+            "async_pool_max_size": async_db_pool.ASYNC_POOL_MAX_SIZE,
+        },
+        "sync": {"elapsed_s": sync_elapsed, **summarize(sync_samples, sync_elapsed, operations)},
+        "async": {"elapsed_s": async_elapsed, **summarize(async_samples, async_elapsed, operations)},
+    }
+
+    print(f"{'handler':<8}{'operation':<14}{'requests':>9}{'errors':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for handler in ("sync", "async"):
+        rows = [("overall", result[handler]["overall"])] + list(result[handler]["operations"].items())
+        for name, stats in rows:
+            if not stats["requests"]:
+                continue
+            print(
+                f"{handler:<8}{name:<14}{stats['requests']:>9}{stats['errors']:>8}{stats['rps']:>9.1f}"
+                f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+            )
+
+    output = args.output
+    if output is None:
+        os.makedirs(load_test.RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        output = os.path.join(load_test.RESULTS_DIR, f"async-{result['commit'] or 'nocommit'}-{stamp}.json")
+    with open(output, "w", encoding="utf-8") as output_file:
+        json.dump(result, output_file, indent=2)
+    print(f"results: {output}")
+
+
+if __name__ == "__main__":
+    main()
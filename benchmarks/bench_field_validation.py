@@ -0,0 +1,105 @@
+"""Micro-benchmark for user_status.field_validation.
+
+Compares the previous implementation (new cerberus Validator and schema on
+every call) with the precompiled validators, for valid and invalid bodies.
+
+    python benchmarks/bench_field_validation.py [--number 20000]
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+
+from cerberus import Validator
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from user_status import field_validation  # noqa: E402
+
+
+VALID_POST = {
+    "domain_rhonda_id": "0f8fad5b-d9cb-469f-a165-70867728950e",
+    "status": "Active",
+    "employee_environment": "Internal",
+    "department": "Engineering",
+    "work_type": "Permanent",
+    "manager_id": "7c9e6679-7425-40de-944b-e07fc1f90ae7",
+    "work_location": "Canada",
+    "gender": None,
+    "birth_date": "1990-04-01",
+    "start_date": "2021-09-13",
+    "end_date": None,
+}
+VALID_PUT = {"status": "Terminated", "end_date": "2022-08-31"}
+INVALID_POST = dict(VALID_POST, status="Retired", birth_date="01/04/1990")
+
+
+def legacy_post_field_validation(req_body):
+    """post_field_validation as it was before schemas were compiled at import."""
+    field_vali = Validator()
+    to_date = lambda s: datetime.strptime(s, '%Y-%m-%d')
+    schema = {
+        'domain_rhonda_id': {'required': True, 'type': 'string','empty': False},
+        'status': {'required': True, 'type': 'string','empty': False,'allowed': ['Active', 'Terminated']},
+        'employee_environment': {'required': True, 'type': 'string','empty': False,'allowed': ['Internal', 'External','Other']},
+        'department': {'required': False, 'type': 'string','nullable': True},
+        'work_type': {'required': True, 'type': 'string','empty': False,'allowed': ['Permanent', 'Temporary', 'Contract']},
+        'manager_id': {'required': False, 'type': 'string','nullable': True},
+        'work_location': {'required': False, 'type': 'string','nullable': True,'allowed': ['Canada','USA','EU','NULL']},
+        'gender': {'required': False, 'type': 'string','nullable': True,'allowed': ['Male', 'Female', 'Intersex','NULL']},
+        'birth_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
+        'start_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
+        'end_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
+    }
+    vali_result = field_vali.validate(req_body, schema)
+    return vali_result, field_vali.errors
+
+
+def legacy_put_field_validation(req_body):
+    """put_field_validation as it was before schemas were compiled at import."""
+    field_vali = Validator()
+    to_date = lambda s: datetime.strptime(s, '%Y-%m-%d')
+    schema = {
+        'status': {'required': False, 'type': 'string','empty': False,'allowed': ['Active', 'Terminated']},
+        'employee_environment': {'required': False, 'type': 'string','empty': False,'allowed': ['Internal', 'External','Other']},
+        'department': {'required': False, 'type': 'string','nullable': True},
+        'work_type': {'required': False, 'type': 'string','empty': False,'allowed': ['Permanent', 'Temporary', 'Contract']},
+        'manager_id': {'required': False, 'type': 'string','nullable': True},
+        'work_location': {'required': False, 'type': 'string','nullable': True,'allowed': ['Canada','USA','EU','NULL']},
+        'gender': {'required': False, 'type': 'string','nullable': True,'allowed': ['Male', 'Female', 'Intersex','NULL']},
+        'birth_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
+        'start_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
+        'end_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
+    }
+    vali_result = field_vali.validate(req_body, schema)
+    return vali_result, field_vali.errors
+
+
+CASES = [
+    ("POST valid", legacy_post_field_validation, field_validation.post_field_validation, VALID_POST),
+    ("PUT valid", legacy_put_field_validation, field_validation.put_field_validation, VALID_PUT),
+    ("POST invalid", legacy_post_field_validation, field_validation.post_field_validation, INVALID_POST),
+]
+
+
+def rate(function, body, number):
+    seconds = min(timeit.repeat(lambda: function(body), number=number, repeat=3))
+    return number / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="validations per timing run")
+    args = parser.parse_args()
+
+    print(f"{'case':<14}{'before/s':>14}{'after/s':>14}{'speedup':>10}")
+    for name, before, after, body in CASES:
+        # Same verdict and messages before and after
+        assert before(dict(body)) == after(dict(body)), name
+        before_rate = rate(before, body, max(args.number // 10, 1))
+        after_rate = rate(after, body, args.number)
+        print(f"{name:<14}{before_rate:>14,.0f}{after_rate:>14,.0f}{after_rate / before_rate:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
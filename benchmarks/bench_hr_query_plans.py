@@ -0,0 +1,148 @@
+"""Query-plan regression check for the user-status-hr listing.
+
+Seeds a scratch PostgreSQL database at each size (10k, 100k and 1M rows by
+default), applies migrations/, then runs EXPLAIN (ANALYZE, BUFFERS) on the
+listing queries exactly as user_status_functions builds them. Fails (exit 1)
+when a plan regresses:
+
+- a paging query (no window count) reads user_status with a Seq Scan once the
+  table has at least --min-rows-for-index rows
+- any plan touches user_info again
+
+    python benchmarks/bench_hr_query_plans.py --dsn postgresql://localhost/scratch \
+        [--sizes 10000,100000,1000000] [--output plans.json] [--no-migrations]
+
+The database is dropped and recreated: use a throwaway one.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pg_seed  # noqa: E402
+from user_status import user_status_functions as usf  # noqa: E402
+
+
+PAGE_SIZE = 20
+
+
+def listing_query(status_param, employee_environment_param, include_count=False, after=None):
+    """SQL and parameters of one user-status-hr page, built like the function app builds them."""
+    conditions, params = usf.hr_filters(status_param, employee_environment_param)
+    if after is None:
+        query = usf.projected_query(
+            usf.USER_STATUS_WITH_MANAGER_PAGE,
+            usf.USER_STATUS_WITH_MANAGER_SELECT_LIST,
+            usf.WINDOW_TOTAL_COUNT if include_count else "",
+            usf.where_clause(conditions),
+        )
+        return query, params + (PAGE_SIZE, 0)
+    query = usf.projected_query(
+        usf.USER_STATUS_WITH_MANAGER_AFTER,
+        usf.USER_STATUS_WITH_MANAGER_SELECT_LIST,
+        "",
+        usf.where_clause(conditions + ["us.user_status_id > %s"]),
+    )
+    return query, params + (after, PAGE_SIZE + 1)
+
+
+def count_query(status_param, employee_environment_param):
+    conditions, params = usf.hr_filters(status_param, employee_environment_param)
+    return usf.COUNT_USER_STATUS_WITH_MANAGER_ROWS.format(where=usf.where_clause(conditions)), params
+
+
+def cases(rows):
+    """(name, query, params, paging) for every plan that is checked."""
+    middle = rows // 2
+    return [
+        ("page, no filter", *listing_query(None, None), True),
+        ("page, status", *listing_query("Terminated", None), True),
+        ("page, status+environment", *listing_query("Terminated", "Other"), True),
+        ("page, environment", *listing_query(None, "Other"), True),
+        ("keyset, status+environment", *listing_query("Terminated", "Other", after=middle), True),
+        ("page+count, status+environment", *listing_query("Terminated", "Other", include_count=True), False),
+        ("count, status+environment", *count_query("Terminated", "Other"), False),
+    ]
+
+
+def walk(plan):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from walk(child)
+
+
+def explain(cursor, query, params):
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+    result = cursor.fetchone()[0]
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]
+
+
+def regressions(plan, rows, paging, min_rows_for_index):
+    found = []
+    for node in walk(plan["Plan"]):
+        relation = node.get("Relation Name")
+        if relation == "user_info":
+            found.append("joins user_info")
+        if paging and rows >= min_rows_for_index and node["Node Type"] == "Seq Scan" and relation == "user_status":
+            found.append("Seq Scan on user_status")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", help="libpq connection string, RP_HOST/RP_DATABASE/... when omitted")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma separated row counts")
+    parser.add_argument("--min-rows-for-index", type=int, default=100000, help="smallest table that must use indexes")
+    parser.add_argument("--no-migrations", action="store_true", help="seed without migrations/ (baseline plans)")
+    parser.add_argument("--output", help="write the plans and timings as JSON to this file")
+    args = parser.parse_args()
+
+    connection = pg_seed.connect(args.dsn)
+    report = []
+    failed = False
+    print(f"{'rows':>9}  {'case':<32}{'ms':>10}{'buffers':>10}  plan")
+    for rows in [int(size) for size in args.sizes.split(",")]:
+        pg_seed.build(connection, rows, migrations=not args.no_migrations)
+        with connection.cursor() as cursor:
+            for name, query, params, paging in cases(rows):
+                plan = explain(cursor, query, params)
+                connection.rollback()
+                problems = regressions(plan, rows, paging, args.min_rows_for_index)
+                failed = failed or bool(problems)
+                top = plan["Plan"]
+                buffers = top.get("Shared Hit Blocks", 0) + top.get("Shared Read Blocks", 0)
+                scans = sorted(
+                    {
+                        f"{node['Node Type']}({node.get('Index Name') or node['Relation Name']})"
+                        for node in walk(top)
+                        if "Relation Name" in node
+                    }
+                )
+                print(
+                    f"{rows:>9}  {name:<32}{plan['Execution Time']:>10.2f}{buffers:>10}  "
+                    f"{', '.join(scans)}{'  <-- ' + '; '.join(problems) if problems else ''}"
+                )
+                report.append(
+                    {
+                        "rows": rows,
+                        "case": name,
+                        "execution_ms": plan["Execution Time"],
+                        "planning_ms": plan["Planning Time"],
+                        "buffers": buffers,
+                        "regressions": problems,
+                        "plan": plan,
+                    }
+                )
+    connection.close()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
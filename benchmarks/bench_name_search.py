@@ -0,0 +1,133 @@
+"""Name search (?q=) on the user-status-hr listing, with and without the trigram index.
+
+Seeds a scratch PostgreSQL database at each size (100k and 1M rows by default),
+applies migrations/, then runs EXPLAIN (ANALYZE, BUFFERS) on the searched listing
+queries exactly as user_status_functions builds them: page, page with the status /
+environment filters, keyset page and count. Every case runs --repeat times with
+migrations/0005's user_name_trgm_idx and again after dropping it (the baseline scan
+of public."user"), and the median execution times are compared. Fails (exit 1) when,
+with the index, a search reads public."user" with a Seq Scan once the table has at
+least --min-rows-for-index rows.
+
+    python benchmarks/bench_name_search.py --dsn postgresql://localhost/scratch \
+        [--sizes 100000,1000000] [--repeat 5] [--output search.json]
+
+The database is dropped and recreated: use a throwaway one.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pg_seed  # noqa: E402
+from bench_hr_query_plans import explain, walk  # noqa: E402
+from user_status import user_status_functions as usf  # noqa: E402
+
+
+PAGE_SIZE = 20
+
+
+def search_query(search_param, status_param=None, employee_environment_param=None, after=None, count=False):
+    """SQL and parameters of one searched user-status-hr page (or its count), built like the function app."""
+    conditions, params = usf.hr_filters(status_param, employee_environment_param, search_param)
+    if count:
+        return usf.COUNT_USER_STATUS_WITH_MANAGER_ROWS.format(where=usf.where_clause(conditions)), params
+    if after is None:
+        query = usf.projected_query(
+            usf.USER_STATUS_WITH_MANAGER_PAGE,
+            usf.USER_STATUS_WITH_MANAGER_SELECT_LIST,
+            "",
+            usf.where_clause(conditions),
+        )
+        return query, params + (PAGE_SIZE, 0)
+    query = usf.projected_query(
+        usf.USER_STATUS_WITH_MANAGER_AFTER,
+        usf.USER_STATUS_WITH_MANAGER_SELECT_LIST,
+        "",
+        usf.where_clause(conditions + ["us.user_status_id > %s"]),
+    )
+    return query, params + (after, PAGE_SIZE + 1)
+
+
+def cases(rows):
+    """(name, query, params) for every searched query that is timed. Seeded names are First<n> Last<n>."""
+    term = f"Last{rows // 3}"
+    return [
+        ("page, name", *search_query(term)),
+        ("page, prefix", *search_query(f"first{rows // 30}")),
+        ("page, name+status+environment", *search_query(term, "Active", "Internal")),
+        ("keyset, name", *search_query(term, after=0)),
+        ("count, name", *search_query(term, count=True)),
+        ("page, no match", *search_query("Nobody Here")),
+    ]
+
+
+def run(connection, rows, repeat):
+    """Median execution ms, buffers and scans of every case."""
+    results = {}
+    with connection.cursor() as cursor:
+        for name, query, params in cases(rows):
+            plans = [explain(cursor, query, params) for _ in range(repeat)]
+            connection.rollback()
+            top = plans[-1]["Plan"]
+            results[name] = {
+                "execution_ms": statistics.median(plan["Execution Time"] for plan in plans),
+                "buffers": top.get("Shared Hit Blocks", 0) + top.get("Shared Read Blocks", 0),
+                "scans": sorted(
+                    {
+                        f"{node['Node Type']}({node.get('Index Name') or node['Relation Name']})"
+                        for node in walk(top)
+                        if "Relation Name" in node
+                    }
+                ),
+                "user_seq_scan": any(
+                    node["Node Type"] == "Seq Scan" and node.get("Relation Name") == "user" for node in walk(top)
+                ),
+                "plan": plans[-1],
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", help="libpq connection string, RP_HOST/RP_DATABASE/... when omitted")
+    parser.add_argument("--sizes", default="100000,1000000", help="comma separated row counts")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case, the median is reported")
+    parser.add_argument("--min-rows-for-index", type=int, default=100000, help="smallest table that must use the index")
+    parser.add_argument("--output", help="write the plans and timings as JSON to this file")
+    args = parser.parse_args()
+
+    connection = pg_seed.connect(args.dsn)
+    report = []
+    failed = False
+    print(f"{'rows':>9}  {'case':<32}{'trgm ms':>10}{'scan ms':>10}{'speedup':>9}  plan")
+    for rows in [int(size) for size in args.sizes.split(",")]:
+        pg_seed.build(connection, rows)
+        indexed = run(connection, rows, args.repeat)
+        with connection.cursor() as cursor:
+            cursor.execute("DROP INDEX user_name_trgm_idx;")
+        connection.commit()
+        baseline = run(connection, rows, args.repeat)
+
+        for name, result in indexed.items():
+            scan = baseline[name]
+            regressed = result["user_seq_scan"] and rows >= args.min_rows_for_index
+            failed = failed or regressed
+            speedup = scan["execution_ms"] / result["execution_ms"] if result["execution_ms"] else float("inf")
+            print(
+                f"{rows:>9}  {name:<32}{result['execution_ms']:>10.2f}{scan['execution_ms']:>10.2f}{speedup:>8.1f}x  "
+                f"{', '.join(result['scans'])}{'  <-- Seq Scan on user' if regressed else ''}"
+            )
+            report.append({"rows": rows, "case": name, "trgm": result, "scan": scan, "regressed": regressed})
+    connection.close()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Prepared vs plain statements on the user-id lookup and the insert path.
+
+Seeds a scratch PostgreSQL database (see pg_seed.py), then calls
+get_user_status_by_domain_rhonda_id and add_user_status (plus the matching
+delete_user_status) --iterations times each, once with prepared.registry off
+(parse + plan on every call) and once on (PREPARE once, EXECUTE afterwards).
+The lookup cache is switched off so every lookup reaches PostgreSQL.
+
+    python benchmarks/bench_prepared.py --dsn postgresql://localhost/scratch \
+        [--rows 100000] [--iterations 5000] [--output prepared.json] [--no-seed]
+
+The database is dropped and recreated unless --no-seed is given: use a throwaway one.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import load_test  # noqa: E402
+import pg_seed  # noqa: E402
+
+
+def timed(call, *args):
+    started = time.perf_counter()
+    result = call(*args)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def stats(latencies):
+    latencies = sorted(latencies)
+    return {
+        "calls": len(latencies),
+        "mean_ms": sum(latencies) / len(latencies),
+        "p50_ms": load_test.percentile(latencies, 0.50),
+        "p95_ms": load_test.percentile(latencies, 0.95),
+        "p99_ms": load_test.percentile(latencies, 0.99),
+    }
+
+
+def run(usf, rows, iterations, seed):
+    """Latencies (ms) of each operation over iterations calls."""
+    rng = random.Random(seed)
+    lookup, insert, delete = [], [], []
+    for index in range(1, iterations + 1):
+        ms, result = timed(usf.get_user_status_by_domain_rhonda_id, f"u{rng.randint(1, rows)}")
+        if not result or not isinstance(result, dict):
+            raise RuntimeError(f"lookup failed: {result}")
+        lookup.append(ms)
+
+        domain_rhonda_id = f"{load_test.POST_ID_PREFIX}{index}"
+        ms, result = timed(
+            usf.add_user_status,
+            domain_rhonda_id, "Active", "Internal", "Bench", "Permanent", None, "USA", None, None, "2022-01-03", None,
+        )
+        if not isinstance(result, str):
+            raise RuntimeError(f"insert failed: {result}")
+        insert.append(ms)
+
+        ms, result = timed(usf.delete_user_status, domain_rhonda_id)
+        if result != domain_rhonda_id:
+            raise RuntimeError(f"delete failed: {result}")
+        delete.append(ms)
+    return {"lookup": stats(lookup), "insert": stats(insert), "delete": stats(delete)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", help="libpq connection string, RP_HOST/RP_DATABASE/... when omitted")
+    parser.add_argument("--rows", type=int, default=100000, help="employees seeded")
+    parser.add_argument("--iterations", type=int, default=5000, help="calls of each operation per mode")
+    parser.add_argument("--warmup", type=int, default=200, help="calls per mode before measuring")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the looked up ids")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the database as it is")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.dsn:
+        load_test.use_dsn(args.dsn)
+    os.environ["RP_USER_CACHE_SIZE"] = "0"
+    connection = pg_seed.connect(args.dsn)
+    if not args.no_seed:
+        pg_seed.build(connection, args.rows)
+    load_test.seed_post_users(connection, args.iterations + args.warmup)
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM user_status WHERE domain_rhonda_id LIKE %s;", (load_test.POST_ID_PREFIX + "%",))
+    connection.commit()
+    connection.close()
+
+    from user_status import db_pool, prepared
+    from user_status import user_status_functions as usf
+
+    result = {"commit": load_test.git_commit(), "rows": args.rows, "iterations": args.iterations}
+    for mode, enabled in (("plain", False), ("prepared", True)):
+        prepared.registry.enabled = enabled
+        # Fresh connections, so statements prepared by the other mode don't carry over
+        db_pool.close_pool()
+        run(usf, args.rows, args.warmup, args.seed + 1)
+        result[mode] = run(usf, args.rows, args.iterations, args.seed)
+    db_pool.close_pool()
+
+    print(f"{'operation':<10}{'plain p50':>11}{'prepared p50':>14}{'plain mean':>12}{'prepared mean':>15}{'saved':>9}")
+    for operation in ("lookup", "insert", "delete"):
+        plain, fast = result["plain"][operation], result["prepared"][operation]
+        saved = (plain["mean_ms"] - fast["mean_ms"]) / plain["mean_ms"] * 100
+        print(
+            f"{operation:<10}{plain['p50_ms']:>11.3f}{fast['p50_ms']:>14.3f}"
+            f"{plain['mean_ms']:>12.3f}{fast['mean_ms']:>15.3f}{saved:>8.1f}%"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(result, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Time from a committed write to its eviction from the user-id cache (RP_CACHE_NOTIFY).
+
+Seeds a scratch PostgreSQL database with the migrations applied (see pg_seed.py),
+starts the change listener, then --iterations times: caches one employee through
+get_user_status_by_domain_rhonda_id, updates its department with plain SQL on a
+separate connection (as another instance or a batch job would), and waits until the
+cached row is gone and a new lookup returns the new department.
+
+    python benchmarks/check_cache_notify.py --dsn postgresql://localhost/scratch \
+        [--rows 10000] [--iterations 200] [--output notify.json] [--no-seed]
+
+Exits with status 1 when a write isn't seen within --timeout seconds.
+The database is dropped and recreated unless --no-seed is given: use a throwaway one.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import load_test  # noqa: E402
+import pg_seed  # noqa: E402
+
+
+def wait_for(condition, timeout):
+    """Poll condition every millisecond; seconds taken, None on timeout."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if condition():
+            return time.perf_counter() - started
+        time.sleep(0.001)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", help="libpq connection string, RP_HOST/RP_DATABASE/... when omitted")
+    parser.add_argument("--rows", type=int, default=10000, help="employees seeded")
+    parser.add_argument("--iterations", type=int, default=200, help="writes checked")
+    parser.add_argument("--timeout", type=float, default=5, help="seconds to wait for one eviction")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the updated ids")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the database as it is")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.dsn:
+        load_test.use_dsn(args.dsn)
+    os.environ["RP_CACHE_NOTIFY"] = "true"
+    os.environ["RP_USER_CACHE_TTL"] = "3600"
+    writer = pg_seed.connect(args.dsn)
+    if not args.no_seed:
+        pg_seed.build(writer, args.rows)
+
+    from user_status import user_status_functions as usf
+
+    usf.change_listener.ensure_started()
+    if wait_for(lambda: usf.change_listener.connected, args.timeout) is None:
+        sys.exit("listener did not connect")
+
+    rng = random.Random(args.seed)
+    latencies = []
+    for index in range(args.iterations):
+        domain_rhonda_id = f"u{rng.randint(1, args.rows)}"
+        department = f"Notify {index}"
+        usf.get_user_status_by_domain_rhonda_id(domain_rhonda_id)
+        if usf.user_status_cache.local.get(domain_rhonda_id) is None:
+            sys.exit(f"{domain_rhonda_id} was not cached")
+
+        with writer.cursor() as cursor:
+            cursor.execute(
+                "UPDATE user_status SET department = %s WHERE domain_rhonda_id = %s;", (department, domain_rhonda_id)
+            )
+        writer.commit()
+        seconds = wait_for(lambda: usf.user_status_cache.local.get(domain_rhonda_id) is None, args.timeout)
+        if seconds is None:
+            print(f"{domain_rhonda_id}: still cached after {args.timeout} seconds", file=sys.stderr)
+            sys.exit(1)
+        result = usf.get_user_status_by_domain_rhonda_id(domain_rhonda_id)
+        if result["department"] != department:
+            print(f"{domain_rhonda_id}: read {result['department']!r} after eviction", file=sys.stderr)
+            sys.exit(1)
+        latencies.append(seconds * 1000)
+    usf.change_listener.stop()
+    writer.close()
+
+    latencies.sort()
+    result = {
+        "commit": load_test.git_commit(),
+        "iterations": args.iterations,
+        "p50_ms": load_test.percentile(latencies, 0.50),
+        "p95_ms": load_test.percentile(latencies, 0.95),
+        "max_ms": latencies[-1],
+        "listener": usf.change_listener.stats(),
+    }
+    print(
+        f"{args.iterations} writes evicted: p50 {result['p50_ms']:.2f} ms, "
+        f"p95 {result['p95_ms']:.2f} ms, max {result['max_ms']:.2f} ms"
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(result, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Import-time (cold start) profile of the function app.
+
+Imports --module in a fresh interpreter with python -X importtime, --runs times,
+and reports the median self and cumulative import time of the costliest
+modules plus the total. Exits 1 when the median total exceeds --max-ms, so
+cold-start cost can be tracked and gated like any other benchmark.
+
+    python benchmarks/import_time.py [--module user_status] [--runs 5] [--top 20] \
+        [--max-ms 400] [--output benchmarks/results/import.json]
+
+Nothing connects to PostgreSQL: the connection is only made on first use.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# "import time:       self [us] |  cumulative | imported package"
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def profile(module):
+    """One cold import of module.
+
+    Returns:
+        [dict]: module -> (self ms, cumulative ms, nesting level)
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us) / 1000, int(cumulative_us) / 1000, len(indent) // 2)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="user_status", help="module imported by the Functions host")
+    parser.add_argument("--runs", type=int, default=5, help="cold imports, the median is reported")
+    parser.add_argument("--top", type=int, default=20, help="modules listed, by cumulative time")
+    parser.add_argument("--max-ms", type=float, help="fail when the median total import time exceeds this")
+    parser.add_argument("--output", help="write the per-module medians as JSON to this file")
+    args = parser.parse_args()
+
+    runs = [profile(args.module) for _ in range(args.runs)]
+    names = set().union(*runs)
+    medians = {
+        name: {
+            "self_ms": statistics.median(run[name][0] for run in runs if name in run),
+            "cumulative_ms": statistics.median(run[name][1] for run in runs if name in run),
+            "level": runs[0].get(name, (0, 0, 0))[2],
+        }
+        for name in names
+    }
+    total_ms = medians[args.module]["cumulative_ms"]
+
+    print(f"{'module':<48}{'self ms':>10}{'cumul. ms':>11}")
+    ranked = sorted(medians.items(), key=lambda item: item[1]["cumulative_ms"], reverse=True)
+    for name, stats in ranked[: args.top]:
+        print(f"{name:<48}{stats['self_ms']:>10.2f}{stats['cumulative_ms']:>11.2f}")
+    print(f"total import of {args.module}: {total_ms:.2f} ms (median of {args.runs})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump({"module": args.module, "runs": args.runs, "total_ms": total_ms, "modules": medians}, output, indent=2)
+    sys.exit(1 if args.max_ms is not None and total_ms > args.max_ms else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""Load test for the user_status function: main() driven with built HttpRequests.
+
+Seeds a scratch PostgreSQL database (see pg_seed.py) and runs a weighted mix of
+GET/POST/PUT/DELETE requests through user_status.main from --concurrency
+threads. Reports p50/p95/p99 latency, requests per second and database round
+trips per request, overall and per operation, and stores them as JSON so runs
+on different commits can be compared.
+
+    python benchmarks/load_test.py --dsn postgresql://localhost/scratch \
+        [--rows 100000] [--requests 5000] [--concurrency 8] \
+        [--mix get_id=40,list=20,list_keyset=10,list_hr=10,post=8,put=8,delete=4] \
+        [--output benchmarks/results/load.json] [--no-seed]
+
+The database is dropped and recreated unless --no-seed is given: use a throwaway one.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import psycopg2
+import psycopg2.extensions
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pg_seed  # noqa: E402
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_MIX = "get_id=40,list=20,list_keyset=10,list_hr=10,post=8,put=8,delete=4"
+POST_ID_PREFIX = "load"
+
+_round_trips = threading.local()
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """Cursor that counts execute calls of the current thread (one per round trip)."""
+
+    def execute(self, query, vars=None):
+        _round_trips.count = getattr(_round_trips, "count", 0) + 1
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        _round_trips.count = getattr(_round_trips, "count", 0) + 1
+        return super().executemany(query, vars_list)
+
+
+def use_dsn(dsn):
+    """Point the function app's RP_* settings (and PGPORT) at dsn."""
+    params = psycopg2.extensions.parse_dsn(dsn)
+    os.environ["RP_HOST"] = params.get("host", "localhost")
+    os.environ["RP_DATABASE"] = params.get("dbname", "")
+    os.environ["RP_USERNAME"] = params.get("user", "")
+    os.environ["RP_PASSWORD"] = params.get("password", "")
+    if "port" in params:
+        os.environ["PGPORT"] = params["port"]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(sample["ms"] for sample in samples)
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for sample in samples if not sample["ok"]),
+        "rps": len(samples) / elapsed if elapsed else None,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": latencies[-1] if latencies else None,
+        "db_round_trips_per_request": sum(sample["round_trips"] for sample in samples) / len(samples)
+        if samples
+        else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=pg_seed.ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Workload:
+    """Builds the requests of each operation against the seeded ids."""
+
+    def __init__(self, rows, func, seed):
+        self.rows = rows
+        self.func = func
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.next_post = 0
+        self.posted = []
+
+    def _existing_id(self):
+        return f"u{self.random.randint(1, self.rows)}"
+
+    def request(self, method, route, params=None, body=None):
+        return self.func.HttpRequest(
+            method=method,
+            url=f"http://localhost/api/user-status/{'/'.join(route.values())}",
+            params=params or {},
+            route_params=route,
+            body=json.dumps(body).encode("utf-8") if body is not None else b"",
+            headers={"Content-Type": "application/json"},
+        )
+
+    def build(self, operation):
+        """(HttpRequest, expected status codes) for one operation."""
+        with self.lock:
+            if operation == "get_id":
+                return self.request("GET", {"url_prefix": "user-id", "domain_rhonda_id": self._existing_id()}), {200}
+            if operation == "list":
+                max_page = max(self.rows // 20, 1)
+                params = {"page_size": "20", "page": str(self.random.randint(1, min(max_page, 50)))}
+                return self.request("GET", {}, params), {200}
+            if operation == "list_keyset":
+                return self.request("GET", {}, {"page_size": "20", "cursor": ""}), {200}
+            if operation == "list_hr":
+                params = {"status": "Active", "environment": self.random.choice(["Internal", "External", "Other"])}
+                return self.request("GET", {"url_prefix": "user-status-hr"}, params), {200}
+            if operation == "post":
+                self.next_post += 1
+                domain_rhonda_id = f"{POST_ID_PREFIX}{self.next_post}"
+                body = {
+                    "domain_rhonda_id": domain_rhonda_id,
+                    "status": "Active",
+                    "employee_environment": "Internal",
+                    "work_type": "Permanent",
+                    "manager_id": self._existing_id(),
+                    "start_date": "2022-01-03",
+                }
+                return self.request("POST", {}, body=body), {201}
+            if operation == "put":
+                body = {"status": self.random.choice(["Active", "Terminated"]), "department": "Load"}
+                route = {"url_prefix": "user-id", "domain_rhonda_id": self._existing_id()}
+                return self.request("PUT", route, body=body), {200}
+            if operation == "delete":
+                if self.posted:
+                    domain_rhonda_id = self.posted.pop(self.random.randrange(len(self.posted)))
+                    return self.request("DELETE", {"url_prefix": "user-id", "domain_rhonda_id": domain_rhonda_id}), {204}
+                # Nothing of ours to delete yet: a missing id still exercises the path
+                return self.request("DELETE", {"url_prefix": "user-id", "domain_rhonda_id": "missing"}), {404}
+        raise ValueError(f"Unknown operation {operation}")
+
+    def created(self, domain_rhonda_id):
+        """Record a committed POST so a later DELETE can remove it."""
+        with self.lock:
+            self.posted.append(domain_rhonda_id)
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(","):
+        operation, _, weight = item.partition("=")
+        mix[operation.strip()] = float(weight)
+    return mix
+
+
+def seed_post_users(connection, count):
+    """public."user" rows the POST operations can reference (user_status has a FK on it)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """INSERT INTO public."user" (domain_rhonda_id, first_name, last_name)
+SELECT %s || g, 'Load', 'Test' || g FROM generate_series(1, %s) AS g
+ON CONFLICT (domain_rhonda_id) DO NOTHING;""",
+            (POST_ID_PREFIX, count),
+        )
+    connection.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", help="libpq connection string, RP_HOST/RP_DATABASE/... when omitted")
+    parser.add_argument("--rows", type=int, default=100000, help="employees seeded")
+    parser.add_argument("--requests", type=int, default=5000, help="requests sent")
+    parser.add_argument("--concurrency", type=int, default=8, help="threads calling main()")
+    parser.add_argument("--warmup", type=int, default=100, help="requests sent before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation=weight list")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the workload")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the database as it is")
+    parser.add_argument("--output", help="JSON results file, benchmarks/results/load-<commit>-<time>.json by default")
+    args = parser.parse_args()
+
+    if args.dsn:
+        use_dsn(args.dsn)
+    connection = pg_seed.connect(args.dsn)
+    if not args.no_seed:
+        pg_seed.build(connection, args.rows)
+    seed_post_users(connection, args.requests + args.warmup)
+    with connection.cursor() as cursor:
+        # Rows posted by an earlier run would turn this run's POSTs into conflicts
+        cursor.execute("DELETE FROM user_status WHERE domain_rhonda_id LIKE %s;", (POST_ID_PREFIX + "%",))
+    connection.commit()
+    connection.close()
+
+    # The function app connects lazily, so the counting cursor is in place before its first connection
+    from user_status import db_pool
+    import azure.functions as func
+    import user_status
+
+    connection_params = db_pool.connection_params
+    db_pool.connection_params = lambda: {**connection_params(), "cursor_factory": CountingCursor}
+
+    mix = parse_mix(args.mix)
+    operations = list(mix)
+    weights = [mix[operation] for operation in operations]
+    workload = Workload(args.rows, func, args.seed)
+    plan = random.Random(args.seed).choices(operations, weights, k=args.warmup + args.requests)
+
+    def run(operation):
+        req, expected = workload.build(operation)
+        _round_trips.count = 0
+        started = time.perf_counter()
+        response = user_status.main(req)
+        ms = (time.perf_counter() - started) * 1000
+        if operation == "post" and response.status_code == 201:
+            workload.created(req.get_json()["domain_rhonda_id"])
+        return {
+            "operation": operation,
+            "ms": ms,
+            "status": response.status_code,
+            "ok": response.status_code in expected,
+            "round_trips": _round_trips.count,
+        }
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(run, plan[: args.warmup]))
+        started = time.perf_counter()
+        samples = list(executor.map(run, plan[args.warmup :]))
+        elapsed = time.perf_counter() - started
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "rows": args.rows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "mix": mix,
+            "seed": args.seed,
+            "pool_max_size": db_pool.POOL_MAX_SIZE,
+        },
+        "elapsed_s": elapsed,
+        "overall": summarize(samples, elapsed),
+        "operations": {
+            operation: summarize([sample for sample in samples if sample["operation"] == operation], elapsed)
+            for operation in operations
+        },
+    }
+
+    print(f"{'operation':<14}{'requests':>9}{'errors':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'db/req':>8}")
+    for name, stats in [("overall", result["overall"])] + list(result["operations"].items()):
+        if not stats["requests"]:
+            continue
+        print(
+            f"{name:<14}{stats['requests']:>9}{stats['errors']:>8}{stats['rps']:>9.1f}"
+            f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+            f"{stats['db_round_trips_per_request']:>8.2f}"
+        )
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"load-{result['commit'] or 'nocommit'}-{stamp}.json")
+    with open(output, "w", encoding="utf-8") as output_file:
+        json.dump(result, output_file, indent=2)
+    print(f"results: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Build and seed a scratch PostgreSQL database for the benchmarks.
+
+The user_status table, its functions and triggers are taken from
+user_status/user_status_db_table.txt, the migrations from migrations/*.sql.
+public."user" is not part of that file, so a minimal one (names only) is created.
+
+Everything is dropped and recreated: point it at a throwaway database only.
+"""
+import glob
+import os
+import re
+import sys
+
+import psycopg2
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SCHEMA_PATH = os.path.join(ROOT, "user_status", "user_status_db_table.txt")
+MIGRATIONS_DIR = os.path.join(ROOT, "migrations")
+
+sys.path.insert(0, ROOT)
+from user_status import db_pool  # noqa: E402
+
+
+CREATE_USER_TABLE = """CREATE TABLE public."user"(
+	user_id serial PRIMARY KEY,
+	domain_rhonda_id text UNIQUE NOT NULL,
+	first_name text NULL,
+	last_name text NULL
+);"""
+
+# Synthetic people: ~85% Active, 60/30/10 Internal/External/Other, managers fan out by 8
+SEED_USERS = """INSERT INTO public."user" (domain_rhonda_id, first_name, last_name)
+SELECT 'u' || g, 'First' || g, 'Last' || g
+FROM generate_series(1, %(rows)s) AS g;"""
+SEED_USER_STATUS = """INSERT INTO user_status (domain_rhonda_id, status, employee_environment, department, work_type,
+manager_id, work_location, gender, birth_date, start_date, end_date)
+SELECT
+'u' || g,
+CASE WHEN random() < 0.85 THEN 'Active' ELSE 'Terminated' END,
+CASE WHEN r < 0.6 THEN 'Internal' WHEN r < 0.9 THEN 'External' ELSE 'Other' END,
+'Department ' || (g %% 40),
+(ARRAY['Permanent', 'Temporary', 'Contract'])[1 + g %% 3],
+CASE WHEN g > 8 THEN 'u' || (g / 8) END,
+(ARRAY['Canada', 'USA', 'EU'])[1 + g %% 3],
+CASE WHEN g %% 5 = 0 THEN NULL ELSE (ARRAY['Male', 'Female', 'Intersex'])[1 + g %% 3] END,
+DATE '1960-01-01' + (g %% 15000),
+DATE '2000-01-01' + (g %% 8000),
+NULL
+FROM (SELECT g, random() AS r FROM generate_series(1, %(rows)s) AS g) AS s;"""
+
+
+def connect(dsn=None):
+    """Connect with a libpq DSN, or with the RP_* settings the function app uses."""
+    if dsn:
+        return psycopg2.connect(dsn)
+    return psycopg2.connect(**db_pool.connection_params())
+
+
+def split_statements(sql):
+    """Split a SQL script on statement-ending semicolons, leaving $$ bodies intact."""
+    statements = []
+    current = []
+    in_body = False
+    for part in re.split(r"(\$\$|;)", sql):
+        if part == "$$":
+            in_body = not in_body
+        if part == ";" and not in_body:
+            statement = "".join(current).strip()
+            if statement and not all(line.strip().startswith("--") or not line.strip() for line in statement.splitlines()):
+                statements.append(statement + ";")
+            current = []
+            continue
+        current.append(part)
+    statement = "".join(current).strip()
+    if statement and not all(line.strip().startswith("--") or not line.strip() for line in statement.splitlines()):
+        statements.append(statement)
+    return statements
+
+
+def schema_statements(path=SCHEMA_PATH):
+    """user_status DDL from the schema file: table, user.status column, functions and triggers.
+
+    The file is a notes-style script (function bodies without a closing semicolon,
+    extensions on other tables), so only the parts the benchmarks need are picked out.
+    """
+    with open(path, encoding="utf-8") as schema_file:
+        text = schema_file.read()
+    statements = re.findall(r'CREATE TABLE IF NOT EXISTS public\."user_status"\(.*?\n\);', text, re.S)
+    statements += re.findall(r'ALTER TABLE public\."user"\s+ADD COLUMN status[^;]*;', text)
+    statements += re.findall(r"create or replace function.*?\$\$.*?\$\$", text, re.S | re.I)
+    statements += re.findall(r"create trigger.*?;", text, re.S | re.I)
+    return statements
+
+
+def create_schema(connection):
+    """Drop and recreate public."user" and user_status."""
+    with connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS user_status, user_status_tombstone, user_status_stats, idempotency_key, public."user", schema_migrations CASCADE;')
+        cursor.execute(CREATE_USER_TABLE)
+        for statement in schema_statements():
+            cursor.execute(statement)
+    connection.commit()
+
+
+def apply_migrations(connection, until=None):
+    """Run migrations/*.sql in version order, statement by statement in autocommit
+    (CREATE INDEX CONCURRENTLY can't run inside a transaction).
+
+    Args:
+        connection ([connection]): psycopg2 connection
+        until ([str]): last version to apply (e.g. "0001"), all when None
+    """
+    autocommit = connection.autocommit
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql"))):
+                version = os.path.basename(path).split("_", 1)[0]
+                if until is not None and version > until:
+                    break
+                with open(path, encoding="utf-8") as migration:
+                    for statement in split_statements(migration.read()):
+                        cursor.execute(statement)
+    finally:
+        connection.autocommit = autocommit
+
+
+def seed(connection, rows):
+    """Fill public."user" and user_status with rows synthetic employees and ANALYZE them.
+    The per-row status triggers are switched off during the load.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(SEED_USERS, {"rows": rows})
+        cursor.execute("ALTER TABLE user_status DISABLE TRIGGER USER;")
+        cursor.execute(SEED_USER_STATUS, {"rows": rows})
+        cursor.execute("ALTER TABLE user_status ENABLE TRIGGER USER;")
+    connection.commit()
+    autocommit = connection.autocommit
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE public."user";')
+            cursor.execute("ANALYZE user_status;")
+    finally:
+        connection.autocommit = autocommit
+
+
+def build(connection, rows, migrations=True):
+    """Fresh schema, seeded with rows employees, with the migrations applied."""
+    create_schema(connection)
+    seed(connection, rows)
+    if migrations:
+        apply_migrations(connection)
@@ -0,0 +1,27 @@
+-- 0001: indexes for the user-status-hr listing and the org chart.
+--
+-- The listing filters on status / employee_environment with equality and pages on
+-- user_status_id, and joins managers on manager_id. CONCURRENTLY keeps the table
+-- writable while the indexes build, so run this file outside a transaction
+-- (psql -f runs every statement on its own).
+
+CREATE TABLE IF NOT EXISTS schema_migrations(
+	version text PRIMARY KEY,
+	applied_at timestamp not null default (now() at time zone 'utc')
+);
+
+-- status (+ employee_environment) filters, rows come back in user_status_id order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS user_status_status_environment_id_idx
+	ON user_status (status, employee_environment, user_status_id);
+
+-- employee_environment without status can't use the index above
+CREATE INDEX CONCURRENTLY IF NOT EXISTS user_status_environment_id_idx
+	ON user_status (employee_environment, user_status_id);
+
+-- manager joins and the recursive reports walk (WHERE manager_id = ...)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS user_status_manager_id_idx
+	ON user_status (manager_id);
+
+ANALYZE user_status;
+
+INSERT INTO schema_migrations (version) VALUES ('0001') ON CONFLICT (version) DO NOTHING;
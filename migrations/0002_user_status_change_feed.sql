@@ -0,0 +1,89 @@
+-- 0002: change feed for GET user-status/changes?since=<watermark>.
+--
+-- Inserted and updated rows are found by updated_at, deleted ones through
+-- user_status_tombstone, filled by a trigger. A row inserted again after a delete
+-- drops its tombstone, so every domain_rhonda_id is in at most one of the two.
+-- Like 0001, run this file outside a transaction (CREATE INDEX CONCURRENTLY).
+--
+-- Tombstones older than the oldest watermark any consumer still holds can be pruned:
+--   DELETE FROM user_status_tombstone WHERE deleted_at < now() at time zone 'utc' - interval '30 days';
+
+CREATE TABLE IF NOT EXISTS user_status_tombstone(
+	domain_rhonda_id text PRIMARY KEY,
+	user_status_id integer NOT NULL,
+	deleted_at timestamp not null default (now() at time zone 'utc')
+);
+
+comment on table user_status_tombstone is 'One row per deleted user_status row, filled by the status_delete trigger.
+Read by the change feed (user-status/changes) so downstream systems see deletions.';
+
+CREATE INDEX IF NOT EXISTS user_status_tombstone_deleted_at_idx
+	ON user_status_tombstone (deleted_at, domain_rhonda_id);
+
+
+-- Inserts stamp updated_at in UTC (column default) but updates used now() in the
+-- session time zone: one clock for both, the watermark compares them
+create or replace function updated_at()
+returns trigger
+language plpgsql
+as
+$$
+begin
+	new.updated_at = now() at time zone 'utc';
+
+	return new;
+end;
+$$;
+
+
+create or replace function user_status_tombstone_insert()
+returns trigger
+language plpgsql
+as
+$$
+begin
+	insert into user_status_tombstone (domain_rhonda_id, user_status_id)
+	values (old.domain_rhonda_id, old.user_status_id)
+	on conflict (domain_rhonda_id) do update
+	set user_status_id = excluded.user_status_id,
+	deleted_at = excluded.deleted_at;
+
+	return old;
+end;
+$$;
+
+create or replace function user_status_tombstone_delete()
+returns trigger
+language plpgsql
+as
+$$
+begin
+	delete from user_status_tombstone
+	where domain_rhonda_id = new.domain_rhonda_id;
+
+	return new;
+end;
+$$;
+
+DROP TRIGGER IF EXISTS status_delete ON user_status;
+create trigger status_delete
+after delete
+on "user_status"
+for each row
+execute procedure user_status_tombstone_insert();
+
+DROP TRIGGER IF EXISTS status_insert_tombstone ON user_status;
+create trigger status_insert_tombstone
+after insert
+on "user_status"
+for each row
+execute procedure user_status_tombstone_delete();
+
+
+-- Upserted rows in watermark order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS user_status_updated_at_idx
+	ON user_status (updated_at, domain_rhonda_id);
+
+ANALYZE user_status;
+
+INSERT INTO schema_migrations (version) VALUES ('0002') ON CONFLICT (version) DO NOTHING;
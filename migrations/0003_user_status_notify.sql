@@ -0,0 +1,41 @@
+-- 0003: NOTIFY user_status_changes on every row written to user_status.
+--
+-- Function instances LISTEN on the channel (RP_CACHE_NOTIFY) and evict the row from
+-- their caches, so writes made by another instance, a bulk job or straight SQL are
+-- seen without waiting for a TTL. Notifications are sent when the transaction commits.
+-- Payload: {"op": "INSERT|UPDATE|DELETE", "domain_rhonda_id": ..., "old_domain_rhonda_id": ..., "manager_id": ...}
+
+create or replace function user_status_notify()
+returns trigger
+language plpgsql
+as
+$$
+begin
+	if TG_OP = 'DELETE' then
+		perform pg_notify('user_status_changes', json_build_object(
+			'op', TG_OP,
+			'domain_rhonda_id', old.domain_rhonda_id,
+			'old_domain_rhonda_id', old.domain_rhonda_id,
+			'manager_id', null
+		)::text);
+		return old;
+	end if;
+
+	perform pg_notify('user_status_changes', json_build_object(
+		'op', TG_OP,
+		'domain_rhonda_id', new.domain_rhonda_id,
+		'old_domain_rhonda_id', case when TG_OP = 'UPDATE' then old.domain_rhonda_id end,
+		'manager_id', new.manager_id
+	)::text);
+	return new;
+end;
+$$;
+
+DROP TRIGGER IF EXISTS status_notify ON user_status;
+create trigger status_notify
+after insert or update or delete
+on "user_status"
+for each row
+execute procedure user_status_notify();
+
+INSERT INTO schema_migrations (version) VALUES ('0003') ON CONFLICT (version) DO NOTHING;
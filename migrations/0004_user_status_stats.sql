@@ -0,0 +1,112 @@
+-- 0004: headcount summary behind GET user-status/stats.
+--
+-- user_status_stats holds one row per (status, employee_environment, work_type,
+-- work_location, department) combination with its headcount, kept exact by statement
+-- triggers on user_status. Those read the changed rows from transition tables, so a bulk
+-- statement touches each combination once instead of once per row. NULL work_location
+-- and department are stored as '' (they are part of the primary key).
+-- Needs PostgreSQL 10 or later. The backfill runs in one transaction holding a SHARE
+-- lock, so writes wait for it but no change can slip between the backfill and the triggers.
+--
+-- A TRUNCATE of user_status fires none of the triggers: run the transaction at the end
+-- of this file again afterwards to rebuild the summary.
+
+CREATE TABLE IF NOT EXISTS user_status_stats(
+	status text NOT NULL,
+	employee_environment text NOT NULL,
+	work_type text NOT NULL,
+	work_location text NOT NULL,
+	department text NOT NULL,
+	headcount bigint NOT NULL DEFAULT 0,
+	PRIMARY KEY (status, employee_environment, work_type, work_location, department)
+);
+
+comment on table user_status_stats is 'Headcount of user_status per status, employee_environment, work_type, work_location and department.
+Maintained by the status_stats_* triggers, read by user-status/stats. NULL values are stored as an empty string.';
+
+
+create or replace function user_status_stats_apply()
+returns trigger
+language plpgsql
+as
+$$
+begin
+	-- Rows are counted in with +1 (new_rows) and out with -1 (old_rows); updates that leave
+	-- every grouped column as it was net to 0 and are skipped. Combinations are locked in
+	-- key order so concurrent statements can't deadlock on the summary rows.
+	if TG_OP = 'INSERT' then
+		insert into user_status_stats as s (status, employee_environment, work_type, work_location, department, headcount)
+		select status, employee_environment, work_type, coalesce(work_location, ''), coalesce(department, ''), count(*)
+		from new_rows
+		group by 1, 2, 3, 4, 5
+		order by 1, 2, 3, 4, 5
+		on conflict (status, employee_environment, work_type, work_location, department) do update
+		set headcount = s.headcount + excluded.headcount;
+	elsif TG_OP = 'DELETE' then
+		insert into user_status_stats as s (status, employee_environment, work_type, work_location, department, headcount)
+		select status, employee_environment, work_type, coalesce(work_location, ''), coalesce(department, ''), -count(*)
+		from old_rows
+		group by 1, 2, 3, 4, 5
+		order by 1, 2, 3, 4, 5
+		on conflict (status, employee_environment, work_type, work_location, department) do update
+		set headcount = s.headcount + excluded.headcount;
+	else
+		insert into user_status_stats as s (status, employee_environment, work_type, work_location, department, headcount)
+		select status, employee_environment, work_type, work_location, department, sum(delta)
+		from (
+			select status, employee_environment, work_type, coalesce(work_location, '') as work_location,
+				coalesce(department, '') as department, 1 as delta
+			from new_rows
+			union all
+			select status, employee_environment, work_type, coalesce(work_location, ''), coalesce(department, ''), -1
+			from old_rows
+		) changed
+		group by 1, 2, 3, 4, 5
+		having sum(delta) <> 0
+		order by 1, 2, 3, 4, 5
+		on conflict (status, employee_environment, work_type, work_location, department) do update
+		set headcount = s.headcount + excluded.headcount;
+	end if;
+
+	return null;
+end;
+$$;
+
+BEGIN;
+
+LOCK TABLE user_status IN SHARE MODE;
+
+DROP TRIGGER IF EXISTS status_stats_insert ON user_status;
+create trigger status_stats_insert
+after insert
+on "user_status"
+referencing new table as new_rows
+for each statement
+execute procedure user_status_stats_apply();
+
+DROP TRIGGER IF EXISTS status_stats_update ON user_status;
+create trigger status_stats_update
+after update
+on "user_status"
+referencing old table as old_rows new table as new_rows
+for each statement
+execute procedure user_status_stats_apply();
+
+DROP TRIGGER IF EXISTS status_stats_delete ON user_status;
+create trigger status_stats_delete
+after delete
+on "user_status"
+referencing old table as old_rows
+for each statement
+execute procedure user_status_stats_apply();
+
+DELETE FROM user_status_stats;
+
+INSERT INTO user_status_stats (status, employee_environment, work_type, work_location, department, headcount)
+SELECT status, employee_environment, work_type, coalesce(work_location, ''), coalesce(department, ''), count(*)
+FROM user_status
+GROUP BY 1, 2, 3, 4, 5;
+
+INSERT INTO schema_migrations (version) VALUES ('0004') ON CONFLICT (version) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,16 @@
+-- 0005: trigram index for the user-status-hr name search (?q=).
+--
+-- The search matches ILIKE '%term%' on the same name expression as
+-- user_status_functions.USER_NAME, so the planner can answer it from this GIN index
+-- instead of scanning public."user". pg_trgm ships with PostgreSQL (contrib); on managed
+-- servers it may have to be allow-listed first (Azure: azure.extensions). Like 0001, run
+-- this file outside a transaction (CREATE INDEX CONCURRENTLY).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS user_name_trgm_idx
+	ON public."user" USING gin ((coalesce(first_name, '') || ' ' || coalesce(last_name, '')) gin_trgm_ops);
+
+ANALYZE public."user";
+
+INSERT INTO schema_migrations (version) VALUES ('0005') ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,27 @@
+-- 0006: Idempotency-Key storage for POST/PUT/DELETE on user-status.
+--
+-- One row per key: the SHA-256 of the request it was first used with and, once that
+-- request has finished, its response. A retry with the same key and request gets the
+-- stored response back without touching user_status. locked_at marks a request still
+-- running, expires_at (RP_IDEMPOTENCY_TTL) when the key may be reused. The function app
+-- prunes expired rows itself, in small batches.
+
+CREATE TABLE IF NOT EXISTS idempotency_key(
+	idempotency_key text PRIMARY KEY,
+	request_hash bytea NOT NULL,
+	status_code smallint NULL,
+	mimetype text NULL,
+	charset text NULL,
+	headers text NULL,
+	body bytea NULL,
+	locked_at timestamp not null default (now() at time zone 'utc'),
+	expires_at timestamp not null
+);
+
+comment on table idempotency_key is 'Responses of user-status writes sent with an Idempotency-Key header, replayed on retries.
+status_code is NULL while the first request is still running. Rows past expires_at are pruned by the function app.';
+
+CREATE INDEX IF NOT EXISTS idempotency_key_expires_at_idx
+	ON idempotency_key (expires_at);
+
+INSERT INTO schema_migrations (version) VALUES ('0006') ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,37 @@
+import azure.functions as func
+import pytest
+from user_status import batch
+
+
+def request(method, url_prefix, domain_rhonda_id=None, params=None):
+    route_params = {"url_prefix": url_prefix}
+    if domain_rhonda_id is not None:
+        route_params["domain_rhonda_id"] = domain_rhonda_id
+    return func.HttpRequest(
+        method, "http://localhost/api/user-status", params=params or {}, route_params=route_params, body=b""
+    )
+
+
+@pytest.mark.parametrize(
+    "req",
+    [
+        request("GET", "user-id", params={"ids": "a,b"}),
+        request("POST", "user-id", "batch"),
+    ],
+)
+def test_batch_lookup_routes(req):
+    assert batch.is_batch_lookup(req)
+
+
+@pytest.mark.parametrize(
+    "req",
+    [
+        # The single-row create, as before batch lookups existed
+        request("POST", "user-id"),
+        request("GET", "user-id", "a"),
+        request("GET", "user-id", "batch"),
+        request("POST", "bulk"),
+    ],
+)
+def test_other_routes_are_not_batch_lookups(req):
+    assert not batch.is_batch_lookup(req)
@@ -0,0 +1,210 @@
+from collections import namedtuple
+from contextlib import contextmanager
+import pytest
+from user_status import cache
+from user_status import org
+from user_status import user_status_functions as usf
+
+
+Column = namedtuple("Column", ["name", "type_code"])
+TEXT_OID = 25
+
+
+class Clock:
+    """Stand-in for time.monotonic that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def test_lru_evicts_least_recently_used(clock):
+    lru = cache.LRUCache(2, 60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+
+
+def test_lru_entries_expire_after_ttl(clock):
+    lru = cache.LRUCache(10, 60)
+    lru.set("a", 1)
+    clock.now += 59
+    assert lru.get("a") == 1
+    clock.now += 1
+
+    assert lru.get("a") is None
+    assert lru.stats()["expirations"] == 1
+
+
+def test_lru_stats_count_hits_misses_evictions_and_invalidations(clock):
+    lru = cache.LRUCache(1, 60)
+    lru.set("a", 1)
+    lru.get("a")
+    lru.get("b")
+    lru.set("b", 2)
+    lru.invalidate("b")
+    lru.invalidate("b")
+
+    stats = lru.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["invalidations"]) == (1, 1, 1, 1)
+    assert stats["size"] == 0
+
+
+def test_backend_missing_a_method_fails_when_constructed():
+    class GetOnlyBackend(cache.CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnlyBackend()
+
+
+def test_read_through_fills_local_cache_from_shared_backend(clock):
+    shared = cache.LocalCacheBackend()
+    shared.set("a", {"status": "Active"}, 60)
+    read_through = cache.ReadThroughCache(cache.LRUCache(10, 60), shared)
+
+    assert read_through.get("a") == {"status": "Active"}
+    shared.delete("a")
+    assert read_through.get("a") == {"status": "Active"}
+    assert read_through.stats()["shared_hits"] == 1
+
+    read_through.invalidate("a")
+    assert read_through.get("a") is None
+
+
+def test_read_through_writes_and_invalidates_shared_backend(clock):
+    shared = cache.LocalCacheBackend()
+    read_through = cache.ReadThroughCache(cache.LRUCache(10, 60), shared)
+    read_through.set("a", {"status": "Active"})
+    assert shared.get("a") == {"status": "Active"}
+
+    read_through.invalidate("a")
+    assert shared.get("a") is None
+
+
+def test_fill_started_before_an_invalidation_is_dropped(clock):
+    read_through = cache.ReadThroughCache(cache.LRUCache(10, 60))
+    generation = read_through.generation()
+    read_through.invalidate("a")
+    read_through.set("a", {"status": "Active"}, generation)
+
+    assert read_through.get("a") is None
+    assert read_through.stats()["stale_fills"] == 1
+    # Other keys still fill
+    read_through.set("b", {"status": "Active"}, generation)
+    assert read_through.get("b") == {"status": "Active"}
+
+
+class FakeCursor:
+    def __init__(self, events, row):
+        self.events = events
+        self.row = row
+        self.description = [Column("domain_rhonda_id", TEXT_OID), Column("status", TEXT_OID)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def fetchone(self):
+        return self.row
+
+    def fetchall(self):
+        self.events.append("select")
+        return [self.row] if self.row else []
+
+
+class FakeConnection:
+    def __init__(self, events, row):
+        self.events = events
+        self.row = row
+
+    def cursor(self):
+        return FakeCursor(self.events, self.row)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Mocked pool: records when the transaction commits and when the row cache is invalidated."""
+    state = {"events": [], "row": ("a", "Active")}
+
+    @contextmanager
+    def connection():
+        yield FakeConnection(state["events"], state["row"])
+        state["events"].append("commit")
+
+    user_status_cache = cache.ReadThroughCache(cache.LRUCache(10, 60))
+    invalidate = user_status_cache.invalidate
+
+    def record_invalidate(key):
+        state["events"].append("invalidate")
+        invalidate(key)
+
+    user_status_cache.invalidate = record_invalidate
+    monkeypatch.setattr(usf.db_pool, "connection", connection)
+    monkeypatch.setattr(usf, "_execute", lambda cursor, name, query, params=None: None)
+    monkeypatch.setattr(usf, "user_status_cache", user_status_cache)
+    monkeypatch.setattr(usf, "count_cache", cache.TTLCache(60))
+    monkeypatch.setattr(usf, "org_index", org.OrgIndex(300))
+    state["cache"] = user_status_cache
+    return state
+
+
+def test_add_invalidates_after_commit(fake_db):
+    fake_db["cache"].set("a", {"domain_rhonda_id": "a", "status": "Terminated"})
+    usf.count_cache.set(("all",), 10)
+    usf.add_user_status("a", "Active", None, None, None, None, None, None, None, None, None)
+
+    assert fake_db["events"] == ["commit", "invalidate"]
+    assert fake_db["cache"].get("a") is None
+    assert usf.count_cache.get(("all",)) is None
+
+
+def test_update_invalidates_after_commit(fake_db):
+    fake_db["cache"].set("a", {"domain_rhonda_id": "a", "status": "Active"})
+    usf.update_user_status("Terminated", None, None, None, None, None, None, None, None, None, "a")
+
+    assert fake_db["events"] == ["commit", "invalidate"]
+    assert fake_db["cache"].get("a") is None
+
+
+def test_delete_invalidates_after_commit(fake_db):
+    fake_db["cache"].set("a", {"domain_rhonda_id": "a", "status": "Active"})
+    usf.delete_user_status("a")
+
+    assert fake_db["events"] == ["commit", "invalidate"]
+    assert fake_db["cache"].get("a") is None
+
+
+def test_lookup_racing_an_invalidation_doesnt_cache_the_row(fake_db, monkeypatch):
+    fetchall = FakeCursor.fetchall
+
+    def fetchall_then_notify(cursor):
+        rows = fetchall(cursor)
+        # The write's NOTIFY lands while the old row is being read
+        usf.user_status_cache.invalidate("a")
+        return rows
+
+    monkeypatch.setattr(FakeCursor, "fetchall", fetchall_then_notify)
+    assert usf.get_user_status_by_domain_rhonda_id("a") == {"domain_rhonda_id": "a", "status": "Active"}
+    assert fake_db["cache"].get("a") is None
+
+    monkeypatch.setattr(FakeCursor, "fetchall", fetchall)
+    usf.get_user_status_by_domain_rhonda_id("a")
+    assert fake_db["cache"].get("a") == {"domain_rhonda_id": "a", "status": "Active"}
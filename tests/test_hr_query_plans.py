@@ -0,0 +1,50 @@
+"""EXPLAIN regression test for the user-status-hr listing.
+
+Runs only when RP_PLAN_TEST_DSN points at a throwaway PostgreSQL database: it is
+dropped and reseeded (benchmarks/pg_seed.py) at 10k, 100k and 1M rows, then the
+plans are checked like benchmarks/bench_hr_query_plans.py does. That script stays
+the manual tool (timings, buffers, JSON report).
+
+    RP_PLAN_TEST_DSN=postgresql://localhost/scratch python -m pytest tests/test_hr_query_plans.py
+"""
+import os
+import sys
+import pytest
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks")
+sys.path.insert(0, BENCHMARKS_DIR)
+import bench_hr_query_plans as bench  # noqa: E402
+import pg_seed  # noqa: E402
+
+
+PLAN_TEST_DSN = os.environ.get("RP_PLAN_TEST_DSN")
+SIZES = (10000, 100000, 1000000)
+# Below this many rows a Seq Scan is the planner's right call
+MIN_ROWS_FOR_INDEX = 100000
+CASES = [name for name, _, _, _ in bench.cases(0)]
+
+pytestmark = pytest.mark.skipif(not PLAN_TEST_DSN, reason="RP_PLAN_TEST_DSN is not set")
+
+
+@pytest.fixture(scope="module")
+def connection():
+    connection = pg_seed.connect(PLAN_TEST_DSN)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda rows: f"{rows}rows")
+def seeded(request, connection):
+    pg_seed.build(connection, request.param)
+    return connection, request.param
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_hr_listing_plan(seeded, case):
+    connection, rows = seeded
+    _, query, params, paging = next(found for found in bench.cases(rows) if found[0] == case)
+    with connection.cursor() as cursor:
+        plan = bench.explain(cursor, query, params)
+    connection.rollback()
+
+    assert bench.regressions(plan, rows, paging, MIN_ROWS_FOR_INDEX) == []
@@ -0,0 +1,103 @@
+import psycopg2.errors
+import psycopg2.extensions
+from user_status import prepared
+
+
+QUERY = "SELECT * FROM user_status WHERE domain_rhonda_id = %s;"
+
+
+class FakeInfo:
+    transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    """A session holding prepared statements, which a pooler may DISCARD ALL."""
+
+    def __init__(self):
+        self.info = FakeInfo()
+        self.server_names = set()
+        self.executed = []
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, sql, params=None):
+        self.connection.executed.append(sql)
+        self.connection.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        verb, _, rest = sql.partition(" ")
+        name = rest.split(" ")[0].rstrip(";")
+        if verb == "PREPARE":
+            if name in self.connection.server_names:
+                raise psycopg2.errors.DuplicatePreparedStatement(f'prepared statement "{name}" already exists')
+            self.connection.server_names.add(name)
+        elif verb == "EXECUTE" and name not in self.connection.server_names:
+            raise psycopg2.errors.InvalidSqlStatementName(f'prepared statement "{name}" does not exist')
+
+
+def registry():
+    statements = prepared.StatementRegistry(enabled=True)
+    statements.register("get_user_status", QUERY)
+    return statements
+
+
+def test_lost_statement_is_prepared_again_and_retried():
+    statements = registry()
+    connection = FakeConnection()
+    statements.execute(connection.cursor(), QUERY, ("a",))
+    connection.rollback()
+    connection.server_names.clear()
+
+    statements.execute(connection.cursor(), QUERY, ("b",))
+
+    assert connection.executed[-3:] == [
+        "EXECUTE get_user_status (%s);",
+        "PREPARE get_user_status AS SELECT * FROM user_status WHERE domain_rhonda_id = $1;",
+        "EXECUTE get_user_status (%s);",
+    ]
+
+
+def test_statement_the_session_already_holds_is_recorded():
+    statements = registry()
+    connection = FakeConnection()
+    connection.server_names.add("get_user_status")
+
+    statements.execute(connection.cursor(), QUERY, ("a",))
+    connection.rollback()
+    statements.execute(connection.cursor(), QUERY, ("b",))
+
+    assert connection.rollbacks == 2
+    assert [sql.split(" ")[0] for sql in connection.executed] == ["PREPARE", "EXECUTE", "EXECUTE"]
+
+
+def test_earlier_statements_of_the_transaction_are_kept_by_a_savepoint():
+    statements = registry()
+    connection = FakeConnection()
+    connection.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    connection.server_names.add("get_user_status")
+
+    statements.execute(connection.cursor(), QUERY, ("a",))
+
+    assert connection.rollbacks == 0
+    assert connection.executed == [
+        "SAVEPOINT prepared_statement;",
+        "PREPARE get_user_status AS SELECT * FROM user_status WHERE domain_rhonda_id = $1;",
+        "ROLLBACK TO SAVEPOINT prepared_statement;",
+        "EXECUTE get_user_status (%s);",
+        "RELEASE SAVEPOINT prepared_statement;",
+    ]
@@ -0,0 +1,35 @@
+import psycopg2.extras
+from user_status import instrumentation, slow_queries
+from user_status import user_status_functions as usf
+
+
+ROWS = [("a", "Active"), ("b", "Active")]
+
+
+def fake_execute_values(cursor, query, rows, fetch=False, **kwargs):
+    assert fetch
+    return [(row[0],) for row in rows]
+
+
+def test_execute_values_returns_results_when_timed(monkeypatch):
+    monkeypatch.setattr(psycopg2.extras, "execute_values", fake_execute_values)
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_ENABLED", True)
+    # Every statement is slow, so the slow-query log runs too
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_MS", 0)
+    metrics = instrumentation.RequestMetrics("user-status")
+    token = instrumentation._current.set(metrics)
+    try:
+        results = usf._execute_values(None, "BULK_INSERT_USER_STATUS", usf.BULK_INSERT_USER_STATUS, ROWS)
+    finally:
+        instrumentation._current.reset(token)
+
+    assert results == [("a",), ("b",)]
+    assert metrics.statements[0][0] == "BULK_INSERT_USER_STATUS"
+    assert metrics.rows == 2
+
+
+def test_execute_values_returns_results_untimed(monkeypatch):
+    monkeypatch.setattr(psycopg2.extras, "execute_values", fake_execute_values)
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_ENABLED", False)
+
+    assert usf._execute_values(None, "BULK_INSERT_USER_STATUS", usf.BULK_INSERT_USER_STATUS, ROWS) == [("a",), ("b",)]
@@ -1,329 +1,507 @@
-import logging
-import json
-from datetime import datetime
-import azure.functions as func
-from . import user_status_functions
-from . import field_validation
-
-
-def main(req: func.HttpRequest) -> func.HttpResponse:
-    logging.info(f"API: user_status")
-    logging.info(f"Timestamp: {datetime.utcnow()}")
-    logging.info(f"URL: {req.url}")
-    logging.info(f"Method: {req.method}")
-
-    '''
-    200 - OK
-    201 - Created [POST]
-    204 - No Content [DELETE/PUT] if succeed
-    404 - Not found [GET/DELETE/PUT]
-    400 - Bad request - due to validation issue (Missing required fields, etc) [POST/PUT]
-    409 - Conflict (POST request with same ID) [POST]
-    500 - Internal Server Error (Should be only in exception block) [ALL]
-    '''
-
-    if "GET" == req.method:
-        try:
-            domain_rhonda_id = req.route_params.get("domain_rhonda_id")
-            url_prefix = req.route_params.get("url_prefix")
-            page_size = int(req.params.get("page_size", 20))
-            page = int(req.params.get("page", 1))
-
-            # GET data for for specific domain_rhonda_id
-            if url_prefix == "user-id":
-                try:
-                    result = user_status_functions.get_user_status_by_domain_rhonda_id(domain_rhonda_id)
-                    if not result:
-                        return func.HttpResponse(
-                            body=json.dumps({"message": f"{domain_rhonda_id} does not exist!"}),
-                            status_code=404,
-                            charset="utf-8",
-                            mimetype="application/json",
-                        )
-                    return func.HttpResponse(
-                        body=json.dumps(result), status_code=200, charset="utf-8", mimetype="application/json"
-                    )
-                except Exception as error:
-                    logging.error(f"Error: {error}")
-                    return func.HttpResponse(
-                        body=json.dumps({"message": f"{error}"}),
-                        status_code=500, #Should be 500 Internal Server Error
-                        charset="utf-8",
-                        mimetype="application/json",
-                    )
-            # GET all data with manager added
-            if url_prefix == "user-status-hr":
-                count = user_status_functions.count_user_status_rows()
-                max_page = user_status_functions.user_status_max_page(page_size)
-                status_param = req.params.get("status", "%")
-                employee_environment_param = req.params.get("environment", "%")
-                if page:
-                    user_status_dat = user_status_functions.get_all_user_status_with_manager(
-                        status_param, employee_environment_param, page_size, page
-                    )
-                    previous_page = None
-                    if int(page) > 1 and int(page) <= int(max_page):
-                        previous_page = page - 1
-                    else:
-                        previous_page = None
-
-                    if int(page) >= 0 and int(page) < int(max_page):
-                        next_page = page + 1
-                    else:
-                        next_page = None
-                    result = {
-                        "count": count,
-                        "max_page": max_page,
-                        "previous": {"page": previous_page, "page_size": page_size},
-                        "next": {"page": next_page, "page_size": page_size},
-                        "results": user_status_dat,
-                    }
-
-                return func.HttpResponse(
-                    body=json.dumps(result), status_code=200, charset="utf-8", mimetype="application/json"
-                )
-
-            # GET all data
-            count = user_status_functions.count_user_status_rows()
-            max_page = user_status_functions.user_status_max_page(page_size)
-            if page:
-                user_status_dat = user_status_functions.get_all_user_status(page_size, page)
-                previous_page = None
-                if int(page) > 1 and int(page) <= int(max_page):
-                    previous_page = page - 1
-                else:
-                    previous_page = None
-
-                if int(page) >= 0 and int(page) < int(max_page):
-                    next_page = page + 1
-                else:
-                    next_page = None
-                result = {
-                    "count": count,
-                    "max_page": max_page,
-                    "previous": {"page": previous_page, "page_size": page_size},
-                    "next": {"page": next_page, "page_size": page_size},
-                    "results": user_status_dat,
-                }
-
-            return func.HttpResponse(
-                body=json.dumps(result), status_code=200, charset="utf-8", mimetype="application/json"
-            )
-
-        except Exception as error:
-            logging.error(f"Error:{error}")
-            return func.HttpResponse(
-                body=json.dumps({"message": f"{error}"}), status_code=500, charset="utf-8", mimetype="application/json"
-            )
-
-    # PUT data
-    elif "PUT" == req.method:
-        try:
-            req_body = req.get_json()
-            domain_rhonda_id = req.route_params.get("domain_rhonda_id", None)
-
-            # Check if UUID is passed            
-            if domain_rhonda_id:
-
-                ''' -----
-                Need a validation right here
-                1. Check if field type is correct
-                2. Check if Null/None/Empty field ---> Return 4xx request
-                3. Check field length (Make sure does not exceed the max length allowed in the db)
-                4. so on ....
-                ------ '''
-                vali_result, vali_error = field_validation.put_field_validation(req_body)
-
-                if not vali_result :
-                    return func.HttpResponse(
-                        body=json.dumps({"message": f"{vali_error}"}),
-                        status_code=400,
-                        charset="utf-8",
-                        mimetype="application/json",
-                    )
-
-                # When field validation passed, then move forward to call update function
-                else:
-                    status = req_body.get("status")
-                    employee_environment = req_body.get("employee_environment")
-                    department = req_body.get("department")
-                    work_type = req_body.get("work_type")
-                    manager_id = req_body.get("manager_id")
-                    work_location = req_body.get("work_location")
-                    gender = req_body.get("gender")
-                    birth_date = req_body.get("birth_date")
-                    start_date = req_body.get("start_date")
-                    end_date = req_body.get("end_date")
-
-                    put_data = user_status_functions.update_user_status(
-                        status,
-                        employee_environment,
-                        department,
-                        work_type,
-                        manager_id,
-                        work_location,
-                        gender,
-                        birth_date,
-                        start_date,
-                        end_date,
-                        domain_rhonda_id,
-                    )
-
-                    # When this domain_rhonda_id doesn't exist, then update function will return None
-                    if not put_data:
-                        return func.HttpResponse(
-                            body=json.dumps({"message": f"{domain_rhonda_id} does not exist!"}),
-                            status_code=404,
-                            charset="utf-8",
-                            mimetype="application/json",
-                        )
-                    else:
-                        return func.HttpResponse(
-                            body=json.dumps(put_data), 
-                            status_code=200, 
-                            charset='utf-8', 
-                            mimetype='application/json'
-                        )
-            else:
-                # Return 404 if UUID is not passed in the URL
-                return func.HttpResponse(
-                    body=json.dumps({"message": f"Update failed! domain_rhonda_id is required in URL for PUT request!"}), #HY - Please check the appropriate message
-                    status_code=404,
-                    charset="utf-8",
-                    mimetype="application/json",
-                )
-
-        except Exception as error:
-            # Highly recommend to use exception to throw error related to Internal Server Error issue.
-            # 500 error code should be return in the exception block
-            # If error related to missing domain_rhonda_id should be handled in the if/else statement
-            logging.error(f"Error:{error}")
-            return func.HttpResponse(
-                body=json.dumps({"message": f"{error}"}),
-                status_code=500,
-                charset="utf-8",
-                mimetype="application/json",
-            )
-
-    # DELETE data
-    elif "DELETE" == req.method:
-        try:
-            domain_rhonda_id = req.route_params.get("domain_rhonda_id", None)
-
-            if domain_rhonda_id:
-                delete_data = user_status_functions.delete_user_status(domain_rhonda_id)
-
-                #When this domain_rhonda_id doesn't exist, then delete function will return None
-                if not delete_data:
-                    return func.HttpResponse(
-                        body=json.dumps({"message": f"{domain_rhonda_id} does not exist!"}),
-                        status_code=404,
-                        charset="utf-8",
-                        mimetype="application/json",
-                    )    
-                else:
-                    return func.HttpResponse(
-                        body=json.dumps({"message": f"{status} has been deleted successfully!"}),
-                        status_code=204, 
-                        charset='utf-8', 
-                        mimetype='application/json'
-                    )
-
-            else:
-                # If no UUID is passed
-                return func.HttpResponse(
-                    body=json.dumps({"message": f"domain_rhonda_id in URL is required in DELETE request!"}), #HY - Please check the appropriate message
-                    status_code=404,
-                    charset="utf-8",
-                    mimetype="application/json",
-                )
-        except Exception as error:
-            # Highly recommend to use exception to throw error related to Internal Server Error issue.
-            # 500 error code should be return in the exception block
-            # If error related to missing domain_rhonda_id should be handled in the if/else statement
-
-            logging.error(f"Error:{error}")
-            return func.HttpResponse(
-                body=json.dumps({"message": f"{error}"}),
-                status_code=500,
-                charset="utf-8",
-                mimetype="application/json",
-            )
-
-    else:
-        # POST data
-        try:
-            req_body = req.get_json()
-            # Need to handle duplication 
-            # Return appropriate message if request failed
-
-            ''' -----
-            Need a validation right here
-            1. Check if all required fields are passed, else return 400 with error message containing what fields are missing
-            2. Check field type
-            3. Check field length (Make sure does not exceed the max length allowed in the db)
-            4. So on ....
-            ------ '''
-            vali_result, vali_error = field_validation.post_field_validation(req_body)
-
-            if not vali_result :
-                return func.HttpResponse(
-                    body=json.dumps({"message": f"{vali_error}"}),
-                    status_code=400,
-                    charset="utf-8",
-                    mimetype="application/json",
-                )
-
-            # When field validation passed, then move forward to call post function
-            else:
-                domain_rhonda_id = req_body.get("domain_rhonda_id", None) # .get('', None)
-                status = req_body.get("status")
-                employee_environment = req_body.get("employee_environment")
-                department = req_body.get("department")
-                work_type = req_body.get("work_type")
-                manager_id = req_body.get("manager_id")
-                work_location = req_body.get("work_location")
-                gender = req_body.get("gender")
-                birth_date = req_body.get("birth_date")
-                start_date = req_body.get("start_date")
-                end_date = req_body.get("end_date")
-
-                post_data = user_status_functions.add_user_status(
-                    domain_rhonda_id,
-                    status,
-                    employee_environment,
-                    department,
-                    work_type,
-                    manager_id,
-                    work_location,
-                    gender,
-                    birth_date,
-                    start_date,
-                    end_date,
-                )
-
-                # When this domain_rhonda_id exists, then post function will return None
-                if not post_data:
-                    return func.HttpResponse(
-                        body=json.dumps({"message": f"{domain_rhonda_id} already exist!"}),
-                        status_code=409,
-                        charset="utf-8",
-                        mimetype="application/json",
-                    )
-                else:
-                    return func.HttpResponse(
-                        body=json.dumps({"message": f"{post_data} has been inserted successfully!"}),
-                        status_code=201, 
-                        charset='utf-8', 
-                        mimetype='application/json'
-                    )
-
-        except Exception as error:
-            # Error code 500
-            logging.error(f"Error:{error}")
-            return func.HttpResponse(
-                body=json.dumps({"message": f"{error}"}),
-                status_code=500,
-                charset="utf-8",
-                mimetype="application/json",
-            )
+import time
+
+_import_started = time.perf_counter()
+
+import logging
+import json
+from datetime import datetime
+import azure.functions as func
+from . import user_status_functions
+from . import field_validation
+from . import pagination
+from . import bulk
+from . import batch
+from . import reports
+from . import changes
+from . import stats
+from . import export
+from . import conditional
+from . import instrumentation
+from . import slow_queries
+from . import idempotency
+
+# Cold-start cost of importing the function app (see benchmarks/import_time.py for a per-module profile)
+IMPORT_MS = (time.perf_counter() - _import_started) * 1000
+logging.info(json.dumps({"event": "startup", "import_ms": round(IMPORT_MS, 3)}))
+
+
+@instrumentation.instrumented
+@idempotency.idempotent
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    logging.info(f"API: user_status")
+    logging.info(f"Timestamp: {datetime.utcnow()}")
+    logging.info(f"URL: {req.url}")
+    logging.info(f"Method: {req.method}")
+
+    '''
+    200 - OK
+    201 - Created [POST]
+    204 - No Content [DELETE/PUT] if succeed
+    404 - Not found [GET/DELETE/PUT]
+    400 - Bad request - due to validation issue (Missing required fields, etc) [POST/PUT]
+    409 - Conflict (POST request with same ID) [POST]
+    500 - Internal Server Error (Should be only in exception block) [ALL]
+    '''
+
+    user_status_functions.change_listener.ensure_started()
+
+    # Bulk POST/PUT/DELETE: JSON array or NDJSON body, per-row results
+    if req.route_params.get("url_prefix") == "bulk" and req.method in ("POST", "PUT", "DELETE"):
+        return bulk.bulk_request(req)
+
+    # Org chart: reports below or managers above one employee
+    if req.route_params.get("url_prefix") == "reports" and req.method == "GET":
+        return reports.reports_request(req)
+
+    # Change feed: rows changed or deleted after ?since=<watermark>
+    if req.route_params.get("url_prefix") == "changes" and req.method == "GET":
+        return changes.changes_request(req)
+
+    # Headcounts by status/employee_environment/work_type/work_location/department
+    if req.route_params.get("url_prefix") == "stats" and req.method == "GET":
+        return stats.stats_request(req)
+
+    # Batch lookup: GET user-id?ids=a,b,c or POST user-id/batch with {"ids": [...]}, one query for all ids
+    if batch.is_batch_lookup(req):
+        return batch.batch_lookup_request(req)
+
+    if "GET" == req.method:
+        try:
+            domain_rhonda_id = req.route_params.get("domain_rhonda_id")
+            url_prefix = req.route_params.get("url_prefix")
+            page_size = int(req.params.get("page_size", 20))
+            page = int(req.params.get("page", 1))
+
+            # Cache counters
+            if url_prefix == "cache-stats":
+                result = {
+                    "user_status": user_status_functions.user_status_cache.stats(),
+                    "listener": user_status_functions.change_listener.stats(),
+                }
+                return func.HttpResponse(
+                    body=json.dumps(result), status_code=200, charset="utf-8", mimetype="application/json"
+                )
+
+            # Request/statement timing histograms of this worker (RP_INSTRUMENTATION), ?reset=true clears them
+            if url_prefix == "metrics":
+                result = {
+                    "enabled": instrumentation.INSTRUMENTATION_ENABLED,
+                    **instrumentation.registry.dump(),
+                    "startup": {"import_ms": round(IMPORT_MS, 3)},
+                    "slow_query_plans": {
+                        "captured": slow_queries.plan_capture.captured,
+                        "dropped": slow_queries.plan_capture.dropped,
+                    },
+                }
+                if req.params.get("reset", "false").lower() == "true":
+                    instrumentation.registry.reset()
+                return func.HttpResponse(
+                    body=json.dumps(result), status_code=200, charset="utf-8", mimetype="application/json"
+                )
+
+            # ?fields=a,b narrows the select list; the hr listing has its own (joined) fields
+            if url_prefix == "user-status-hr":
+                allowed_fields = tuple(user_status_functions.USER_STATUS_WITH_MANAGER_COLUMNS)
+            else:
+                allowed_fields = user_status_functions.USER_STATUS_COLUMNS
+            try:
+                fields = user_status_functions.parse_fields(req.params.get("fields"), allowed_fields)
+            except ValueError as error:
+                return func.HttpResponse(
+                    body=json.dumps({"message": f"{error}"}),
+                    status_code=400,
+                    charset="utf-8",
+                    mimetype="application/json",
+                )
+
+            # GET data for for specific domain_rhonda_id
+            if url_prefix == "user-id":
+                try:
+                    result = user_status_functions.get_user_status_by_domain_rhonda_id(domain_rhonda_id, fields)
+                    if not result:
+                        return func.HttpResponse(
+                            body=json.dumps({"message": f"{domain_rhonda_id} does not exist!"}),
+                            status_code=404,
+                            charset="utf-8",
+                            mimetype="application/json",
+                        )
+                    # ETag/Last-Modified from the row; 304 skips encoding the body
+                    return conditional.json_response(req, result, [result])
+                except Exception as error:
+                    logging.error(f"Error: {error}")
+                    return func.HttpResponse(
+                        body=json.dumps({"message": f"{error}"}),
+                        status_code=500, #Should be 500 Internal Server Error
+                        charset="utf-8",
+                        mimetype="application/json",
+                    )
+            # Table export, read in batches through a server-side cursor
+            export_format = req.params.get("format")
+            if export_format and url_prefix is None:
+                if export_format not in export.EXPORT_FORMATS:
+                    return func.HttpResponse(
+                        body=json.dumps({"message": f"format must be one of {', '.join(export.EXPORT_FORMATS)}"}),
+                        status_code=400,
+                        charset="utf-8",
+                        mimetype="application/json",
+                    )
+                # At most RP_EXPORT_MAX_ROWS rows per response, a Link header (rel="next") leads to the next part
+                try:
+                    after, direction = pagination.decode_cursor(req.params.get("cursor"))
+                    if direction != pagination.NEXT:
+                        raise ValueError("Export cursors only go forward!")
+                except ValueError as error:
+                    return func.HttpResponse(
+                        body=json.dumps({"message": f"{error}"}),
+                        status_code=400,
+                        charset="utf-8",
+                        mimetype="application/json",
+                    )
+                body, next_cursor = export.export_user_status(export_format, after)
+                headers = {"Content-Disposition": f'attachment; filename="user_status.{export_format}"'}
+                if next_cursor is not None:
+                    headers["Link"] = export.next_link(req.url, req.params, next_cursor)
+                return func.HttpResponse(
+                    body=body,
+                    status_code=200,
+                    charset="utf-8",
+                    mimetype=export.EXPORT_FORMATS[export_format],
+                    headers=headers,
+                )
+
+            # Keyset pagination when a cursor is passed (empty cursor = first page)
+            cursor = req.params.get("cursor")
+            if cursor is not None:
+                try:
+                    cursor_id, cursor_direction = pagination.decode_cursor(cursor)
+                except ValueError as error:
+                    return func.HttpResponse(
+                        body=json.dumps({"message": f"{error}"}),
+                        status_code=400,
+                        charset="utf-8",
+                        mimetype="application/json",
+                    )
+
+            # Totals come back with the page in one statement; ?include_count=false skips them
+            include_count = req.params.get("include_count", "true").lower() != "false"
+            # estimate/cached totals are looked up separately and the page query skips its count
+            count_mode = req.params.get("count_mode", user_status_functions.COUNT_MODE_EXACT)
+            if count_mode not in user_status_functions.COUNT_MODES:
+                return func.HttpResponse(
+                    body=json.dumps(
+                        {"message": f"count_mode must be one of {', '.join(user_status_functions.COUNT_MODES)}"}
+                    ),
+                    status_code=400,
+                    charset="utf-8",
+                    mimetype="application/json",
+                )
+            count_in_page = include_count and count_mode == user_status_functions.COUNT_MODE_EXACT
+
+            status_param = None
+            employee_environment_param = None
+            search_param = None
+            # GET all data with manager added
+            if url_prefix == "user-status-hr":
+                status_param = req.params.get("status")
+                employee_environment_param = req.params.get("environment")
+                # ?q= searches employee and manager names
+                search_param = req.params.get("q")
+                try:
+                    user_status_functions.search_pattern(search_param)
+                except ValueError as error:
+                    return func.HttpResponse(
+                        body=json.dumps({"message": f"{error}"}),
+                        status_code=400,
+                        charset="utf-8",
+                        mimetype="application/json",
+                    )
+                if cursor is not None:
+                    user_status_dat, has_more, count = user_status_functions.get_all_user_status_with_manager_keyset(
+                        status_param,
+                        employee_environment_param,
+                        page_size,
+                        cursor_id,
+                        cursor_direction,
+                        count_in_page,
+                        fields,
+                        search_param,
+                    )
+                else:
+                    user_status_dat, count = user_status_functions.get_all_user_status_with_manager(
+                        status_param, employee_environment_param, page_size, page, count_in_page, fields, search_param
+                    )
+
+            # GET all data
+            elif cursor is not None:
+                user_status_dat, has_more, count = user_status_functions.get_all_user_status_keyset(
+                    page_size, cursor_id, cursor_direction, count_in_page, fields
+                )
+            # PostgreSQL builds the page JSON itself, the bytes are passed through (all fields only)
+            elif req.params.get("serializer") == "postgres" and page and not fields:
+                user_status_json, page_rows, count = user_status_functions.get_all_user_status_json(
+                    page_size, page, count_in_page
+                )
+                if include_count and not count_in_page:
+                    count = user_status_functions.list_total_count(count_mode)
+                max_page = user_status_functions.user_status_max_page(page_size, count) if include_count else None
+                previous_page, next_page = pagination.page_links(page, max_page, page_rows, page_size)
+                result = {
+                    "count": count,
+                    "max_page": max_page,
+                    "previous": {"page": previous_page, "page_size": page_size},
+                    "next": {"page": next_page, "page_size": page_size},
+                }
+                # ETag over the JSON PostgreSQL built and the page metadata
+                return conditional.raw_json_response(req, result, "results", user_status_json, result)
+            else:
+                user_status_dat, count = user_status_functions.get_all_user_status(
+                    page_size, page, count_in_page, fields
+                )
+
+            if include_count and not count_in_page:
+                count = user_status_functions.list_total_count(
+                    count_mode, status_param, employee_environment_param, search_param
+                )
+
+            if cursor is not None:
+                previous_cursor, next_cursor = pagination.cursor_links(
+                    user_status_dat, has_more, cursor_id, cursor_direction
+                )
+                result = {
+                    "count": count,
+                    "previous": {"cursor": previous_cursor, "page_size": page_size},
+                    "next": {"cursor": next_cursor, "page_size": page_size},
+                    "results": user_status_dat,
+                }
+            elif page:
+                max_page = user_status_functions.user_status_max_page(page_size, count) if include_count else None
+                previous_page, next_page = pagination.page_links(page, max_page, len(user_status_dat), page_size)
+                result = {
+                    "count": count,
+                    "max_page": max_page,
+                    "previous": {"page": previous_page, "page_size": page_size},
+                    "next": {"page": next_page, "page_size": page_size},
+                    "results": user_status_dat,
+                }
+
+            # ETag over the page rows and metadata, lists carry no Last-Modified
+            meta = {key: value for key, value in result.items() if key != "results"}
+            return conditional.json_response(req, result, user_status_dat or [], meta)
+
+        except Exception as error:
+            logging.error(f"Error:{error}")
+            return func.HttpResponse(
+                body=json.dumps({"message": f"{error}"}), status_code=500, charset="utf-8", mimetype="application/json"
+            )
+
+    # PUT data
+    elif "PUT" == req.method:
+        try:
+            req_body = req.get_json()
+            domain_rhonda_id = req.route_params.get("domain_rhonda_id", None)
+
+            # Check if UUID is passed            
+            if domain_rhonda_id:
+
+                ''' -----
+                Need a validation right here
+                1. Check if field type is correct
+                2. Check if Null/None/Empty field ---> Return 4xx request
+                3. Check field length (Make sure does not exceed the max length allowed in the db)
+                4. so on ....
+                ------ '''
+                vali_result, vali_error = field_validation.put_field_validation(req_body)
+
+                if not vali_result :
+                    return func.HttpResponse(
+                        body=json.dumps({"message": f"{vali_error}"}),
+                        status_code=400,
+                        charset="utf-8",
+                        mimetype="application/json",
+                    )
+
+                # When field validation passed, then move forward to call update function
+                else:
+                    status = req_body.get("status")
+                    employee_environment = req_body.get("employee_environment")
+                    department = req_body.get("department")
+                    work_type = req_body.get("work_type")
+                    manager_id = req_body.get("manager_id")
+                    work_location = req_body.get("work_location")
+                    gender = req_body.get("gender")
+                    birth_date = req_body.get("birth_date")
+                    start_date = req_body.get("start_date")
+                    end_date = req_body.get("end_date")
+
+                    put_data = user_status_functions.update_user_status(
+                        status,
+                        employee_environment,
+                        department,
+                        work_type,
+                        manager_id,
+                        work_location,
+                        gender,
+                        birth_date,
+                        start_date,
+                        end_date,
+                        domain_rhonda_id,
+                    )
+
+                    # When this domain_rhonda_id doesn't exist, then update function will return None
+                    if not put_data:
+                        return func.HttpResponse(
+                            body=json.dumps({"message": f"{domain_rhonda_id} does not exist!"}),
+                            status_code=404,
+                            charset="utf-8",
+                            mimetype="application/json",
+                        )
+                    else:
+                        return func.HttpResponse(
+                            body=json.dumps(put_data), 
+                            status_code=200, 
+                            charset='utf-8', 
+                            mimetype='application/json'
+                        )
+            else:
+                # Return 404 if UUID is not passed in the URL
+                return func.HttpResponse(
+                    body=json.dumps({"message": f"Update failed! domain_rhonda_id is required in URL for PUT request!"}), #HY - Please check the appropriate message
+                    status_code=404,
+                    charset="utf-8",
+                    mimetype="application/json",
+                )
+
+        except Exception as error:
+            # Highly recommend to use exception to throw error related to Internal Server Error issue.
+            # 500 error code should be return in the exception block
+            # If error related to missing domain_rhonda_id should be handled in the if/else statement
+            logging.error(f"Error:{error}")
+            return func.HttpResponse(
+                body=json.dumps({"message": f"{error}"}),
+                status_code=500,
+                charset="utf-8",
+                mimetype="application/json",
+            )
+
+    # DELETE data
+    elif "DELETE" == req.method:
+        try:
+            domain_rhonda_id = req.route_params.get("domain_rhonda_id", None)
+
+            if domain_rhonda_id:
+                delete_data = user_status_functions.delete_user_status(domain_rhonda_id)
+
+                #When this domain_rhonda_id doesn't exist, then delete function will return None
+                if not delete_data:
+                    return func.HttpResponse(
+                        body=json.dumps({"message": f"{domain_rhonda_id} does not exist!"}),
+                        status_code=404,
+                        charset="utf-8",
+                        mimetype="application/json",
+                    )    
+                else:
+                    return func.HttpResponse(
+                        body=json.dumps({"message": f"{delete_data} has been deleted successfully!"}),
+                        status_code=204, 
+                        charset='utf-8', 
+                        mimetype='application/json'
+                    )
+
+            else:
+                # If no UUID is passed
+                return func.HttpResponse(
+                    body=json.dumps({"message": f"domain_rhonda_id in URL is required in DELETE request!"}), #HY - Please check the appropriate message
+                    status_code=404,
+                    charset="utf-8",
+                    mimetype="application/json",
+                )
+        except Exception as error:
+            # Highly recommend to use exception to throw error related to Internal Server Error issue.
+            # 500 error code should be return in the exception block
+            # If error related to missing domain_rhonda_id should be handled in the if/else statement
+
+            logging.error(f"Error:{error}")
+            return func.HttpResponse(
+                body=json.dumps({"message": f"{error}"}),
+                status_code=500,
+                charset="utf-8",
+                mimetype="application/json",
+            )
+
+    else:
+        # POST data
+        try:
+            req_body = req.get_json()
+            # Need to handle duplication 
+            # Return appropriate message if request failed
+
+            ''' -----
+            Need a validation right here
+            1. Check if all required fields are passed, else return 400 with error message containing what fields are missing
+            2. Check field type
+            3. Check field length (Make sure does not exceed the max length allowed in the db)
+            4. So on ....
+            ------ '''
+            vali_result, vali_error = field_validation.post_field_validation(req_body)
+
+            if not vali_result :
+                return func.HttpResponse(
+                    body=json.dumps({"message": f"{vali_error}"}),
+                    status_code=400,
+                    charset="utf-8",
+                    mimetype="application/json",
+                )
+
+            # When field validation passed, then move forward to call post function
+            else:
+                domain_rhonda_id = req_body.get("domain_rhonda_id", None) # .get('', None)
+                status = req_body.get("status")
+                employee_environment = req_body.get("employee_environment")
+                department = req_body.get("department")
+                work_type = req_body.get("work_type")
+                manager_id = req_body.get("manager_id")
+                work_location = req_body.get("work_location")
+                gender = req_body.get("gender")
+                birth_date = req_body.get("birth_date")
+                start_date = req_body.get("start_date")
+                end_date = req_body.get("end_date")
+
+                post_data = user_status_functions.add_user_status(
+                    domain_rhonda_id,
+                    status,
+                    employee_environment,
+                    department,
+                    work_type,
+                    manager_id,
+                    work_location,
+                    gender,
+                    birth_date,
+                    start_date,
+                    end_date,
+                )
+
+                # When this domain_rhonda_id exists, then post function will return None
+                if not post_data:
+                    return func.HttpResponse(
+                        body=json.dumps({"message": f"{domain_rhonda_id} already exist!"}),
+                        status_code=409,
+                        charset="utf-8",
+                        mimetype="application/json",
+                    )
+                else:
+                    return func.HttpResponse(
+                        body=json.dumps({"message": f"{post_data} has been inserted successfully!"}),
+                        status_code=201, 
+                        charset='utf-8', 
+                        mimetype='application/json'
+                    )
+
+        except Exception as error:
+            # Error code 500
+            logging.error(f"Error:{error}")
+            return func.HttpResponse(
+                body=json.dumps({"message": f"{error}"}),
+                status_code=500,
+                charset="utf-8",
+                mimetype="application/json",
+            )
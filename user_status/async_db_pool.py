@@ -0,0 +1,191 @@
+#!/usr/bin/python
+import asyncio
+from contextlib import asynccontextmanager
+import logging
+import time
+import os
+import psycopg
+from psycopg.pq import TransactionStatus
+from . import db_pool
+from . import instrumentation
+from . import prepared
+
+
+# Pool settings of the async handler, its connections are separate from the sync pool's
+ASYNC_POOL_MIN_SIZE = int(os.environ.get("RP_ASYNC_POOL_MIN_SIZE", 1))
+ASYNC_POOL_MAX_SIZE = int(os.environ.get("RP_ASYNC_POOL_MAX_SIZE", 10))
+
+
+def connection_params():
+    """db_pool.connection_params in the form psycopg (3) expects.
+
+    Returns:
+        [dict]: keyword arguments for psycopg.AsyncConnection.connect
+    """
+    params = db_pool.connection_params()
+    params["dbname"] = params.pop("database")
+    if not prepared.PREPARED_STATEMENTS_ENABLED:
+        # psycopg prepares a query on its own once it ran prepare_threshold (5) times on a connection
+        params["prepare_threshold"] = None
+    return params
+
+
+class AsyncConnectionPool:
+    """asyncio pool of psycopg (3) connections.
+
+    Same behaviour as db_pool.ConnectionPool: up to max_size connections, idle
+    ones reused most recently used first and pinged after POOL_HEALTH_CHECK_INTERVAL.
+    Waiting for a connection yields to the event loop instead of blocking the worker.
+    """
+
+    def __init__(self, min_size=ASYNC_POOL_MIN_SIZE, max_size=ASYNC_POOL_MAX_SIZE, **connect_kwargs):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.connect_kwargs = connect_kwargs
+        self._idle = []
+        self._last_used = {}
+        self._slots = asyncio.BoundedSemaphore(max_size)
+        self.closed = False
+
+    async def _connect(self):
+        for attempt in range(db_pool.CONNECT_RETRIES + 1):
+            try:
+                return await psycopg.AsyncConnection.connect(**self.connect_kwargs)
+            except psycopg.OperationalError as error:
+                if attempt == db_pool.CONNECT_RETRIES:
+                    raise
+                delay = db_pool.backoff_delay(attempt)
+                logging.warning(f"DB Pool: connect failed ({error}), retry {attempt + 1} in {delay:.2f} seconds")
+                await asyncio.sleep(delay)
+
+    async def _is_healthy(self, conn):
+        """Connections used recently are trusted without a round trip."""
+        if conn.closed:
+            return False
+        if time.monotonic() - self._last_used.get(conn, 0) < db_pool.POOL_HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            async with conn.cursor() as cursor:
+                await cursor.execute(db_pool.HEALTH_CHECK_QUERY)
+            await conn.rollback()
+            return True
+        except (psycopg.OperationalError, psycopg.InterfaceError):
+            return False
+
+    async def _discard(self, conn):
+        self._last_used.pop(conn, None)
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+    async def getconn(self, timeout=db_pool.POOL_CHECKOUT_TIMEOUT):
+        """Borrow a healthy connection, waiting up to timeout seconds for a free slot.
+
+        Returns:
+            [AsyncConnection]: psycopg connection, must be handed back with putconn.
+        """
+        if self.closed:
+            raise psycopg.InterfaceError("connection pool is closed")
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise db_pool.PoolTimeout(f"No free connection after {timeout} seconds (max_size={self.max_size})")
+        try:
+            while self._idle:
+                conn = self._idle.pop()
+                if await self._is_healthy(conn):
+                    return conn
+                logging.warning("DB Pool: discarding broken connection")
+                await self._discard(conn)
+            return await self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def putconn(self, conn, close=False):
+        """Hand a connection back. Broken or explicitly closed connections are dropped."""
+        try:
+            if close or self.closed or conn.closed:
+                await self._discard(conn)
+                return
+            if conn.info.transaction_status != TransactionStatus.IDLE:
+                await conn.rollback()
+            self._last_used[conn] = time.monotonic()
+            self._idle.append(conn)
+        except (psycopg.OperationalError, psycopg.InterfaceError):
+            await self._discard(conn)
+        finally:
+            self._slots.release()
+
+    async def fill(self):
+        """Open connections until min_size are idle."""
+        for _ in range(max(self.min_size - len(self._idle), 0)):
+            conn = await self._connect()
+            self._last_used[conn] = time.monotonic()
+            self._idle.append(conn)
+
+    async def closeall(self):
+        self.closed = True
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await self._discard(conn)
+
+
+_pool = None
+_pool_lock = None
+
+
+async def get_pool():
+    """Return the async connection pool of this worker, creating it on first use.
+
+    Returns:
+        [AsyncConnectionPool]: pool shared by every async request on this worker.
+    """
+    global _pool, _pool_lock
+    if _pool is None:
+        if _pool_lock is None:
+            _pool_lock = asyncio.Lock()
+        async with _pool_lock:
+            if _pool is None:
+                pool = AsyncConnectionPool(ASYNC_POOL_MIN_SIZE, ASYNC_POOL_MAX_SIZE, **connection_params())
+                await pool.fill()
+                _pool = pool
+    return _pool
+
+
+async def close_pool():
+    """Close every idle connection. The next checkout creates a new pool."""
+    global _pool, _pool_lock
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.closeall()
+    _pool_lock = None
+
+
+@asynccontextmanager
+async def connection():
+    """Borrow a connection for one unit of work, like db_pool.connection.
+
+    The transaction is committed when the block exits normally and rolled back
+    if it raises. A connection that lost the server is dropped so the next
+    checkout reconnects.
+
+    Yields:
+        [AsyncConnection]: psycopg connection
+    """
+    with instrumentation.span("pool_checkout"):
+        pool = await get_pool()
+        conn = await pool.getconn()
+    broken = False
+    try:
+        yield conn
+        await conn.commit()
+    except (psycopg.OperationalError, psycopg.InterfaceError):
+        broken = True
+        raise
+    except BaseException:
+        await conn.rollback()
+        raise
+    finally:
+        await pool.putconn(conn, close=broken)
@@ -0,0 +1,252 @@
+import asyncio
+import inspect
+import logging
+import json
+from datetime import datetime
+import azure.functions as func
+from . import main as sync_main
+from . import user_status_functions
+from . import user_status_functions_async
+from . import field_validation
+from . import batch
+from . import pagination
+from . import conditional
+from . import instrumentation
+from . import idempotency
+
+
+# The sync handler without its instrumentation wrapper, the async one already times the request
+_sync_handler = inspect.unwrap(sync_main)
+
+
+def _message(message, status_code):
+    return func.HttpResponse(
+        body=json.dumps({"message": f"{message}"}),
+        status_code=status_code,
+        charset="utf-8",
+        mimetype="application/json",
+    )
+
+
+def _delegated(req):
+    """Routes without an async implementation (bulk, batch, reports, export, metrics, ...)."""
+    url_prefix = req.route_params.get("url_prefix")
+    if url_prefix == "bulk":
+        return True
+    if batch.is_batch_lookup(req):
+        return True
+    if req.method == "GET":
+        if url_prefix not in (None, "user-id", "user-status-hr"):
+            return True
+        return bool(req.params.get("format")) or req.params.get("serializer") == "postgres"
+    return False
+
+
+@instrumentation.instrumented
+@idempotency.idempotent
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    """async def main for the user-status-async function: same API as user_status.main.
+
+    GET (one row and every list variant), POST, PUT and DELETE run on
+    user_status_functions_async, so one worker interleaves many requests' database
+    calls and a list page's total is counted while the page is read. The other
+    routes run the sync handler on a thread.
+    """
+    logging.info(f"API: user_status (async)")
+    logging.info(f"Timestamp: {datetime.utcnow()}")
+    logging.info(f"URL: {req.url}")
+    logging.info(f"Method: {req.method}")
+
+    user_status_functions.change_listener.ensure_started()
+
+    if _delegated(req):
+        return await asyncio.to_thread(_sync_handler, req)
+
+    if "GET" == req.method:
+        try:
+            domain_rhonda_id = req.route_params.get("domain_rhonda_id")
+            url_prefix = req.route_params.get("url_prefix")
+            page_size = int(req.params.get("page_size", 20))
+            page = int(req.params.get("page", 1))
+
+            if url_prefix == "user-status-hr":
+                allowed_fields = tuple(user_status_functions.USER_STATUS_WITH_MANAGER_COLUMNS)
+            else:
+                allowed_fields = user_status_functions.USER_STATUS_COLUMNS
+            try:
+                fields = user_status_functions.parse_fields(req.params.get("fields"), allowed_fields)
+            except ValueError as error:
+                return _message(error, 400)
+
+            # GET data for for specific domain_rhonda_id
+            if url_prefix == "user-id":
+                result = await user_status_functions_async.get_user_status_by_domain_rhonda_id(
+                    domain_rhonda_id, fields
+                )
+                if not result:
+                    return _message(f"{domain_rhonda_id} does not exist!", 404)
+                return conditional.json_response(req, result, [result])
+
+            cursor = req.params.get("cursor")
+            if cursor is not None:
+                try:
+                    cursor_id, cursor_direction = pagination.decode_cursor(cursor)
+                except ValueError as error:
+                    return _message(error, 400)
+
+            include_count = req.params.get("include_count", "true").lower() != "false"
+            count_mode = req.params.get("count_mode", user_status_functions.COUNT_MODE_EXACT)
+            if count_mode not in user_status_functions.COUNT_MODES:
+                return _message(f"count_mode must be one of {', '.join(user_status_functions.COUNT_MODES)}", 400)
+
+            # Page and total are read concurrently on two connections
+            if url_prefix == "user-status-hr":
+                status_param = req.params.get("status")
+                employee_environment_param = req.params.get("environment")
+                search_param = req.params.get("q")
+                try:
+                    user_status_functions.search_pattern(search_param)
+                except ValueError as error:
+                    return _message(error, 400)
+                if cursor is not None:
+                    user_status_dat, has_more, count = (
+                        await user_status_functions_async.get_all_user_status_with_manager_keyset(
+                            status_param,
+                            employee_environment_param,
+                            page_size,
+                            cursor_id,
+                            cursor_direction,
+                            include_count,
+                            fields,
+                            count_mode,
+                            search_param,
+                        )
+                    )
+                else:
+                    user_status_dat, count = await user_status_functions_async.get_all_user_status_with_manager(
+                        status_param,
+                        employee_environment_param,
+                        page_size,
+                        page,
+                        include_count,
+                        fields,
+                        count_mode,
+                        search_param,
+                    )
+            elif cursor is not None:
+                user_status_dat, has_more, count = await user_status_functions_async.get_all_user_status_keyset(
+                    page_size, cursor_id, cursor_direction, include_count, fields, count_mode
+                )
+            else:
+                user_status_dat, count = await user_status_functions_async.get_all_user_status(
+                    page_size, page, include_count, fields, count_mode
+                )
+
+            if cursor is not None:
+                previous_cursor, next_cursor = pagination.cursor_links(
+                    user_status_dat, has_more, cursor_id, cursor_direction
+                )
+                result = {
+                    "count": count,
+                    "previous": {"cursor": previous_cursor, "page_size": page_size},
+                    "next": {"cursor": next_cursor, "page_size": page_size},
+                    "results": user_status_dat,
+                }
+            else:
+                max_page = user_status_functions.user_status_max_page(page_size, count) if include_count else None
+                previous_page, next_page = pagination.page_links(page, max_page, len(user_status_dat), page_size)
+                result = {
+                    "count": count,
+                    "max_page": max_page,
+                    "previous": {"page": previous_page, "page_size": page_size},
+                    "next": {"page": next_page, "page_size": page_size},
+                    "results": user_status_dat,
+                }
+
+            meta = {key: value for key, value in result.items() if key != "results"}
+            return conditional.json_response(req, result, user_status_dat or [], meta)
+
+        except Exception as error:
+            logging.error(f"Error:{error}")
+            return _message(error, 500)
+
+    # PUT data
+    elif "PUT" == req.method:
+        try:
+            req_body = req.get_json()
+            domain_rhonda_id = req.route_params.get("domain_rhonda_id", None)
+            if not domain_rhonda_id:
+                return _message("Update failed! domain_rhonda_id is required in URL for PUT request!", 404)
+
+            vali_result, vali_error = field_validation.put_field_validation(req_body)
+            if not vali_result:
+                return _message(vali_error, 400)
+
+            put_data = await user_status_functions_async.update_user_status(
+                req_body.get("status"),
+                req_body.get("employee_environment"),
+                req_body.get("department"),
+                req_body.get("work_type"),
+                req_body.get("manager_id"),
+                req_body.get("work_location"),
+                req_body.get("gender"),
+                req_body.get("birth_date"),
+                req_body.get("start_date"),
+                req_body.get("end_date"),
+                domain_rhonda_id,
+            )
+            # When this domain_rhonda_id doesn't exist, then update function will return None
+            if not put_data:
+                return _message(f"{domain_rhonda_id} does not exist!", 404)
+            return func.HttpResponse(
+                body=json.dumps(put_data), status_code=200, charset="utf-8", mimetype="application/json"
+            )
+        except Exception as error:
+            logging.error(f"Error:{error}")
+            return _message(error, 500)
+
+    # DELETE data
+    elif "DELETE" == req.method:
+        try:
+            domain_rhonda_id = req.route_params.get("domain_rhonda_id", None)
+            if not domain_rhonda_id:
+                return _message("domain_rhonda_id in URL is required in DELETE request!", 404)
+
+            delete_data = await user_status_functions_async.delete_user_status(domain_rhonda_id)
+            # When this domain_rhonda_id doesn't exist, then delete function will return None
+            if not delete_data:
+                return _message(f"{domain_rhonda_id} does not exist!", 404)
+            return _message(f"{delete_data} has been deleted successfully!", 204)
+        except Exception as error:
+            logging.error(f"Error:{error}")
+            return _message(error, 500)
+
+    # POST data
+    else:
+        try:
+            req_body = req.get_json()
+            vali_result, vali_error = field_validation.post_field_validation(req_body)
+            if not vali_result:
+                return _message(vali_error, 400)
+
+            domain_rhonda_id = req_body.get("domain_rhonda_id", None)
+            post_data = await user_status_functions_async.add_user_status(
+                domain_rhonda_id,
+                req_body.get("status"),
+                req_body.get("employee_environment"),
+                req_body.get("department"),
+                req_body.get("work_type"),
+                req_body.get("manager_id"),
+                req_body.get("work_location"),
+                req_body.get("gender"),
+                req_body.get("birth_date"),
+                req_body.get("start_date"),
+                req_body.get("end_date"),
+            )
+            # When this domain_rhonda_id exists, then post function will return None
+            if not post_data:
+                return _message(f"{domain_rhonda_id} already exist!", 409)
+            return _message(f"{post_data} has been inserted successfully!", 201)
+        except Exception as error:
+            logging.error(f"Error:{error}")
+            return _message(error, 500)
@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import azure.functions as func
+from . import conditional
+from . import serializers
+from . import user_status_functions
+
+
+# Most domain_rhonda_ids one batch lookup may ask for
+BATCH_MAX_IDS = int(os.environ.get("RP_BATCH_MAX_IDS", 500))
+# POST user-status/user-id/batch, POST user-status/user-id stays the single-row create
+BATCH_PATH = "batch"
+
+
+def is_batch_lookup(req):
+    """True for GET user-status/user-id?ids=... and POST user-status/user-id/batch."""
+    if req.route_params.get("url_prefix") != "user-id":
+        return False
+    domain_rhonda_id = req.route_params.get("domain_rhonda_id")
+    if req.method == "GET":
+        return not domain_rhonda_id and "ids" in req.params
+    return req.method == "POST" and domain_rhonda_id == BATCH_PATH
+
+
+def parse_ids(req):
+    """Read the ids of a batch lookup: ?ids=a,b,c on GET, {"ids": [...]} or a JSON array on POST.
+
+    Args:
+        req ([HttpRequest]): batch lookup request
+
+    Raises:
+        ValueError: when no ids are given, an id is not a string or there are too many
+
+    Returns:
+        [list]: ids in request order without duplicates
+    """
+    if req.method == "GET":
+        ids = [value.strip() for value in req.params.get("ids", "").split(",")]
+    else:
+        try:
+            body = req.get_json()
+        except ValueError:
+            raise ValueError("Request body must be JSON!")
+        ids = body.get("ids") if isinstance(body, dict) else body
+        if not isinstance(ids, list) or not all(isinstance(value, str) for value in ids):
+            raise ValueError("ids must be a list of strings!")
+    ids = list(dict.fromkeys(value for value in ids if value))
+    if not ids:
+        raise ValueError("ids is required!")
+    if len(ids) > BATCH_MAX_IDS:
+        raise ValueError(f"Batch lookup is limited to {BATCH_MAX_IDS} ids!")
+    return ids
+
+
+def batch_lookup_request(req):
+    """Handle GET user-status/user-id?ids=... and POST user-status/user-id/batch.
+
+    Every requested id is a key of results; ids that don't exist map to null
+    and are listed in not_found.
+
+    Args:
+        req ([HttpRequest]): batch lookup request
+
+    Returns:
+        [HttpResponse]: 200 with the rows by id, 400 when the ids or fields are invalid
+    """
+    try:
+        domain_rhonda_ids = parse_ids(req)
+        fields = user_status_functions.parse_fields(req.params.get("fields"), user_status_functions.USER_STATUS_COLUMNS)
+    except ValueError as error:
+        return func.HttpResponse(
+            body=json.dumps({"message": f"{error}"}),
+            status_code=400,
+            charset="utf-8",
+            mimetype="application/json",
+        )
+
+    try:
+        results = user_status_functions.get_user_status_by_domain_rhonda_ids(domain_rhonda_ids, fields)
+        rows = [row for row in results.values() if row is not None]
+        not_found = [domain_rhonda_id for domain_rhonda_id, row in results.items() if row is None]
+        result = {"count": len(rows), "not_found": not_found, "results": results}
+        if req.method == "GET":
+            return conditional.json_response(req, result, rows, {"not_found": tuple(not_found)})
+        return func.HttpResponse(
+            body=serializers.dumps(result), status_code=200, charset="utf-8", mimetype="application/json"
+        )
+    except Exception as error:
+        logging.error(f"Error:{error}")
+        return func.HttpResponse(
+            body=json.dumps({"message": f"{error}"}),
+            status_code=500,
+            charset="utf-8",
+            mimetype="application/json",
+        )
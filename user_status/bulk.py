@@ -0,0 +1,271 @@
+import json
+import logging
+import os
+import azure.functions as func
+from . import field_validation
+from . import user_status_functions
+
+
+# Bulk settings
+BULK_MAX_ROWS = int(os.environ.get("RP_BULK_MAX_ROWS", 10000))
+BULK_CHUNK_SIZE = int(os.environ.get("RP_BULK_CHUNK_SIZE", 500))
+BULK_MAX_CHUNK_SIZE = 5000
+
+# Per-row results
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+CONFLICT = "conflict"
+NOT_FOUND = "not_found"
+INVALID = "invalid"
+# The row's chunk wasn't committed, see the response message
+NOT_COMMITTED = "not_committed"
+
+USER_STATUS_FIELDS = (
+    "status",
+    "employee_environment",
+    "department",
+    "work_type",
+    "manager_id",
+    "work_location",
+    "gender",
+    "birth_date",
+    "start_date",
+    "end_date",
+)
+
+
+def parse_bulk_body(body):
+    """Read a bulk request body, either a JSON array or NDJSON (one JSON value per line).
+
+    Args:
+        body ([bytes]): raw request body
+
+    Raises:
+        ValueError: when the body is neither
+
+    Returns:
+        [list]: items
+    """
+    text = body.decode("utf-8") if isinstance(body, bytes) else body
+    if not text.strip():
+        raise ValueError("Request body is empty!")
+    try:
+        items = json.loads(text)
+        if isinstance(items, list):
+            return items
+        # A single JSON object is a one-line NDJSON body
+        return [items]
+    except ValueError:
+        pass
+
+    items = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as error:
+            raise ValueError(f"Invalid NDJSON on line {line_number}: {error}")
+    return items
+
+
+def chunk_size_param(value):
+    """Chunk size from the query string, defaulting to RP_BULK_CHUNK_SIZE."""
+    if value is None:
+        return BULK_CHUNK_SIZE
+    chunk_size = int(value)
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive number!")
+    return min(chunk_size, BULK_MAX_CHUNK_SIZE)
+
+
+def _result(index, domain_rhonda_id, result, errors=None):
+    row = {"index": index, "domain_rhonda_id": domain_rhonda_id, "result": result}
+    if errors:
+        row["errors"] = errors
+    return row
+
+
+def _summary(results):
+    summary = {}
+    for row in results:
+        summary[row["result"]] = summary.get(row["result"], 0) + 1
+    return summary
+
+
+def _response(results, error):
+    """Summary and per-row results, with the database error when a chunk failed."""
+    response = {"summary": _summary(results), "results": results}
+    if error is not None:
+        response["message"] = error
+    return response
+
+
+def _not_committed(index, domain_rhonda_id, error):
+    return _result(index, domain_rhonda_id, NOT_COMMITTED, {"database": [error]})
+
+
+def bulk_add(items, chunk_size):
+    """Validate and insert items. Existing domain_rhonda_ids are reported as conflict.
+
+    Returns:
+        [dict]: summary and per-row results in request order, plus a message when a chunk failed
+    """
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = _result(index, None, INVALID, {"item": ["must be of dict type"]})
+            continue
+        domain_rhonda_id = item.get("domain_rhonda_id")
+        vali_result, vali_error = field_validation.post_field_validation(item)
+        if not vali_result:
+            results[index] = _result(index, domain_rhonda_id, INVALID, vali_error)
+            continue
+        valid.append((index, item))
+
+    created, committed, error = user_status_functions.bulk_add_user_status(
+        [
+            (item["domain_rhonda_id"],) + tuple(item.get(field) for field in USER_STATUS_FIELDS)
+            for _, item in valid
+        ],
+        chunk_size,
+    )
+    for position, (index, item) in enumerate(valid):
+        domain_rhonda_id = item["domain_rhonda_id"]
+        if position >= committed:
+            results[index] = _not_committed(index, domain_rhonda_id, error)
+        # Only the first occurrence of a repeated id can have been created
+        elif domain_rhonda_id in created:
+            created.discard(domain_rhonda_id)
+            results[index] = _result(index, domain_rhonda_id, CREATED)
+        else:
+            results[index] = _result(index, domain_rhonda_id, CONFLICT)
+    return _response(results, error)
+
+
+def bulk_update(items, chunk_size):
+    """Validate and update items by domain_rhonda_id. Unknown ids are reported as not_found.
+
+    Returns:
+        [dict]: summary and per-row results in request order, plus a message when a chunk failed
+    """
+    results = [None] * len(items)
+    valid = []
+    seen = set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = _result(index, None, INVALID, {"item": ["must be of dict type"]})
+            continue
+        fields = dict(item)
+        domain_rhonda_id = fields.pop("domain_rhonda_id", None)
+        if not isinstance(domain_rhonda_id, str) or not domain_rhonda_id:
+            results[index] = _result(index, domain_rhonda_id, INVALID, {"domain_rhonda_id": ["required field"]})
+            continue
+        if domain_rhonda_id in seen:
+            results[index] = _result(
+                index, domain_rhonda_id, INVALID, {"domain_rhonda_id": ["duplicate in request"]}
+            )
+            continue
+        vali_result, vali_error = field_validation.put_field_validation(fields)
+        if not vali_result:
+            results[index] = _result(index, domain_rhonda_id, INVALID, vali_error)
+            continue
+        seen.add(domain_rhonda_id)
+        valid.append((index, domain_rhonda_id, fields))
+
+    updated, committed, error = user_status_functions.bulk_update_user_status(
+        [
+            (domain_rhonda_id,) + tuple(fields.get(field) for field in USER_STATUS_FIELDS)
+            for _, domain_rhonda_id, fields in valid
+        ],
+        chunk_size,
+    )
+    for position, (index, domain_rhonda_id, _) in enumerate(valid):
+        if position >= committed:
+            results[index] = _not_committed(index, domain_rhonda_id, error)
+        else:
+            results[index] = _result(index, domain_rhonda_id, UPDATED if domain_rhonda_id in updated else NOT_FOUND)
+    return _response(results, error)
+
+
+def bulk_delete(items, chunk_size):
+    """Delete items given as domain_rhonda_id strings or {"domain_rhonda_id": ...} objects.
+
+    Returns:
+        [dict]: summary and per-row results in request order, plus a message when a chunk failed
+    """
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        domain_rhonda_id = item.get("domain_rhonda_id") if isinstance(item, dict) else item
+        if not isinstance(domain_rhonda_id, str) or not domain_rhonda_id:
+            results[index] = _result(index, None, INVALID, {"domain_rhonda_id": ["required field"]})
+            continue
+        valid.append((index, domain_rhonda_id))
+
+    deleted, committed, error = user_status_functions.bulk_delete_user_status(
+        [domain_rhonda_id for _, domain_rhonda_id in valid], chunk_size
+    )
+    for position, (index, domain_rhonda_id) in enumerate(valid):
+        if position >= committed:
+            results[index] = _not_committed(index, domain_rhonda_id, error)
+        elif domain_rhonda_id in deleted:
+            deleted.discard(domain_rhonda_id)
+            results[index] = _result(index, domain_rhonda_id, DELETED)
+        else:
+            results[index] = _result(index, domain_rhonda_id, NOT_FOUND)
+    return _response(results, error)
+
+
+def bulk_request(req):
+    """Handle POST/PUT/DELETE on user-status/bulk.
+
+    Args:
+        req ([HttpRequest]): request with a JSON array or NDJSON body
+
+    Returns:
+        [HttpResponse]: 200 with per-row results, 400 when the body can't be read, 500 with per-row
+        results when a chunk failed (rows of earlier chunks stay committed)
+    """
+    try:
+        items = parse_bulk_body(req.get_body())
+        chunk_size = chunk_size_param(req.params.get("chunk_size"))
+    except ValueError as error:
+        return func.HttpResponse(
+            body=json.dumps({"message": f"{error}"}),
+            status_code=400,
+            charset="utf-8",
+            mimetype="application/json",
+        )
+    if len(items) > BULK_MAX_ROWS:
+        return func.HttpResponse(
+            body=json.dumps({"message": f"Bulk request is limited to {BULK_MAX_ROWS} rows!"}),
+            status_code=400,
+            charset="utf-8",
+            mimetype="application/json",
+        )
+
+    try:
+        if req.method == "POST":
+            result = bulk_add(items, chunk_size)
+        elif req.method == "PUT":
+            result = bulk_update(items, chunk_size)
+        else:
+            result = bulk_delete(items, chunk_size)
+        # A 500 keeps an Idempotency-Key retryable: committed rows come back as conflict/not_found
+        return func.HttpResponse(
+            body=json.dumps(result),
+            status_code=500 if "message" in result else 200,
+            charset="utf-8",
+            mimetype="application/json",
+        )
+    except Exception as error:
+        logging.error(f"Error:{error}")
+        return func.HttpResponse(
+            body=json.dumps({"message": f"{error}"}),
+            status_code=500,
+            charset="utf-8",
+            mimetype="application/json",
+        )
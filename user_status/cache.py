@@ -0,0 +1,286 @@
+import abc
+from collections import OrderedDict
+import json
+import logging
+import os
+import threading
+import time
+
+
+# Read-through cache for single user_status lookups
+USER_CACHE_SIZE = int(os.environ.get("RP_USER_CACHE_SIZE", 5000))
+USER_CACHE_TTL = float(os.environ.get("RP_USER_CACHE_TTL", 60))
+# Optional shared backend (Redis) so scaled-out instances share entries
+CACHE_REDIS_URL = os.environ.get("RP_CACHE_REDIS_URL")
+# Recent invalidations remembered per key, so a fill that read the row before one isn't cached
+INVALIDATION_WINDOW = 10000
+
+
+class TTLCache:
+    """Small thread-safe in-process cache whose entries expire after ttl seconds."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with a TTL per entry and hit/miss/eviction counters."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class CacheBackend(abc.ABC):
+    """Interface of a shared cache backend. Values are JSON-serializable."""
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Value stored under key, None when there is none or it expired."""
+
+    @abc.abstractmethod
+    def set(self, key, value, ttl):
+        """Store value under key for ttl seconds."""
+
+    @abc.abstractmethod
+    def delete(self, key):
+        """Drop key, a missing key is not an error."""
+
+
+class LocalCacheBackend(CacheBackend):
+    """In-memory stand-in for a shared backend, e.g. for local runs and tests."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return json.loads(value)
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (json.dumps(value), time.monotonic() + ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Shared backend on Redis. Needs the optional redis package."""
+
+    def __init__(self, url, prefix="user_status:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(int(ttl), 1))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class ReadThroughCache:
+    """Local LRU in front of an optional shared backend.
+
+    Backend failures are logged and treated as misses so the database stays the source of truth.
+
+    A miss is filled with set(key, value, generation), generation taken before the row was read.
+    An invalidation of the key in between (a write or a NOTIFY) makes the fill a no-op, so a row
+    read before a write can't outlive it in the cache. Invalidations older than the last
+    INVALIDATION_WINDOW keys count as happening all at once, which only drops a few more fills.
+    """
+
+    def __init__(self, local, shared=None, invalidation_window=INVALIDATION_WINDOW):
+        self.local = local
+        self.shared = shared
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self.stale_fills = 0
+        self.invalidation_window = invalidation_window
+        self._version = 0
+        # Invalidations before this version are no longer tracked per key
+        self._floor = 0
+        self._invalidated = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """False when neither the local LRU (size 0) nor a shared backend can hold entries."""
+        return self.local.max_size > 0 or self.shared is not None
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+        try:
+            value = self.shared.get(key)
+        except Exception as error:
+            self.shared_errors += 1
+            logging.warning(f"Cache backend get failed: {error}")
+            return None
+        if value is not None:
+            self.shared_hits += 1
+            self.local.set(key, value)
+        return value
+
+    def generation(self):
+        """Token to pass to set() for a value about to be read from the database."""
+        with self._lock:
+            return self._version
+
+    def _invalidated_since(self, key, generation):
+        with self._lock:
+            return self._invalidated.get(key, self._floor) > generation
+
+    def _bump(self, key=None):
+        with self._lock:
+            self._version += 1
+            if key is None:
+                self._floor = self._version
+                self._invalidated.clear()
+                return
+            self._invalidated[key] = self._version
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self.invalidation_window:
+                _, version = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, version)
+
+    def set(self, key, value, generation=None):
+        if generation is not None and self._invalidated_since(key, generation):
+            self.stale_fills += 1
+            return
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, self.local.ttl)
+            except Exception as error:
+                self.shared_errors += 1
+                logging.warning(f"Cache backend set failed: {error}")
+
+    def invalidate(self, key):
+        self._bump(key)
+        self.local.invalidate(key)
+        if self.shared is not None:
+            try:
+                self.shared.delete(key)
+            except Exception as error:
+                self.shared_errors += 1
+                logging.warning(f"Cache backend delete failed: {error}")
+
+    def clear(self):
+        self._bump()
+        self.local.clear()
+
+    def stats(self):
+        stats = self.local.stats()
+        stats["stale_fills"] = self.stale_fills
+        stats["shared_backend"] = type(self.shared).__name__ if self.shared is not None else None
+        stats["shared_hits"] = self.shared_hits
+        stats["shared_errors"] = self.shared_errors
+        return stats
+
+
+def build_user_status_cache():
+    """Create the user_status read-through cache from RP_USER_CACHE_* / RP_CACHE_REDIS_URL settings."""
+    shared = None
+    if CACHE_REDIS_URL:
+        try:
+            shared = RedisCacheBackend(CACHE_REDIS_URL)
+        except Exception as error:
+            logging.error(f"Cache backend unavailable, using local cache only: {error}")
+    return ReadThroughCache(LRUCache(USER_CACHE_SIZE, USER_CACHE_TTL), shared)
@@ -0,0 +1,64 @@
+import json
+import logging
+import os
+import azure.functions as func
+from . import conditional
+from . import pagination
+from . import user_status_functions
+
+
+# Changes per page of GET user-status/changes, and the most a client may ask for
+CHANGES_PAGE_SIZE = int(os.environ.get("RP_CHANGES_PAGE_SIZE", 500))
+CHANGES_MAX_PAGE_SIZE = int(os.environ.get("RP_CHANGES_MAX_PAGE_SIZE", 5000))
+# Changes younger than this are held back until the next pull: longer than any write transaction
+CHANGES_SAFETY_SECONDS = float(os.environ.get("RP_CHANGES_SAFETY_SECONDS", 5))
+
+
+def changes_request(req):
+    """Handle GET user-status/changes?since=<watermark>&page_size=N.
+
+    Returns the rows inserted or updated and the rows deleted after the watermark,
+    oldest first. Clients store the returned watermark and pass it as ?since= on the
+    next pull; without ?since= the feed starts at the beginning (initial full sync).
+
+    Args:
+        req ([HttpRequest]): change feed request
+
+    Returns:
+        [HttpResponse]: 200 with the changes, 400 when the parameters are invalid
+    """
+    since = req.params.get("since", "")
+    try:
+        since_at, since_id = pagination.decode_watermark(since)
+        page_size = int(req.params.get("page_size", CHANGES_PAGE_SIZE))
+        if page_size < 1 or page_size > CHANGES_MAX_PAGE_SIZE:
+            raise ValueError(f"page_size must be between 1 and {CHANGES_MAX_PAGE_SIZE}!")
+    except ValueError as error:
+        return func.HttpResponse(
+            body=json.dumps({"message": f"{error}"}),
+            status_code=400,
+            charset="utf-8",
+            mimetype="application/json",
+        )
+
+    try:
+        changes, has_more, last = user_status_functions.get_user_status_changes(
+            since_at, since_id, page_size, CHANGES_SAFETY_SECONDS
+        )
+        # Nothing new: the client keeps its watermark
+        watermark = pagination.encode_watermark(*last) if last else since or None
+        meta = {
+            "count": len(changes),
+            "has_more": has_more,
+            "watermark": watermark,
+            "next": {"since": watermark, "page_size": page_size},
+        }
+        return conditional.json_response(req, {**meta, "results": changes}, changes, meta)
+    except Exception as error:
+        logging.error(f"Error:{error}")
+        return func.HttpResponse(
+            body=json.dumps({"message": f"{error}"}),
+            status_code=500,
+            charset="utf-8",
+            mimetype="application/json",
+        )
@@ -0,0 +1,130 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+import azure.functions as func
+from . import instrumentation
+from . import serializers
+
+
+def _updated_at(row):
+    """updated_at of a serialized row as an aware UTC datetime, None when the row has none."""
+    value = row.get("updated_at")
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def validators(rows, meta=None):
+    """Build the ETag and Last-Modified values for one row or a page of rows.
+
+    The ETag hashes every row's values (updated_at included) plus the page metadata,
+    without JSON-encoding anything. Last-Modified is the newest updated_at.
+
+    Args:
+        rows ([list]): serialized rows
+        meta ([dict]): page metadata (count, links, ...) that is part of the response
+
+    Returns:
+        [str, datetime]: weak ETag and Last-Modified (None when rows carry no updated_at)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if meta:
+        digest.update(repr(sorted(meta.items())).encode("utf-8"))
+    last_modified = None
+    for row in rows:
+        digest.update(repr(tuple(row.values())).encode("utf-8"))
+        updated_at = _updated_at(row)
+        if updated_at is not None and (last_modified is None or updated_at > last_modified):
+            last_modified = updated_at
+    return f'W/"{digest.hexdigest()}"', last_modified
+
+
+def not_modified(req, etag, last_modified):
+    """Check If-None-Match / If-Modified-Since. If-None-Match wins when both are sent."""
+    if_none_match = req.headers.get("If-None-Match")
+    if if_none_match:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: W/ prefixes are ignored
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in candidates
+
+    if_modified_since = req.headers.get("If-Modified-Since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def raw_validator(raw_json, meta=None):
+    """Weak ETag of a page PostgreSQL encoded itself (json_agg): its JSON bytes plus the page metadata."""
+    digest = hashlib.blake2b(digest_size=16)
+    if meta:
+        digest.update(repr(sorted(meta.items())).encode("utf-8"))
+    digest.update(raw_json)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _response(req, etag, last_modified, encode):
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    if not_modified(req, etag, last_modified):
+        return func.HttpResponse(status_code=304, headers=headers)
+    with instrumentation.span("serialize"):
+        body = encode()
+    return func.HttpResponse(
+        body=body,
+        status_code=200,
+        charset="utf-8",
+        mimetype="application/json",
+        headers=headers,
+    )
+
+
+def json_response(req, body_obj, rows, meta=None):
+    """200 JSON response with ETag/Last-Modified, or a bodiless 304 when the client copy is current.
+
+    Lists (meta given) only get an ETag: a row leaving the page doesn't move its newest
+    updated_at, so If-Modified-Since would answer 304 for a page that changed.
+
+    Args:
+        req ([HttpRequest]): request carrying the conditional headers
+        body_obj ([dict]): response object, only encoded when it has to be sent
+        rows ([list]): serialized rows the validators are built from
+        meta ([dict]): page metadata included in the ETag, None for a single resource
+
+    Returns:
+        [HttpResponse]: 200 or 304
+    """
+    with instrumentation.span("etag"):
+        etag, last_modified = validators(rows, meta)
+    if meta is not None:
+        last_modified = None
+    return _response(req, etag, last_modified, lambda: serializers.dumps(body_obj))
+
+
+def raw_json_response(req, body_obj, key, raw_json, meta):
+    """Like json_response for a page whose rows PostgreSQL already encoded (see serializers.dumps_with_raw).
+
+    Args:
+        req ([HttpRequest]): request carrying the conditional headers
+        body_obj ([dict]): response object without the raw value
+        key ([str]): key for the raw value
+        raw_json ([bytes]): encoded JSON value
+        meta ([dict]): page metadata included in the ETag
+
+    Returns:
+        [HttpResponse]: 200 or 304
+    """
+    with instrumentation.span("etag"):
+        etag = raw_validator(raw_json, meta)
+    return _response(req, etag, None, lambda: serializers.dumps_with_raw(body_obj, key, raw_json))
@@ -0,0 +1,211 @@
+#!/usr/bin/python
+import psycopg2
+from contextlib import contextmanager
+import threading
+import logging
+import random
+import time
+import os
+from . import instrumentation
+
+
+# Pool settings
+POOL_MIN_SIZE = int(os.environ.get("RP_POOL_MIN_SIZE", 1))
+POOL_MAX_SIZE = int(os.environ.get("RP_POOL_MAX_SIZE", 10))
+# Seconds a caller waits for a free connection before giving up
+POOL_CHECKOUT_TIMEOUT = float(os.environ.get("RP_POOL_CHECKOUT_TIMEOUT", 30))
+# Connections idle for longer than this are pinged before being handed out
+POOL_HEALTH_CHECK_INTERVAL = float(os.environ.get("RP_POOL_HEALTH_CHECK_INTERVAL", 30))
+
+# Retries of a failed connect (first use, or after the server went away) before the request fails
+CONNECT_RETRIES = int(os.environ.get("RP_DB_CONNECT_RETRIES", 3))
+# Seconds before the first retry, doubled after each failed attempt
+CONNECT_BACKOFF = float(os.environ.get("RP_DB_CONNECT_BACKOFF", 0.25))
+
+HEALTH_CHECK_QUERY = "SELECT 1;"
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became free within POOL_CHECKOUT_TIMEOUT."""
+
+
+def connection_params():
+    """Read the PostgreSQL connection settings from the environment.
+
+    Returns:
+        [dict]: keyword arguments for psycopg2.connect
+    """
+    return {
+        "host": os.environ["RP_HOST"],
+        "database": os.environ["RP_DATABASE"],
+        "user": os.environ["RP_USERNAME"],
+        "password": os.environ["RP_PASSWORD"],
+    }
+
+
+def backoff_delay(attempt):
+    """Seconds to wait before retry number attempt (0-based): exponential, with jitter so
+    instances that scaled out together don't reconnect in lockstep."""
+    return CONNECT_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections.
+
+    Up to max_size connections are open at once. Idle connections are kept
+    (most recently used first) and checked before being handed out again, so a
+    connection dropped by the server is replaced instead of failing the request.
+    """
+
+    def __init__(self, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, **connect_kwargs):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.connect_kwargs = connect_kwargs
+        self._idle = []
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.closed = False
+
+    def _connect(self):
+        for attempt in range(CONNECT_RETRIES + 1):
+            try:
+                return psycopg2.connect(**self.connect_kwargs)
+            except psycopg2.OperationalError as error:
+                if attempt == CONNECT_RETRIES:
+                    raise
+                delay = backoff_delay(attempt)
+                logging.warning(f"DB Pool: connect failed ({error}), retry {attempt + 1} in {delay:.2f} seconds")
+                time.sleep(delay)
+
+    def _is_healthy(self, conn):
+        """Connections used recently are trusted without a round trip."""
+        if conn.closed:
+            return False
+        if time.monotonic() - self._last_used.get(conn, 0) < POOL_HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(HEALTH_CHECK_QUERY)
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def _discard(self, conn):
+        self._last_used.pop(conn, None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self, timeout=POOL_CHECKOUT_TIMEOUT):
+        """Borrow a healthy connection, waiting up to timeout seconds for a free slot.
+
+        Returns:
+            [connection]: psycopg2 connection, must be handed back with putconn.
+        """
+        if self.closed:
+            raise psycopg2.InterfaceError("connection pool is closed")
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout(f"No free connection after {timeout} seconds (max_size={self.max_size})")
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    return self._connect()
+                if self._is_healthy(conn):
+                    return conn
+                logging.warning("DB Pool: discarding broken connection")
+                self._discard(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close=False):
+        """Hand a connection back. Broken or explicitly closed connections are dropped."""
+        try:
+            if close or self.closed or conn.closed:
+                self._discard(conn)
+                return
+            if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            with self._lock:
+                self._last_used[conn] = time.monotonic()
+                self._idle.append(conn)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def fill(self):
+        """Open connections until min_size are idle."""
+        with self._lock:
+            missing = self.min_size - len(self._idle)
+        for _ in range(max(missing, 0)):
+            conn = self._connect()
+            with self._lock:
+                self._last_used[conn] = time.monotonic()
+                self._idle.append(conn)
+
+    def closeall(self):
+        self.closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process wide connection pool, creating it on first use.
+
+    Returns:
+        [ConnectionPool]: pool shared by every request on this worker.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                db_pool = ConnectionPool(POOL_MIN_SIZE, POOL_MAX_SIZE, **connection_params())
+                db_pool.fill()
+                _pool = db_pool
+    return _pool
+
+
+def close_pool():
+    """Close every idle connection. The next checkout creates a new pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+@contextmanager
+def connection():
+    """Borrow a connection for one unit of work.
+
+    The transaction is committed when the block exits normally and rolled back
+    if it raises. A connection that lost the server is dropped so the next
+    checkout reconnects.
+
+    Yields:
+        [connection]: psycopg2 connection
+    """
+    with instrumentation.span("pool_checkout"):
+        db_pool = get_pool()
+        conn = db_pool.getconn()
+    broken = False
+    try:
+        with conn:
+            yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        db_pool.putconn(conn, close=broken)
@@ -0,0 +1,87 @@
+import csv
+import io
+from urllib.parse import urlencode, urlsplit, urlunsplit
+from . import pagination
+from . import serializers
+from . import user_status_functions
+
+
+# Export formats
+NDJSON = "ndjson"
+CSV = "csv"
+EXPORT_FORMATS = {
+    NDJSON: "application/x-ndjson",
+    CSV: "text/csv",
+}
+
+
+def iter_ndjson(batches):
+    """Encode batches of rows as NDJSON, one chunk of bytes per batch."""
+    for rows in batches:
+        yield b"".join(serializers.dumps(row) + b"\n" for row in rows)
+
+
+def iter_csv(batches, columns=user_status_functions.USER_STATUS_COLUMNS):
+    """Encode batches of rows as CSV with a header line, one chunk of bytes per batch."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, lineterminator="\n")
+    writer.writeheader()
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when the table is empty
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def export_user_status(
+    export_format,
+    after=0,
+    max_rows=user_status_functions.EXPORT_MAX_ROWS,
+    batch_size=user_status_functions.EXPORT_BATCH_SIZE,
+):
+    """Encode up to max_rows user_status rows in the requested format.
+
+    Rows are pulled from a server-side cursor and encoded batch by batch, so the
+    worker holds the encoded output plus one batch of rows, never the full row list.
+    The encoded output is bounded by max_rows: a larger table is exported in parts,
+    each one starting after the last user_status_id of the previous one.
+
+    Args:
+        export_format ([str]): ndjson or csv
+        after ([int]): user_status_id the part starts after, 0 for the first part
+        max_rows ([int]): rows per part
+        batch_size ([int]): rows fetched per round trip
+
+    Returns:
+        [bytes, str]: encoded rows and the cursor of the next part (None for the last part)
+    """
+    last_id = after
+    has_more = False
+
+    def batches():
+        nonlocal last_id, has_more
+        exported = 0
+        # One row past the part tells whether another part follows
+        for rows in user_status_functions.iter_user_status_export(after, max_rows + 1, batch_size):
+            if exported + len(rows) > max_rows:
+                has_more = True
+                rows = rows[: max_rows - exported]
+            if rows:
+                exported += len(rows)
+                last_id = rows[-1]["user_status_id"]
+                yield rows
+
+    chunks = iter_ndjson(batches()) if export_format == NDJSON else iter_csv(batches())
+    body = bytearray()
+    for chunk in chunks:
+        body += chunk
+    return bytes(body), pagination.encode_cursor(last_id) if has_more else None
+
+
+def next_link(url, params, cursor):
+    """Link header value pointing at the next export part: the request with its cursor replaced."""
+    query = urlencode({**params, "cursor": cursor})
+    return f'<{urlunsplit(urlsplit(url)._replace(query=query))}>; rel="next"'
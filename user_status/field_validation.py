@@ -1,63 +1,134 @@
-from cerberus import Validator
-from datetime import datetime
+from datetime import datetime, date
+import threading
+from . import instrumentation
+
+
+def to_date(s):
+    return datetime.strptime(s, '%Y-%m-%d')
 
 
 # cerberus library for field validation --> Validation rules can be found: https://cerberus-sanhe.readthedocs.io/usage.html#validation-rules
+PUT_SCHEMA = {
+    'status': {'required': False, 'type': 'string','empty': False,'allowed': ['Active', 'Terminated']},
+    'employee_environment': {'required': False, 'type': 'string','empty': False,'allowed': ['Internal', 'External','Other']},
+    'department': {'required': False, 'type': 'string','nullable': True},
+    'work_type': {'required': False, 'type': 'string','empty': False,'allowed': ['Permanent', 'Temporary', 'Contract']},
+    'manager_id': {'required': False, 'type': 'string','nullable': True},
+    'work_location': {'required': False, 'type': 'string','nullable': True,'allowed': ['Canada','USA','EU','NULL']},
+    'gender': {'required': False, 'type': 'string','nullable': True,'allowed': ['Male', 'Female', 'Intersex','NULL']},
+    'birth_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
+    'start_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
+    'end_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
+}
+
+POST_SCHEMA = {
+    'domain_rhonda_id': {'required': True, 'type': 'string','empty': False},
+    'status': {'required': True, 'type': 'string','empty': False,'allowed': ['Active', 'Terminated']},
+    'employee_environment': {'required': True, 'type': 'string','empty': False,'allowed': ['Internal', 'External','Other']},
+    'department': {'required': False, 'type': 'string','nullable': True},
+    'work_type': {'required': True, 'type': 'string','empty': False,'allowed': ['Permanent', 'Temporary', 'Contract']},
+    'manager_id': {'required': False, 'type': 'string','nullable': True},
+    'work_location': {'required': False, 'type': 'string','nullable': True,'allowed': ['Canada','USA','EU','NULL']},
+    'gender': {'required': False, 'type': 'string','nullable': True,'allowed': ['Male', 'Female', 'Intersex','NULL']},
+    'birth_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
+    'start_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
+    'end_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
+}
+
+
+class FastSchema:
+    """Precompiled form of a cerberus schema for the rules used above.
+
+    check() only answers "valid or not". It is never more permissive than
+    cerberus, so a document it rejects is handed to cerberus for the error messages.
+    """
+
+    def __init__(self, schema):
+        self.fields = {}
+        for field, rules in schema.items():
+            allowed = rules.get('allowed')
+            self.fields[field] = (
+                rules['type'],
+                rules.get('nullable', False),
+                rules.get('empty', True),
+                frozenset(allowed) if allowed is not None else None,
+            )
+        self.required = frozenset(field for field, rules in schema.items() if rules.get('required'))
+
+    def check(self, document):
+        if type(document) is not dict:
+            return False
+        fields = self.fields
+        for field, value in document.items():
+            spec = fields.get(field)
+            if spec is None:
+                return False
+            field_type, nullable, empty, allowed = spec
+            if value is None:
+                if nullable:
+                    continue
+                return False
+            if type(value) is not str:
+                return False
+            if field_type == 'datetime':
+                # cheap ISO parse for the canonical YYYY-MM-DD form, anything else goes to cerberus
+                if len(value) != 10 or value[4] != '-' or value[7] != '-' or not value.isascii():
+                    return False
+                try:
+                    date.fromisoformat(value)
+                except ValueError:
+                    return False
+                continue
+            if not empty and not value:
+                return False
+            if allowed is not None and value not in allowed:
+                return False
+        return self.required.issubset(document.keys())
+
+
+PUT_FAST_SCHEMA = FastSchema(PUT_SCHEMA)
+POST_FAST_SCHEMA = FastSchema(POST_SCHEMA)
+
+# cerberus validators keep per-document state, so each thread gets its own compiled copy
+_validators = threading.local()
+
+
+def _validator(name, schema):
+    validator = getattr(_validators, name, None)
+    if validator is None:
+        # cerberus is only needed for documents FastSchema rejects, so it isn't imported at cold start
+        from cerberus import Validator
+
+        validator = Validator(schema)
+        setattr(_validators, name, validator)
+    return validator
+
+
+def _validate(document, fast_schema, name, schema):
+    with instrumentation.span("validation"):
+        if fast_schema.check(document):
+            return True, {}
+        field_vali = _validator(name, schema)
+        vali_result = field_vali.validate(document) # If field validation pass, then it will return True, otherwise will return False
+        vali_error = field_vali.errors  # It will return the field validation error message if it dont pass
+        return vali_result, vali_error
+
+
 def put_field_validation(req_body):
     """This function will return validation result and errors if it has.
-    Args: json 
+    Args: json
 
     Returns:
         Boolean, String: validation result and validation errors.
     """
-    field_vali = Validator()
-    to_date = lambda s: datetime.strptime(s, '%Y-%m-%d')
-    schema = {
-        'status': {'required': False, 'type': 'string','empty': False,'allowed': ['Active', 'Terminated']},
-        'employee_environment': {'required': False, 'type': 'string','empty': False,'allowed': ['Internal', 'External','Other']},
-        'department': {'required': False, 'type': 'string','nullable': True},
-        'work_type': {'required': False, 'type': 'string','empty': False,'allowed': ['Permanent', 'Temporary', 'Contract']},
-        'manager_id': {'required': False, 'type': 'string','nullable': True},
-        'work_location': {'required': False, 'type': 'string','nullable': True,'allowed': ['Canada','USA','EU','NULL']},
-        'gender': {'required': False, 'type': 'string','nullable': True,'allowed': ['Male', 'Female', 'Intersex','NULL']},
-        'birth_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
-        'start_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
-        'end_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
-    }
-
-    vali_result = field_vali.validate(req_body, schema) # If field validation pass, then it will return True, otherwise will return False 
-    vali_error = field_vali.errors  # It will return the field validation error message if it dont pass
-    
-    return vali_result, vali_error
-
+    return _validate(req_body, PUT_FAST_SCHEMA, 'put', PUT_SCHEMA)
 
 
-# cerberus library for field validation --> Validation rules can be found: https://cerberus-sanhe.readthedocs.io/usage.html#validation-rules
 def post_field_validation(req_body):
     """This function will return validation result and errors if it has.
-    Args: json 
+    Args: json
 
     Returns:
         Boolean, String: validation result and validation errors.
     """
-    field_vali = Validator()
-    to_date = lambda s: datetime.strptime(s, '%Y-%m-%d')
-    schema = {
-        'domain_rhonda_id': {'required': True, 'type': 'string','empty': False},
-        'status': {'required': True, 'type': 'string','empty': False,'allowed': ['Active', 'Terminated']},
-        'employee_environment': {'required': True, 'type': 'string','empty': False,'allowed': ['Internal', 'External','Other']},
-        'department': {'required': False, 'type': 'string','nullable': True},
-        'work_type': {'required': True, 'type': 'string','empty': False,'allowed': ['Permanent', 'Temporary', 'Contract']},
-        'manager_id': {'required': False, 'type': 'string','nullable': True},
-        'work_location': {'required': False, 'type': 'string','nullable': True,'allowed': ['Canada','USA','EU','NULL']},
-        'gender': {'required': False, 'type': 'string','nullable': True,'allowed': ['Male', 'Female', 'Intersex','NULL']},
-        'birth_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
-        'start_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
-        'end_date': {'required': False, 'type': 'datetime','coerce': to_date,'nullable': True},
-    }
-    
-    vali_result = field_vali.validate(req_body, schema) # If field validation pass, then it will return True, otherwise will return False
-    vali_error = field_vali.errors  # It will return the field validation error message if it dont pass
-
-    return vali_result, vali_error
-
+    return _validate(req_body, POST_FAST_SCHEMA, 'post', POST_SCHEMA)
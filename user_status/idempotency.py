@@ -0,0 +1,196 @@
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import time
+from urllib.parse import urlsplit
+import azure.functions as func
+from . import user_status_functions
+
+
+# Writes sent with an Idempotency-Key header run once per key: a retry of the same request
+# gets the stored response back (migrations/0006). Keys are kept RP_IDEMPOTENCY_TTL seconds.
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+IDEMPOTENCY_TTL = float(os.environ.get("RP_IDEMPOTENCY_TTL", 86400))
+# A claim whose request hasn't finished after this many seconds is taken over by the next retry
+IDEMPOTENCY_LOCK_SECONDS = float(os.environ.get("RP_IDEMPOTENCY_LOCK_SECONDS", 60))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENT_METHODS = ("POST", "PUT", "DELETE")
+# Expired keys are deleted at most this often per worker, PRUNE_BATCH_SIZE at a time
+PRUNE_INTERVAL = 300
+PRUNE_BATCH_SIZE = 1000
+
+_last_prune = time.monotonic()
+
+
+def idempotency_key(req):
+    """Idempotency-Key of a write request, None when the request doesn't carry one (or isn't a write).
+
+    Raises:
+        ValueError: the key is longer than IDEMPOTENCY_KEY_MAX_LENGTH
+    """
+    if req.method not in IDEMPOTENT_METHODS:
+        return None
+    key = (req.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+    if not key:
+        return None
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise ValueError(f"{IDEMPOTENCY_HEADER} must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters!")
+    return key
+
+
+def request_hash(req):
+    """SHA-256 over method, path, query string and body: what a retry of the same request repeats."""
+    url = urlsplit(req.url)
+    digest = hashlib.sha256()
+    digest.update(f"{req.method}\n{url.path}\n{url.query}\n".encode("utf-8"))
+    digest.update(req.get_body() or b"")
+    return digest.digest()
+
+
+def _message(message, status_code, headers=None):
+    return func.HttpResponse(
+        body=json.dumps({"message": message}),
+        status_code=status_code,
+        charset="utf-8",
+        mimetype="application/json",
+        headers=headers,
+    )
+
+
+def _stored_response(request_digest, stored):
+    """Response for a key that is already taken: the stored one, or why there is none."""
+    stored_digest, status_code, mimetype, charset, headers, body = stored
+    if stored_digest != request_digest:
+        return _message(f"{IDEMPOTENCY_HEADER} has already been used for a different request!", 422)
+    if status_code is None:
+        return _message(
+            f"A request with this {IDEMPOTENCY_HEADER} is still in progress, retry later!", 409, {"Retry-After": "1"}
+        )
+    headers = json.loads(headers) if headers else {}
+    headers[REPLAYED_HEADER] = "true"
+    return func.HttpResponse(body=body, status_code=status_code, mimetype=mimetype, charset=charset, headers=headers)
+
+
+def _saved_fields(response):
+    """(status_code, mimetype, charset, headers, body) to store, None for a response that mustn't be replayed.
+    Server errors aren't stored, the retry runs the request again."""
+    if response.status_code >= 500:
+        return None
+    return (
+        response.status_code,
+        response.mimetype,
+        response.charset,
+        json.dumps(dict(response.headers)),
+        response.get_body(),
+    )
+
+
+def _prune_due():
+    global _last_prune
+    if time.monotonic() - _last_prune < PRUNE_INTERVAL:
+        return False
+    _last_prune = time.monotonic()
+    return True
+
+
+def _error(error):
+    logging.error("Error: Idempotency-Key exception!")
+    logging.error(error)
+    logging.error("Error: Idempotency-Key exception end")
+    return _message(f"{error}", 500)
+
+
+def idempotent(handler):
+    """Wrap the HTTP handler (sync or async) so writes with an Idempotency-Key run once per key.
+
+    The first request claims the key, runs and stores its response. Retries with the same
+    key and request get that response back with an Idempotent-Replayed header (409 while
+    the first one is still running), the same key on a different request gets a 422.
+    Server errors release the key so the write can be retried.
+    """
+    if inspect.iscoroutinefunction(handler):
+
+        @functools.wraps(handler)
+        async def async_wrapper(req):
+            # The async functions need psycopg (3), which the sync handler doesn't load
+            from . import user_status_functions_async
+
+            try:
+                key = idempotency_key(req)
+            except ValueError as error:
+                return _message(f"{error}", 400)
+            if key is None:
+                return await handler(req)
+            digest = request_hash(req)
+            try:
+                stored = await user_status_functions_async.claim_idempotency_key(
+                    key, digest, IDEMPOTENCY_TTL, IDEMPOTENCY_LOCK_SECONDS
+                )
+            except Exception as error:
+                return _error(error)
+            if _prune_due():
+                try:
+                    await user_status_functions_async.prune_idempotency_keys(PRUNE_BATCH_SIZE)
+                except Exception as error:
+                    logging.warning(f"Pruning expired {IDEMPOTENCY_HEADER}s failed: {error}")
+            if stored is not None:
+                return _stored_response(digest, stored)
+
+            try:
+                response = await handler(req)
+            except BaseException:
+                await user_status_functions_async.release_idempotency_key(key, digest)
+                raise
+            try:
+                fields = _saved_fields(response)
+                if fields is None:
+                    await user_status_functions_async.release_idempotency_key(key, digest)
+                else:
+                    await user_status_functions_async.save_idempotency_response(key, digest, *fields)
+            except Exception as error:
+                logging.warning(f"Could not store the response for {IDEMPOTENCY_HEADER} {key}: {error}")
+            return response
+
+        return async_wrapper
+
+    @functools.wraps(handler)
+    def wrapper(req):
+        try:
+            key = idempotency_key(req)
+        except ValueError as error:
+            return _message(f"{error}", 400)
+        if key is None:
+            return handler(req)
+        digest = request_hash(req)
+        try:
+            stored = user_status_functions.claim_idempotency_key(key, digest, IDEMPOTENCY_TTL, IDEMPOTENCY_LOCK_SECONDS)
+        except Exception as error:
+            return _error(error)
+        if _prune_due():
+            try:
+                user_status_functions.prune_idempotency_keys(PRUNE_BATCH_SIZE)
+            except Exception as error:
+                logging.warning(f"Pruning expired {IDEMPOTENCY_HEADER}s failed: {error}")
+        if stored is not None:
+            return _stored_response(digest, stored)
+
+        try:
+            response = handler(req)
+        except BaseException:
+            user_status_functions.release_idempotency_key(key, digest)
+            raise
+        try:
+            fields = _saved_fields(response)
+            if fields is None:
+                user_status_functions.release_idempotency_key(key, digest)
+            else:
+                user_status_functions.save_idempotency_response(key, digest, *fields)
+        except Exception as error:
+            logging.warning(f"Could not store the response for {IDEMPOTENCY_HEADER} {key}: {error}")
+        return response
+
+    return wrapper
@@ -0,0 +1,243 @@
+from contextvars import ContextVar
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+
+
+# Per-request timings: Server-Timing header, one structured log line per request
+# and in-process histograms (GET user-status/metrics). Off unless RP_INSTRUMENTATION=true.
+INSTRUMENTATION_ENABLED = os.environ.get("RP_INSTRUMENTATION", "false").lower() == "true"
+
+# Upper bounds (ms) of the histogram buckets, the last bucket is unbounded
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class Histogram:
+    """Bucketed latency histogram with count/sum/min/max."""
+
+    def __init__(self, bounds=BUCKETS_MS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        index = 0
+        for bound in self.bounds:
+            if value <= bound:
+                break
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the quantile (max for the unbounded bucket)."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum_ms": round(self.total, 3),
+            "min_ms": self.min,
+            "max_ms": self.max,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(self.bounds, self.buckets)},
+                "le_inf": self.buckets[-1],
+            },
+        }
+
+
+class Registry:
+    """Named histograms and counters shared by every request of this worker."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def dump(self):
+        with self._lock:
+            return {
+                "histograms": {name: histogram.snapshot() for name, histogram in sorted(self._histograms.items())},
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """Timings collected while one request is handled."""
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.statements = []
+        self.rows = 0
+
+    def add_span(self, name, ms):
+        self.spans[name] = self.spans.get(name, 0.0) + ms
+
+    def add_statement(self, name, ms, rows):
+        self.statements.append((name, ms, rows))
+        if rows and rows > 0:
+            self.rows += rows
+
+
+def current():
+    """Metrics of the request being handled, None when instrumentation is off."""
+    return _current.get()
+
+
+class span:
+    """Time a block as a named span of the current request; a no-op outside an instrumented request."""
+
+    __slots__ = ("name", "metrics", "started")
+
+    def __init__(self, name):
+        self.name = name
+        self.metrics = _current.get()
+
+    def __enter__(self):
+        if self.metrics is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.metrics is not None:
+            self.metrics.add_span(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+def route_name(req):
+    url_prefix = req.route_params.get("url_prefix")
+    return f"{req.method} {url_prefix or 'user-status'}"
+
+
+def server_timing(metrics, total_ms):
+    """Server-Timing value: one entry per statement name and span, plus the total."""
+    durations = {}
+    for name, ms, _ in metrics.statements:
+        key = f"db.{name}"
+        durations[key] = durations.get(key, 0.0) + ms
+    durations.update(metrics.spans)
+    entries = [f"{name};dur={ms:.2f}" for name, ms in durations.items()]
+    entries.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(entries)
+
+
+def _finish(metrics, response):
+    total_ms = (time.perf_counter() - metrics.started) * 1000
+    body = response.get_body() if response is not None else b""
+    response_bytes = len(body) if body else 0
+    status_code = response.status_code if response is not None else None
+    db_ms = sum(ms for _, ms, _ in metrics.statements)
+
+    registry.observe(f"request {metrics.route}", total_ms)
+    registry.increment(f"requests {metrics.route}")
+    registry.increment("response_bytes", response_bytes)
+    registry.increment("rows", metrics.rows)
+    for name, ms, _ in metrics.statements:
+        registry.observe(f"db {name}", ms)
+    for name, ms in metrics.spans.items():
+        registry.observe(name, ms)
+
+    if response is not None:
+        response.headers["Server-Timing"] = server_timing(metrics, total_ms)
+    logging.info(
+        json.dumps(
+            {
+                "event": "request",
+                "route": metrics.route,
+                "status_code": status_code,
+                "total_ms": round(total_ms, 3),
+                "db_ms": round(db_ms, 3),
+                "statements": [
+                    {"name": name, "ms": round(ms, 3), "rows": rows} for name, ms, rows in metrics.statements
+                ],
+                "spans_ms": {name: round(ms, 3) for name, ms in metrics.spans.items()},
+                "rows": metrics.rows,
+                "response_bytes": response_bytes,
+            }
+        )
+    )
+
+
+def instrumented(handler):
+    """Wrap the HTTP handler (sync or async) so each request is timed.
+    Returns the handler untouched when instrumentation is off."""
+    if not INSTRUMENTATION_ENABLED:
+        return handler
+
+    if inspect.iscoroutinefunction(handler):
+
+        @functools.wraps(handler)
+        async def async_wrapper(req):
+            metrics = RequestMetrics(route_name(req))
+            token = _current.set(metrics)
+            try:
+                response = await handler(req)
+            finally:
+                _current.reset(token)
+            try:
+                _finish(metrics, response)
+            except Exception as error:
+                logging.warning(f"Instrumentation failed: {error}")
+            return response
+
+        return async_wrapper
+
+    @functools.wraps(handler)
+    def wrapper(req):
+        metrics = RequestMetrics(route_name(req))
+        token = _current.set(metrics)
+        try:
+            response = handler(req)
+        finally:
+            _current.reset(token)
+        try:
+            _finish(metrics, response)
+        except Exception as error:
+            logging.warning(f"Instrumentation failed: {error}")
+        return response
+
+    return wrapper
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import select
+import threading
+import time
+import psycopg2
+from . import db_pool
+
+
+# Listen for the user_status_changes NOTIFY (migrations/0003) and evict changed rows
+# from this instance's caches. Off unless RP_CACHE_NOTIFY=true.
+CACHE_NOTIFY_ENABLED = os.environ.get("RP_CACHE_NOTIFY", "false").lower() == "true"
+CHANNEL = "user_status_changes"
+# Seconds the listener waits for a notification before checking its connection
+LISTEN_POLL_SECONDS = 5
+
+
+class ChangeListener:
+    """Background thread that LISTENs on a channel and hands each payload to on_change.
+
+    It runs on its own autocommit connection, outside the pool. Whenever it
+    (re)connects, on_reset is called first: notifications sent while it wasn't
+    listening are lost, so everything cached before then is suspect.
+    """
+
+    def __init__(self, channel, on_change, on_reset, enabled=CACHE_NOTIFY_ENABLED):
+        self.channel = channel
+        self.on_change = on_change
+        self.on_reset = on_reset
+        self.enabled = enabled
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.connected = False
+        self.received = 0
+        self.resets = 0
+        self.errors = 0
+
+    def ensure_started(self):
+        """Start the listener thread once. Cheap enough to call on every request."""
+        if self._thread is not None or not self.enabled:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="user-status-listener", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _listen(self):
+        connection = psycopg2.connect(**db_pool.connection_params())
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.channel};")
+        return connection
+
+    def _dispatch(self, connection):
+        connection.poll()
+        while connection.notifies:
+            notify = connection.notifies.pop(0)
+            self.received += 1
+            try:
+                self.on_change(json.loads(notify.payload))
+            except Exception as error:
+                self.errors += 1
+                logging.warning(f"Cache listener could not apply {notify.payload}: {error}")
+
+    def _run(self):
+        attempt = 0
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                connection = self._listen()
+                attempt = 0
+                self.resets += 1
+                self.on_reset()
+                self.connected = True
+                last_activity = time.monotonic()
+                while not self._stopped.is_set():
+                    if select.select([connection], [], [], LISTEN_POLL_SECONDS) != ([], [], []):
+                        self._dispatch(connection)
+                        last_activity = time.monotonic()
+                    elif time.monotonic() - last_activity >= db_pool.POOL_HEALTH_CHECK_INTERVAL:
+                        # A connection dropped without a FIN never becomes readable, a round trip finds out
+                        with connection.cursor() as cursor:
+                            cursor.execute(db_pool.HEALTH_CHECK_QUERY)
+                        self._dispatch(connection)
+                        last_activity = time.monotonic()
+            except Exception as error:
+                self.connected = False
+                delay = db_pool.backoff_delay(min(attempt, 6))
+                attempt += 1
+                logging.warning(f"Cache listener disconnected ({error}), reconnecting in {delay:.2f} seconds")
+                self._stopped.wait(delay)
+            finally:
+                if connection is not None and not connection.closed:
+                    connection.close()
+        self.connected = False
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "connected": self.connected,
+            "received": self.received,
+            "resets": self.resets,
+            "errors": self.errors,
+        }
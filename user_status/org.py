@@ -0,0 +1,130 @@
+from collections import defaultdict
+import os
+import threading
+import time
+
+
+# In-memory manager_id adjacency for user-status/reports, off unless RP_ORG_INDEX=true
+ORG_INDEX_ENABLED = os.environ.get("RP_ORG_INDEX", "false").lower() == "true"
+# Seconds before the index is reloaded in full, picking up writes made by other instances
+ORG_INDEX_TTL = float(os.environ.get("RP_ORG_INDEX_TTL", 300))
+# Deepest level user-status/reports walks, in either direction
+ORG_MAX_DEPTH = int(os.environ.get("RP_ORG_MAX_DEPTH", 10))
+
+DOWN = "down"
+UP = "up"
+DIRECTIONS = (DOWN, UP)
+
+
+class OrgIndex:
+    """manager_id adjacency of user_status kept in memory.
+
+    The index is loaded in one query and then kept current by this instance's
+    writes (set_manager/remove). Until it is loaded, writes are ignored, and
+    after ttl seconds it counts as unloaded again so it gets reloaded.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._manager_of = {}
+        self._reports_of = defaultdict(set)
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        loaded_at = self._loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl
+
+    def load(self, edges):
+        """Replace the index with (domain_rhonda_id, manager_id) pairs."""
+        manager_of = {}
+        reports_of = defaultdict(set)
+        for domain_rhonda_id, manager_id in edges:
+            manager_of[domain_rhonda_id] = manager_id
+            if manager_id is not None:
+                reports_of[manager_id].add(domain_rhonda_id)
+        with self._lock:
+            self._manager_of = manager_of
+            self._reports_of = reports_of
+            self._loaded_at = time.monotonic()
+
+    def set_manager(self, domain_rhonda_id, manager_id):
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            previous = self._manager_of.get(domain_rhonda_id)
+            if previous is not None:
+                self._reports_of[previous].discard(domain_rhonda_id)
+            self._manager_of[domain_rhonda_id] = manager_id
+            if manager_id is not None:
+                self._reports_of[manager_id].add(domain_rhonda_id)
+
+    def remove(self, domain_rhonda_id):
+        # Reports keep their manager_id in the table, so their edges to the removed id stay as well
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            previous = self._manager_of.pop(domain_rhonda_id, None)
+            if previous is not None:
+                self._reports_of[previous].discard(domain_rhonda_id)
+
+    def clear(self):
+        with self._lock:
+            self._manager_of = {}
+            self._reports_of = defaultdict(set)
+            self._loaded_at = None
+
+    def reports(self, domain_rhonda_id, max_depth):
+        """Direct and transitive reports, breadth first.
+
+        Returns:
+            [list]: (domain_rhonda_id, depth) pairs, depth 1 being direct reports
+        """
+        found = []
+        seen = {domain_rhonda_id}
+        level = [domain_rhonda_id]
+        with self._lock:
+            for depth in range(1, max_depth + 1):
+                next_level = []
+                for manager_id in level:
+                    for report_id in self._reports_of.get(manager_id, ()):
+                        if report_id not in seen:
+                            seen.add(report_id)
+                            next_level.append(report_id)
+                            found.append((report_id, depth))
+                if not next_level:
+                    break
+                level = next_level
+        return found
+
+    def chain(self, domain_rhonda_id, max_depth):
+        """Management chain upward.
+
+        Returns:
+            [list]: (domain_rhonda_id, depth) pairs, depth 1 being the direct manager
+        """
+        found = []
+        seen = {domain_rhonda_id}
+        with self._lock:
+            current = domain_rhonda_id
+            for depth in range(1, max_depth + 1):
+                manager_id = self._manager_of.get(current)
+                if manager_id is None or manager_id in seen:
+                    break
+                seen.add(manager_id)
+                found.append((manager_id, depth))
+                current = manager_id
+        return found
+
+
+def depth_param(value):
+    """Depth from the query string: 1 (direct) by default, "all" for ORG_MAX_DEPTH."""
+    if value is None:
+        return 1
+    if value == "all":
+        return ORG_MAX_DEPTH
+    depth = int(value)
+    if depth < 1:
+        raise ValueError("depth must be a positive number or all!")
+    return min(depth, ORG_MAX_DEPTH)
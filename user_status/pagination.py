@@ -0,0 +1,149 @@
+import base64
+from datetime import datetime
+import json
+
+
+# Cursor direction
+NEXT = "next"
+PREVIOUS = "prev"
+
+
+def encode_cursor(user_status_id, direction=NEXT):
+    """Build the opaque cursor handed to clients.
+
+    Args:
+        user_status_id ([int]): key of the last (next) or first (prev) row on the current page.
+        direction ([str]): NEXT or PREVIOUS
+
+    Returns:
+        [str]: url-safe cursor
+    """
+    raw = json.dumps({"id": int(user_status_id), "dir": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Read a cursor produced by encode_cursor. An empty cursor means the first page.
+
+    Args:
+        cursor ([str]): cursor from the query string
+
+    Raises:
+        ValueError: when the cursor is malformed
+
+    Returns:
+        [int, str]: user_status_id and direction
+    """
+    if not cursor:
+        return 0, NEXT
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        user_status_id = int(data["id"])
+        direction = data["dir"]
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if direction not in (NEXT, PREVIOUS) or user_status_id < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return user_status_id, direction
+
+
+def encode_watermark(changed_at, domain_rhonda_id):
+    """Build the opaque change feed watermark: the last change handed out.
+
+    Args:
+        changed_at ([datetime]): updated_at (or deleted_at) of the last change, full precision
+        domain_rhonda_id ([str]): domain_rhonda_id of the last change, breaks updated_at ties
+
+    Returns:
+        [str]: url-safe watermark
+    """
+    raw = json.dumps({"at": changed_at.isoformat(), "id": domain_rhonda_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_watermark(watermark):
+    """Read a watermark produced by encode_watermark. An empty watermark means from the beginning.
+
+    Args:
+        watermark ([str]): watermark from the query string
+
+    Raises:
+        ValueError: when the watermark is malformed
+
+    Returns:
+        [datetime, str]: changed_at and domain_rhonda_id, (None, None) for the beginning
+    """
+    if not watermark:
+        return None, None
+    try:
+        padded = watermark + "=" * (-len(watermark) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        changed_at = datetime.fromisoformat(data["at"])
+        domain_rhonda_id = data["id"]
+    except Exception:
+        raise ValueError(f"Invalid watermark: {watermark}")
+    if not isinstance(domain_rhonda_id, str):
+        raise ValueError(f"Invalid watermark: {watermark}")
+    return changed_at, domain_rhonda_id
+
+
+def cursor_links(rows, has_more, user_status_id, direction):
+    """Work out the previous/next cursors for a keyset page.
+
+    Args:
+        rows ([list]): page rows in user_status_id order
+        has_more ([bool]): whether more rows exist beyond the page in the requested direction
+        user_status_id ([int]): key from the request cursor
+        direction ([str]): direction from the request cursor
+
+    Returns:
+        [str, str]: previous cursor and next cursor, None when there is no such page
+    """
+    if not rows:
+        # Walked off either end: offer the way back only
+        if direction == NEXT and user_status_id > 0:
+            return encode_cursor(user_status_id + 1, PREVIOUS), None
+        if direction == PREVIOUS:
+            return None, encode_cursor(user_status_id - 1, NEXT)
+        return None, None
+
+    first_id = rows[0]["user_status_id"]
+    last_id = rows[-1]["user_status_id"]
+    if direction == NEXT:
+        previous_cursor = encode_cursor(first_id, PREVIOUS) if user_status_id > 0 else None
+        next_cursor = encode_cursor(last_id, NEXT) if has_more else None
+    else:
+        previous_cursor = encode_cursor(first_id, PREVIOUS) if has_more else None
+        next_cursor = encode_cursor(last_id, NEXT)
+    return previous_cursor, next_cursor
+
+
+def page_links(page, max_page, page_rows, page_size):
+    """Work out the previous/next page numbers for offset pagination.
+
+    Args:
+        page ([int]): requested page number
+        max_page ([int]): number of pages, None when the total was not counted
+        page_rows ([int]): number of rows on the requested page
+        page_size ([int]): Number of rows per page.
+
+    Returns:
+        [int, int]: previous page and next page, None when there is no such page
+    """
+    if max_page is None:
+        # Without a total, a full page is the only hint that more rows exist
+        previous_page = page - 1 if page > 1 else None
+        next_page = page + 1 if page >= 0 and page_rows == int(page_size) else None
+        return previous_page, next_page
+
+    if int(page) > 1 and int(page) <= int(max_page):
+        previous_page = page - 1
+    else:
+        previous_page = None
+
+    if int(page) >= 0 and int(page) < int(max_page):
+        next_page = page + 1
+    else:
+        next_page = None
+    return previous_page, next_page
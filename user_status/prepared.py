@@ -0,0 +1,126 @@
+import os
+import re
+import threading
+import weakref
+import psycopg2.errors
+import psycopg2.extensions
+
+
+# Run the registered (fixed) queries as server-side prepared statements: PREPARE once per
+# connection, EXECUTE afterwards, so PostgreSQL skips parsing and planning them per call.
+PREPARED_STATEMENTS_ENABLED = os.environ.get("RP_PREPARED_STATEMENTS", "true").lower() == "true"
+
+_PLACEHOLDER = re.compile(r"%s|%%")
+# Guards earlier statements of a transaction while a statement is (re)prepared
+SAVEPOINT = "prepared_statement"
+
+
+def server_placeholders(query):
+    """Rewrite a psycopg2 query for PREPARE: %s becomes $1, $2, ... and %% becomes %.
+
+    Args:
+        query ([str]): query with positional %s placeholders
+
+    Returns:
+        [str, int]: statement body without the trailing semicolon and the number of parameters
+    """
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group() == "%%":
+            return "%"
+        count += 1
+        return f"${count}"
+
+    return _PLACEHOLDER.sub(replace, query).strip().rstrip(";"), count
+
+
+class Statement:
+    """One registered query: its PREPARE and its EXECUTE (with psycopg2 placeholders for the values)."""
+
+    __slots__ = ("name", "prepare_sql", "execute_sql")
+
+    def __init__(self, name, query):
+        body, count = server_placeholders(query)
+        self.name = name
+        self.prepare_sql = f"PREPARE {name} AS {body};"
+        self.execute_sql = f"EXECUTE {name} ({', '.join(['%s'] * count)});" if count else f"EXECUTE {name};"
+
+
+class StatementRegistry:
+    """Fixed queries run as prepared statements, looked up by their SQL text.
+
+    Which statements a connection has prepared is tracked per connection object
+    (weakly), so a connection opened after a reconnect prepares them again on
+    first use. Queries that aren't registered are executed as they are.
+    """
+
+    def __init__(self, enabled=PREPARED_STATEMENTS_ENABLED):
+        self.enabled = enabled
+        self._statements = {}
+        self._prepared = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def register(self, name, query):
+        """Register query under statement name (a valid SQL identifier)."""
+        self._statements[query] = Statement(name.lower(), query)
+
+    def _prepared_names(self, connection):
+        with self._lock:
+            names = self._prepared.get(connection)
+            if names is None:
+                names = self._prepared[connection] = set()
+            return names
+
+    def _prepare(self, cursor, statement, names, recover):
+        try:
+            cursor.execute(statement.prepare_sql)
+        except psycopg2.errors.DuplicatePreparedStatement:
+            # Prepared by the session before this connection's names were lost track of
+            recover()
+        names.add(statement.name)
+
+    def execute(self, cursor, query, params=None):
+        """cursor.execute(query, params), through EXECUTE when query is registered.
+
+        A statement the session doesn't hold anymore (DISCARD ALL by a pooler) is prepared
+        again and executed once more. Statements executed earlier in the same transaction
+        are kept by a savepoint, the only extra round trips taken on the way.
+        """
+        statement = self._statements.get(query) if self.enabled else None
+        if statement is None:
+            cursor.execute(query, params)
+            return
+        connection = cursor.connection
+        names = self._prepared_names(connection)
+        in_transaction = connection.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        if in_transaction:
+            _control(connection, f"SAVEPOINT {SAVEPOINT};")
+
+        def recover():
+            if in_transaction:
+                _control(connection, f"ROLLBACK TO SAVEPOINT {SAVEPOINT};")
+            else:
+                connection.rollback()
+
+        if statement.name not in names:
+            self._prepare(cursor, statement, names, recover)
+        try:
+            cursor.execute(statement.execute_sql, params)
+        except psycopg2.errors.InvalidSqlStatementName:
+            recover()
+            names.discard(statement.name)
+            self._prepare(cursor, statement, names, recover)
+            cursor.execute(statement.execute_sql, params)
+        if in_transaction:
+            _control(connection, f"RELEASE SAVEPOINT {SAVEPOINT};")
+
+
+def _control(connection, sql):
+    # On its own cursor, the caller's cursor keeps the results of the EXECUTE
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+
+
+registry = StatementRegistry()
@@ -0,0 +1,53 @@
+import json
+import logging
+import azure.functions as func
+from . import conditional
+from . import org
+from . import user_status_functions
+
+
+def reports_request(req):
+    """Handle GET user-status/reports/{domain_rhonda_id}.
+
+    ?direction=down (default) returns direct reports, or transitive ones with ?depth=N / ?depth=all.
+    ?direction=up returns the management chain. Every row carries its depth.
+
+    Args:
+        req ([HttpRequest]): org chart request
+
+    Returns:
+        [HttpResponse]: 200 with the rows, 400 when the parameters are invalid
+    """
+    domain_rhonda_id = req.route_params.get("domain_rhonda_id")
+    direction = req.params.get("direction", org.DOWN)
+    try:
+        if not domain_rhonda_id:
+            raise ValueError("domain_rhonda_id is required!")
+        if direction not in org.DIRECTIONS:
+            raise ValueError(f"direction must be one of {', '.join(org.DIRECTIONS)}")
+        max_depth = org.depth_param(req.params.get("depth"))
+    except ValueError as error:
+        return func.HttpResponse(
+            body=json.dumps({"message": f"{error}"}),
+            status_code=400,
+            charset="utf-8",
+            mimetype="application/json",
+        )
+
+    try:
+        rows = user_status_functions.get_user_status_org(domain_rhonda_id, direction, max_depth)
+        meta = {
+            "domain_rhonda_id": domain_rhonda_id,
+            "direction": direction,
+            "depth": max_depth,
+            "count": len(rows),
+        }
+        return conditional.json_response(req, {**meta, "results": rows}, rows, meta)
+    except Exception as error:
+        logging.error(f"Error:{error}")
+        return func.HttpResponse(
+            body=json.dumps({"message": f"{error}"}),
+            status_code=500,
+            charset="utf-8",
+            mimetype="application/json",
+        )
@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+from datetime import datetime, date
+from . import instrumentation
+
+
+# psycopg2 type codes (PostgreSQL type OIDs) that need converting for JSON
+DATE_OID = 1082
+TIMESTAMP_OID = 1114
+TIMESTAMPTZ_OID = 1184
+
+# Internal columns that ride along with list queries but are not part of a row
+INTERNAL_COLUMNS = frozenset(["total_count"])
+
+# JSON backend: "orjson" when installed (default), or "json" for the standard library
+JSON_BACKEND = os.environ.get("RP_JSON_BACKEND", "orjson")
+
+try:
+    if JSON_BACKEND != "orjson":
+        raise ImportError
+    import orjson
+
+    def dumps(obj):
+        """Encode obj as JSON bytes."""
+        return orjson.dumps(obj)
+
+except ImportError:
+
+    def dumps(obj):
+        """Encode obj as JSON bytes."""
+        return json.dumps(obj).encode("utf-8")
+
+
+def dumps_with_raw(obj, key, raw_json):
+    """Encode obj and add key holding an already encoded JSON value.
+
+    Used when PostgreSQL built the JSON (json_agg) so it is passed through untouched.
+
+    Args:
+        obj ([dict]): non-empty dict to encode
+        key ([str]): key for the raw value
+        raw_json ([bytes]): encoded JSON value
+
+    Returns:
+        [bytes]: JSON object
+    """
+    head = dumps(obj)
+    return head[:-1] + b"," + dumps(key) + b":" + raw_json + b"}"
+
+
+def date_converter(obj):
+    """Transform date to str. If there is no date it will return 1900-01-01"""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    return "1900-01-01"
+
+
+def datetime_converter(obj):
+    """Transform datetime to str. If there is no date it will return 1900-01-01T00:00:00"""
+    if isinstance(obj, datetime):
+        return obj.isoformat(timespec="seconds")
+    return "1900-01-01T00:00:00"
+
+
+CONVERTERS = {
+    DATE_OID: date_converter,
+    TIMESTAMP_OID: datetime_converter,
+    TIMESTAMPTZ_OID: datetime_converter,
+}
+
+
+class RowSerializer:
+    """Turns result tuples into dicts keyed by column name.
+
+    The column mapping is built once from cursor.description, so rows don't
+    depend on column positions and only date/timestamp columns pay for a conversion.
+    """
+
+    def __init__(self, description, exclude=INTERNAL_COLUMNS):
+        kept = [(index, column) for index, column in enumerate(description) if column.name not in exclude]
+        self.columns = tuple(column.name for _, column in kept)
+        # Without excluded columns the row tuple lines up with self.columns as is
+        self._indexes = None if len(kept) == len(description) else tuple(index for index, _ in kept)
+        self._converted = [
+            (column.name, index, CONVERTERS[column.type_code])
+            for index, column in kept
+            if column.type_code in CONVERTERS
+        ]
+
+    def row(self, row):
+        if self._indexes is None:
+            data = dict(zip(self.columns, row))
+        else:
+            data = dict(zip(self.columns, [row[index] for index in self._indexes]))
+        for name, index, converter in self._converted:
+            data[name] = converter(row[index])
+        return data
+
+    def rows(self, rows):
+        row = self.row
+        with instrumentation.span("map_rows"):
+            return [row(values) for values in rows]
+
+
+_serializers = {}
+_serializers_lock = threading.Lock()
+
+
+def for_cursor(cursor):
+    """Return the (cached) RowSerializer for the columns of the cursor's last query.
+
+    Args:
+        cursor ([cursor]): cursor after execute
+
+    Returns:
+        [RowSerializer]: serializer for this column layout
+    """
+    key = tuple((column.name, column.type_code) for column in cursor.description)
+    serializer = _serializers.get(key)
+    if serializer is None:
+        with _serializers_lock:
+            serializer = _serializers.setdefault(key, RowSerializer(cursor.description))
+    return serializer
@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import psycopg2
+from . import db_pool
+
+
+# Statements slower than this (ms) are logged, 0 turns the slow-query log off
+SLOW_QUERY_MS = float(os.environ.get("RP_SLOW_QUERY_MS", 1000))
+SLOW_QUERY_ENABLED = SLOW_QUERY_MS > 0
+# Share of slow SELECTs whose plan is captured with EXPLAIN (ANALYZE, BUFFERS), 0 turns capture off
+EXPLAIN_SAMPLE_RATE = float(os.environ.get("RP_SLOW_QUERY_EXPLAIN_SAMPLE", 0.1))
+# At most one capture per statement name within this many seconds
+EXPLAIN_INTERVAL = float(os.environ.get("RP_SLOW_QUERY_EXPLAIN_INTERVAL", 300))
+# statement_timeout of a capture, it re-runs the statement
+EXPLAIN_TIMEOUT_MS = int(os.environ.get("RP_SLOW_QUERY_EXPLAIN_TIMEOUT_MS", 5000))
+# Captures waiting for the background thread, more are dropped
+EXPLAIN_QUEUE_SIZE = 10
+
+# Parameters that are never logged (body: responses stored for Idempotency-Key replays)
+PII_PARAMS = frozenset(["birth_date", "gender", "body"])
+REDACTED = "[redacted]"
+
+
+def redact(params, param_names=None):
+    """Copy of params that is safe to log.
+
+    Named (dict) parameters and positional ones with known param_names lose their
+    PII values. Positional parameters of a statement without param_names are kept,
+    multi-row parameters (bulk statements) are reduced to their row count.
+
+    Args:
+        params ([tuple, dict]): statement parameters
+        param_names ([tuple]): names of positional parameters, in order
+
+    Returns:
+        [list, dict]: loggable parameters
+    """
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: REDACTED if key in PII_PARAMS else value for key, value in params.items()}
+    logged = []
+    for index, value in enumerate(params):
+        name = param_names[index] if param_names and index < len(param_names) else None
+        if name in PII_PARAMS:
+            logged.append(REDACTED)
+        elif isinstance(value, (list, tuple)) and value and isinstance(value[0], (list, tuple)):
+            logged.append(f"[{len(value)} rows]")
+        elif isinstance(value, (str, int, float, bool, list, tuple)) or value is None:
+            logged.append(value)
+        else:
+            logged.append(str(value))
+    return logged
+
+
+def _explainable(query):
+    # EXPLAIN ANALYZE runs the statement again, only read-only ones qualify
+    return query.lstrip().split(None, 1)[0].upper() in ("SELECT", "WITH")
+
+
+class PlanCapture:
+    """Runs EXPLAIN (ANALYZE, BUFFERS) for slow statements on a background thread.
+
+    Captures are sampled, limited to one per statement name per interval and run
+    on a dedicated connection in a rolled back transaction, so request traffic
+    never waits for them.
+    """
+
+    def __init__(self, sample_rate, interval, timeout_ms, queue_size):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.timeout_ms = timeout_ms
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._last_capture = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._connection = None
+        self.captured = 0
+        self.dropped = 0
+
+    def submit(self, name, query, params):
+        """Queue a capture if sampling and the rate limit allow it. Never blocks."""
+        if self.sample_rate <= 0 or not _explainable(query) or random.random() >= self.sample_rate:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_capture.get(name)
+            if last is not None and now - last < self.interval:
+                return False
+            self._last_capture[name] = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slow-query-explain", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait((name, query, params))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _explain(self, query, params):
+        if self._connection is None or self._connection.closed:
+            self._connection = psycopg2.connect(**db_pool.connection_params())
+        try:
+            with self._connection.cursor() as cursor:
+                cursor.execute(f"SET LOCAL statement_timeout = {int(self.timeout_ms)};")
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+                plan = cursor.fetchone()[0]
+        finally:
+            if not self._connection.closed:
+                self._connection.rollback()
+        return json.loads(plan) if isinstance(plan, str) else plan
+
+    def _run(self):
+        while True:
+            name, query, params = self._queue.get()
+            try:
+                plan = self._explain(query, params)
+                self.captured += 1
+                logging.warning(json.dumps({"event": "slow_query_plan", "name": name, "plan": plan}, default=str))
+            except Exception as error:
+                logging.warning(f"Slow query EXPLAIN of {name} failed: {error}")
+                if isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError)) and self._connection:
+                    self._connection.close()
+            finally:
+                self._queue.task_done()
+
+
+plan_capture = PlanCapture(EXPLAIN_SAMPLE_RATE, EXPLAIN_INTERVAL, EXPLAIN_TIMEOUT_MS, EXPLAIN_QUEUE_SIZE)
+
+
+def record(name, query, params, ms, param_names=None):
+    """Log a statement that took longer than SLOW_QUERY_MS and maybe capture its plan.
+
+    Args:
+        name ([str]): statement name (GET_ALL_USER_STATUS, ...)
+        query ([str]): SQL as executed
+        params ([tuple, dict]): parameters as executed, redacted before logging
+        ms ([float]): execution time
+        param_names ([tuple]): names of positional parameters, for redaction
+    """
+    plan_queued = plan_capture.submit(name, query, params)
+    logging.warning(
+        json.dumps(
+            {
+                "event": "slow_query",
+                "name": name,
+                "ms": round(ms, 3),
+                "threshold_ms": SLOW_QUERY_MS,
+                "query": " ".join(query.split()),
+                "params": redact(params, param_names),
+                "plan_queued": plan_queued,
+            },
+            default=str,
+        )
+    )
@@ -0,0 +1,60 @@
+import json
+import logging
+import azure.functions as func
+from . import conditional
+from . import user_status_functions
+
+
+def group_by_param(value):
+    """Parse ?group_by=status,work_location into a tuple of known dimensions (empty when not given)."""
+    if not value:
+        return ()
+    group_by = tuple(dict.fromkeys(dimension.strip() for dimension in value.split(",") if dimension.strip()))
+    unknown = [dimension for dimension in group_by if dimension not in user_status_functions.STATS_DIMENSIONS]
+    if unknown:
+        raise ValueError(
+            f"Unknown group_by {', '.join(unknown)}, allowed: {', '.join(user_status_functions.STATS_DIMENSIONS)}!"
+        )
+    return group_by
+
+
+def stats_request(req):
+    """Handle GET user-status/stats?group_by=...&status=...&employee_environment=...
+
+    Without ?group_by= every dimension (status, employee_environment, work_type,
+    work_location, department) is counted on its own, all in one call. With it the
+    listed dimensions are counted together, e.g. ?group_by=department,status.
+    Dimension parameters filter the counted employees (?status=Active).
+
+    Args:
+        req ([HttpRequest]): stats request
+
+    Returns:
+        [HttpResponse]: 200 with the headcounts, 400 when group_by is invalid
+    """
+    try:
+        group_by = group_by_param(req.params.get("group_by"))
+    except ValueError as error:
+        return func.HttpResponse(
+            body=json.dumps({"message": f"{error}"}),
+            status_code=400,
+            charset="utf-8",
+            mimetype="application/json",
+        )
+    filters = {dimension: req.params.get(dimension) for dimension in user_status_functions.STATS_DIMENSIONS}
+
+    try:
+        total, counts = user_status_functions.get_user_status_stats(group_by, filters)
+        if group_by:
+            result = {"total": total, "group_by": list(group_by), "results": counts}
+        else:
+            result = {"total": total, "by": counts}
+        return conditional.json_response(req, result, [result])
+    except Exception as error:
+        logging.error(f"Error:{error}")
+        return func.HttpResponse(
+            body=json.dumps({"message": f"{error}"}),
+            status_code=500,
+            charset="utf-8",
+            mimetype="application/json",
+        )
@@ -1,41 +1,263 @@
 #!/usr/bin/python
 import azure.functions as func
-import psycopg2
-from datetime import datetime, date
+from datetime import datetime
+import functools
+import json
 import logging
+import time
+from . import db_pool
+from . import pagination
+from . import cache
+from . import serializers
+from . import org
+from . import instrumentation
+from . import slow_queries
+from . import prepared
+from . import notifications
 import os
 
 
 # DB Queries
+# Columns of user_status in table order
+USER_STATUS_COLUMNS = (
+    "user_status_id",
+    "domain_rhonda_id",
+    "status",
+    "employee_environment",
+    "department",
+    "work_type",
+    "manager_id",
+    "work_location",
+    "gender",
+    "birth_date",
+    "start_date",
+    "end_date",
+    "created_at",
+    "updated_at",
+)
+USER_STATUS_SELECT = ", ".join(USER_STATUS_COLUMNS)
+# Select-list expressions of the user-status-hr listing, by output field
+USER_STATUS_WITH_MANAGER_COLUMNS = {
+    "user_status_id": "us.user_status_id",
+    "domain_rhonda_id": "us.domain_rhonda_id",
+    "employee": "CONCAT_WS(' ',u.first_name, u.last_name) AS employee",
+    "manager": "CONCAT_WS(' ', u2.first_name, u2.last_name) AS manager",
+    "status": "us.status",
+    "employee_environment": "us.employee_environment",
+    "department": "us.department",
+    "work_type": "us.work_type",
+    "work_location": "us.work_location",
+    "gender": "us.gender",
+    "birth_date": "us.birth_date",
+    "start_date": "us.start_date",
+    "end_date": "us.end_date",
+}
+USER_STATUS_WITH_MANAGER_SELECT_LIST = ",\n".join(USER_STATUS_WITH_MANAGER_COLUMNS.values())
+
 # GET data
-GET_ALL_USER_STATUS = "SELECT * FROM user_status LIMIT %s OFFSET %s;"
-GET_ALL_USER_STATUS_WITH_MANAGER = """
+# Lists can carry the total row count in the page query itself ({total_count}),
+# which saves the separate COUNT(*) round trip
+WINDOW_TOTAL_COUNT = ", COUNT(*) OVER() AS total_count"
+TABLE_TOTAL_COUNT = ", (SELECT COUNT(*) FROM user_status) AS total_count"
+FILTERED_TOTAL_COUNT = ", (SELECT COUNT(*) FROM user_status us{where}) AS total_count"
+ALL_USER_STATUS_PAGE = "SELECT {columns}{total_count} FROM user_status ORDER BY user_status_id LIMIT %s OFFSET %s;"
+# Keyset pagination: rows after/before a user_status_id, no OFFSET scan
+ALL_USER_STATUS_AFTER = """SELECT {columns}{total_count} FROM user_status
+WHERE user_status_id > %s
+ORDER BY user_status_id LIMIT %s;"""
+ALL_USER_STATUS_BEFORE = """SELECT {columns}{total_count} FROM user_status
+WHERE user_status_id < %s
+ORDER BY user_status_id DESC LIMIT %s;"""
+# {where} holds the optional status/employee_environment/name search filters (see hr_filters)
+USER_STATUS_WITH_MANAGER_SELECT = """
 SELECT 
-us.user_status_id,
-us.domain_rhonda_id, 
-CONCAT_WS(' ',u.first_name, u.last_name) AS employee, 
-CONCAT_WS(' ', u2.first_name, u2.last_name) AS manager,
-us.status, 
-us.employee_environment, 
-us.department, 
-us.work_type, 
-us.work_location, 
-us.gender, 
-us.birth_date, 
-us.start_date, 
-us.end_date 
+{columns}{total_count}
 FROM user_status us 
 LEFT JOIN public.user u
 ON us.domain_rhonda_id = u.domain_rhonda_id
 LEFT JOIN public.user u2
-ON us.manager_id = u2.domain_rhonda_id
-LEFT JOIN user_info ui 
-ON us.manager_id = ui.domain_rhonda_id 
-WHERE us.status LIKE %s and us.employee_environment LIKE %s
+ON us.manager_id = u2.domain_rhonda_id{where}"""
+USER_STATUS_WITH_MANAGER_PAGE = USER_STATUS_WITH_MANAGER_SELECT + """
+ORDER BY us.user_status_id
 LIMIT %s OFFSET %s;"""
-GET_USER_STATUS_BY_DOMAIN_RHONDA_ID = """SELECT * FROM user_status
+# Keyset variants, the user_status_id condition is part of {where}
+USER_STATUS_WITH_MANAGER_AFTER = USER_STATUS_WITH_MANAGER_SELECT + """
+ORDER BY us.user_status_id LIMIT %s;"""
+USER_STATUS_WITH_MANAGER_BEFORE = USER_STATUS_WITH_MANAGER_SELECT + """
+ORDER BY us.user_status_id DESC LIMIT %s;"""
+# Name search (?q=): case-insensitive substring of the employee's or the manager's name.
+# The name expression is the one of the trigram index in migrations/0005. Matching ids are
+# collected first (= ANY(ARRAY(...))), so both sides of the OR are index conditions on
+# user_status and the filter works in the count queries, which don't join public.user.
+SEARCH_MIN_LENGTH = int(os.environ.get("RP_SEARCH_MIN_LENGTH", 3))
+USER_NAME = "(coalesce(first_name, '') || ' ' || coalesce(last_name, ''))"
+NAME_MATCHES = f"SELECT domain_rhonda_id FROM public.user WHERE {USER_NAME} ILIKE %s"
+NAME_SEARCH_CONDITION = (
+    f"(us.domain_rhonda_id = ANY(ARRAY({NAME_MATCHES})) OR us.manager_id = ANY(ARRAY({NAME_MATCHES})))"
+)
+
+GET_ALL_USER_STATUS = ALL_USER_STATUS_PAGE.format(columns=USER_STATUS_SELECT, total_count="")
+GET_ALL_USER_STATUS_WITH_COUNT = ALL_USER_STATUS_PAGE.format(columns=USER_STATUS_SELECT, total_count=WINDOW_TOTAL_COUNT)
+GET_ALL_USER_STATUS_AFTER = ALL_USER_STATUS_AFTER.format(columns=USER_STATUS_SELECT, total_count="")
+GET_ALL_USER_STATUS_AFTER_WITH_COUNT = ALL_USER_STATUS_AFTER.format(columns=USER_STATUS_SELECT, total_count=TABLE_TOTAL_COUNT)
+GET_ALL_USER_STATUS_BEFORE = ALL_USER_STATUS_BEFORE.format(columns=USER_STATUS_SELECT, total_count="")
+GET_ALL_USER_STATUS_BEFORE_WITH_COUNT = ALL_USER_STATUS_BEFORE.format(columns=USER_STATUS_SELECT, total_count=TABLE_TOTAL_COUNT)
+# Page built as JSON by PostgreSQL, formatted like serializers.date_converter/datetime_converter
+ALL_USER_STATUS_JSON_PAGE = """SELECT
+COALESCE(json_agg(json_build_object(
+'user_status_id', us.user_status_id,
+'domain_rhonda_id', us.domain_rhonda_id,
+'status', us.status,
+'employee_environment', us.employee_environment,
+'department', us.department,
+'work_type', us.work_type,
+'manager_id', us.manager_id,
+'work_location', us.work_location,
+'gender', us.gender,
+'birth_date', COALESCE(to_char(us.birth_date, 'YYYY-MM-DD'), '1900-01-01'),
+'start_date', COALESCE(to_char(us.start_date, 'YYYY-MM-DD'), '1900-01-01'),
+'end_date', COALESCE(to_char(us.end_date, 'YYYY-MM-DD'), '1900-01-01'),
+'created_at', COALESCE(to_char(us.created_at, 'YYYY-MM-DD"T"HH24:MI:SS'), '1900-01-01T00:00:00'),
+'updated_at', COALESCE(to_char(us.updated_at, 'YYYY-MM-DD"T"HH24:MI:SS'), '1900-01-01T00:00:00')
+) ORDER BY us.user_status_id), '{{}}')::text,
+COUNT(*),
+{outer_count}
+FROM (SELECT *{total_count} FROM user_status ORDER BY user_status_id LIMIT %s OFFSET %s) us;"""
+GET_ALL_USER_STATUS_JSON = ALL_USER_STATUS_JSON_PAGE.format(total_count="", outer_count="NULL::bigint")
+GET_ALL_USER_STATUS_JSON_WITH_COUNT = ALL_USER_STATUS_JSON_PAGE.format(
+    total_count=WINDOW_TOTAL_COUNT, outer_count="MAX(us.total_count)"
+)
+USER_STATUS_BY_DOMAIN_RHONDA_ID = """SELECT {columns} FROM user_status
 WHERE user_status.domain_rhonda_id = %s;"""
+GET_USER_STATUS_BY_DOMAIN_RHONDA_ID = USER_STATUS_BY_DOMAIN_RHONDA_ID.format(columns=USER_STATUS_SELECT)
+USER_STATUS_BY_DOMAIN_RHONDA_IDS = """SELECT {columns} FROM user_status
+WHERE user_status.domain_rhonda_id = ANY(%s);"""
+GET_USER_STATUS_BY_DOMAIN_RHONDA_IDS = USER_STATUS_BY_DOMAIN_RHONDA_IDS.format(columns=USER_STATUS_SELECT)
+# Org chart: reports below / managers above one domain_rhonda_id, walked on manager_id.
+# path guards against manager_id cycles, the depth parameter bounds the walk.
+USER_STATUS_REPORTS = """WITH RECURSIVE reports AS (
+SELECT domain_rhonda_id, 1 AS depth, ARRAY[%s, domain_rhonda_id] AS path
+FROM user_status
+WHERE manager_id = %s
+UNION ALL
+SELECT us.domain_rhonda_id, r.depth + 1, r.path || us.domain_rhonda_id
+FROM user_status us
+JOIN reports r ON us.manager_id = r.domain_rhonda_id
+WHERE r.depth < %s AND us.domain_rhonda_id <> ALL(r.path)
+)
+SELECT r.depth, {columns}
+FROM reports r
+JOIN user_status us ON us.domain_rhonda_id = r.domain_rhonda_id
+ORDER BY r.depth, us.user_status_id;"""
+USER_STATUS_MANAGERS = """WITH RECURSIVE chain AS (
+SELECT manager_id AS domain_rhonda_id, 1 AS depth, ARRAY[domain_rhonda_id, manager_id] AS path
+FROM user_status
+WHERE domain_rhonda_id = %s AND manager_id IS NOT NULL
+UNION ALL
+SELECT us.manager_id, c.depth + 1, c.path || us.manager_id
+FROM user_status us
+JOIN chain c ON us.domain_rhonda_id = c.domain_rhonda_id
+WHERE c.depth < %s AND us.manager_id IS NOT NULL AND us.manager_id <> ALL(c.path)
+)
+SELECT c.depth, {columns}
+FROM chain c
+JOIN user_status us ON us.domain_rhonda_id = c.domain_rhonda_id
+ORDER BY c.depth;"""
+ORG_COLUMNS = ", ".join(f"us.{column}" for column in USER_STATUS_COLUMNS)
+GET_USER_STATUS_REPORTS = USER_STATUS_REPORTS.format(columns=ORG_COLUMNS)
+GET_USER_STATUS_MANAGERS = USER_STATUS_MANAGERS.format(columns=ORG_COLUMNS)
+GET_ORG_EDGES = "SELECT domain_rhonda_id, manager_id FROM user_status;"
+# Change feed: upserted rows and tombstones (migrations/0002) after a (changed_at, domain_rhonda_id)
+# watermark, each branch read in watermark order from its own index. Changes younger than the
+# safety window are left for the next pull, so a write still committing with an older
+# updated_at can't end up behind a watermark that was already handed out.
+CHANGE_UPSERT = "upsert"
+CHANGE_DELETE = "delete"
+CHANGES_DELETE_COLUMNS = ", ".join(
+    f"t.{column}" if column in ("user_status_id", "domain_rhonda_id") else "NULL" for column in USER_STATUS_COLUMNS
+)
+GET_USER_STATUS_CHANGES = f"""(SELECT '{CHANGE_UPSERT}' AS change, us.updated_at AS changed_at, {ORG_COLUMNS}
+FROM user_status us
+WHERE (us.updated_at, us.domain_rhonda_id) > (%(since_at)s, %(since_id)s)
+AND us.updated_at <= (now() at time zone 'utc') - make_interval(secs => %(safety_seconds)s)
+ORDER BY us.updated_at, us.domain_rhonda_id
+LIMIT %(limit)s)
+UNION ALL
+(SELECT '{CHANGE_DELETE}', t.deleted_at, {CHANGES_DELETE_COLUMNS}
+FROM user_status_tombstone t
+WHERE (t.deleted_at, t.domain_rhonda_id) > (%(since_at)s, %(since_id)s)
+AND t.deleted_at <= (now() at time zone 'utc') - make_interval(secs => %(safety_seconds)s)
+ORDER BY t.deleted_at, t.domain_rhonda_id
+LIMIT %(limit)s)
+ORDER BY changed_at, domain_rhonda_id
+LIMIT %(limit)s;"""
+# Watermark of a feed read from the beginning
+CHANGES_START = (datetime.min, "")
+# Headcounts from the trigger-maintained summary (migrations/0004), one small table instead of
+# a scan of user_status. {grouping_sets} always ends with () for the total.
+STATS_DIMENSIONS = ("status", "employee_environment", "work_type", "work_location", "department")
+STATS_VALUES = ", ".join(f"NULLIF({dimension}, '')" for dimension in STATS_DIMENSIONS)
+USER_STATUS_STATS = f"""SELECT GROUPING({", ".join(STATS_DIMENSIONS)}), {STATS_VALUES}, SUM(headcount)
+FROM user_status_stats{{where}}
+GROUP BY GROUPING SETS ({{grouping_sets}})
+HAVING SUM(headcount) > 0
+ORDER BY 1, {len(STATS_DIMENSIONS) + 2} DESC, 2, 3, 4, 5, 6;"""
 COUNT_USER_STATUS_ROWS = "SELECT COUNT(*) FROM user_status;"
+EXPORT_USER_STATUS = f"""SELECT {USER_STATUS_SELECT} FROM user_status
+WHERE user_status_id > %s
+ORDER BY user_status_id LIMIT %s;"""
+# Same filters as the user-status-hr listing
+COUNT_USER_STATUS_WITH_MANAGER_ROWS = "SELECT COUNT(*) FROM user_status us{where};"
+# Planner estimates, no table scan
+ESTIMATE_USER_STATUS_ROWS = "SELECT reltuples::bigint FROM pg_class WHERE oid = 'public.user_status'::regclass;"
+EXPLAIN_USER_STATUS_WITH_MANAGER_ROWS = "EXPLAIN (FORMAT JSON) SELECT 1 FROM user_status us{where};"
+
+# Export reads the table through a server-side cursor in batches of this size
+EXPORT_BATCH_SIZE = int(os.environ.get("RP_EXPORT_BATCH_SIZE", 2000))
+# The whole response is buffered (no streaming in the v1 binding), larger tables are exported in parts
+EXPORT_MAX_ROWS = int(os.environ.get("RP_EXPORT_MAX_ROWS", 100000))
+
+# Count modes for list totals
+COUNT_MODE_EXACT = "exact"
+COUNT_MODE_ESTIMATE = "estimate"
+COUNT_MODE_CACHED = "cached"
+COUNT_MODES = (COUNT_MODE_EXACT, COUNT_MODE_ESTIMATE, COUNT_MODE_CACHED)
+# Seconds an exact count is reused in cached mode, per filter combination
+COUNT_CACHE_TTL = float(os.environ.get("RP_COUNT_CACHE_TTL", 60))
+count_cache = cache.TTLCache(COUNT_CACHE_TTL)
+# Read-through cache for get_user_status_by_domain_rhonda_id, invalidated by every write
+user_status_cache = cache.build_user_status_cache()
+
+# manager_id adjacency for the org chart, kept current by the writes below (RP_ORG_INDEX)
+org_index = org.OrgIndex(org.ORG_INDEX_TTL)
+
+
+def apply_change_notification(change):
+    """Evict one changed row, announced on the user_status_changes channel, from this instance's caches.
+
+    Args:
+        change ([dict]): NOTIFY payload with op, domain_rhonda_id, old_domain_rhonda_id and manager_id
+    """
+    for key in {change.get("domain_rhonda_id"), change.get("old_domain_rhonda_id")} - {None}:
+        user_status_cache.invalidate(key)
+    count_cache.clear()
+    if change.get("op") == "DELETE":
+        org_index.remove(change["domain_rhonda_id"])
+    else:
+        if change.get("old_domain_rhonda_id") not in (None, change["domain_rhonda_id"]):
+            org_index.remove(change["old_domain_rhonda_id"])
+        org_index.set_manager(change["domain_rhonda_id"], change.get("manager_id"))
+
+
+def reset_caches():
+    """Drop everything cached by this instance, e.g. after missing notifications."""
+    user_status_cache.clear()
+    count_cache.clear()
+    org_index.clear()
+
+
+# Evicts rows written elsewhere (other instances, bulk jobs, plain SQL) when RP_CACHE_NOTIFY is on
+change_listener = notifications.ChangeListener(notifications.CHANNEL, apply_change_notification, reset_caches)
 
 # INSERT data
 INSERT_USER_STATUS = """INSERT INTO user_status (domain_rhonda_id, status, employee_environment, department, work_type, manager_id, work_location, gender, birth_date, start_date, end_date)
@@ -46,7 +268,7 @@ RETURNING domain_rhonda_id;"""
 # Need COALESCE() function here for only updating the distinc value of column that already have value existed
 # Example: column = COALESCE(%s,column) 
 UPDATE_USER_STATUS = """UPDATE user_status
-SET status = COALESCE(%s,status),,
+SET status = COALESCE(%s,status),
 employee_environment = COALESCE(%s,employee_environment),
 department = COALESCE(%s,department),
 work_type = COALESCE(%s,work_type),
@@ -55,7 +277,7 @@ work_location = COALESCE(%s,work_location),
 gender = COALESCE(%s,gender),
 birth_date = COALESCE(%s,birth_date),
 start_date = COALESCE(%s,start_date),
-end_date = COALESCE(%s,end_date),
+end_date = COALESCE(%s,end_date)
 WHERE domain_rhonda_id = %s
 RETURNING domain_rhonda_id;
 """
@@ -66,98 +288,287 @@ WHERE domain_rhonda_id = %s
 RETURNING domain_rhonda_id;
 """
 
+# Bulk data, multi-row statements filled by psycopg2.extras.execute_values
+BULK_INSERT_USER_STATUS = """INSERT INTO user_status (domain_rhonda_id, status, employee_environment, department, work_type, manager_id, work_location, gender, birth_date, start_date, end_date)
+VALUES %s ON CONFLICT (domain_rhonda_id) DO NOTHING
+RETURNING domain_rhonda_id;"""
+BULK_UPDATE_USER_STATUS = """UPDATE user_status AS us
+SET status = COALESCE(v.status,us.status),
+employee_environment = COALESCE(v.employee_environment,us.employee_environment),
+department = COALESCE(v.department,us.department),
+work_type = COALESCE(v.work_type,us.work_type),
+manager_id = COALESCE(v.manager_id,us.manager_id),
+work_location = COALESCE(v.work_location,us.work_location),
+gender = COALESCE(v.gender,us.gender),
+birth_date = COALESCE(v.birth_date,us.birth_date),
+start_date = COALESCE(v.start_date,us.start_date),
+end_date = COALESCE(v.end_date,us.end_date)
+FROM (VALUES %s) AS v (domain_rhonda_id, status, employee_environment, department, work_type, manager_id, work_location, gender, birth_date, start_date, end_date)
+WHERE us.domain_rhonda_id = v.domain_rhonda_id
+RETURNING us.domain_rhonda_id;"""
+# Dates are cast explicitly, a VALUES column of NULLs would otherwise be text
+BULK_UPDATE_USER_STATUS_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, %s::date, %s::date, %s::date)"
+BULK_DELETE_USER_STATUS = """DELETE FROM user_status
+WHERE domain_rhonda_id = ANY(%s)
+RETURNING domain_rhonda_id;"""
 
-# DB Connection
-def connection():
-    """Connect to the PostgreSQL database server"""
-    try:
+# Idempotency-Key (migrations/0006). The claim inserts the key, or takes it over when it has
+# expired or its request has been running longer than lock_seconds (the worker died); it
+# returns nothing when the key belongs to another live or finished request.
+CLAIM_IDEMPOTENCY_KEY = """INSERT INTO idempotency_key AS k (idempotency_key, request_hash, expires_at)
+VALUES (%(key)s, %(request_hash)s, (now() at time zone 'utc') + make_interval(secs => %(ttl)s))
+ON CONFLICT (idempotency_key) DO UPDATE
+SET request_hash = excluded.request_hash,
+status_code = NULL,
+mimetype = NULL,
+charset = NULL,
+headers = NULL,
+body = NULL,
+locked_at = excluded.locked_at,
+expires_at = excluded.expires_at
+WHERE k.expires_at < now() at time zone 'utc'
+OR (k.status_code IS NULL AND k.locked_at < (now() at time zone 'utc') - make_interval(secs => %(lock_seconds)s))
+RETURNING idempotency_key;"""
+GET_IDEMPOTENCY_KEY = """SELECT request_hash, status_code, mimetype, charset, headers, body FROM idempotency_key
+WHERE idempotency_key = %(key)s;"""
+SAVE_IDEMPOTENCY_RESPONSE = """UPDATE idempotency_key
+SET status_code = %(status_code)s, mimetype = %(mimetype)s, charset = %(charset)s, headers = %(headers)s, body = %(body)s
+WHERE idempotency_key = %(key)s AND request_hash = %(request_hash)s;"""
+RELEASE_IDEMPOTENCY_KEY = """DELETE FROM idempotency_key
+WHERE idempotency_key = %(key)s AND request_hash = %(request_hash)s AND status_code IS NULL;"""
+PRUNE_IDEMPOTENCY_KEYS = """DELETE FROM idempotency_key
+WHERE idempotency_key IN (
+SELECT idempotency_key FROM idempotency_key
+WHERE expires_at < now() at time zone 'utc'
+LIMIT %(limit)s
+);"""
 
-        HOST = os.environ["RP_HOST"]
-        DATABASE = os.environ["RP_DATABASE"]
-        USERNAME = os.environ["RP_USERNAME"]
-        PASSWORD = os.environ["RP_PASSWORD"]
+# Names of the positional parameters of the write statements, so the slow-query log can redact PII
+USER_STATUS_WRITE_FIELDS = (
+    "status",
+    "employee_environment",
+    "department",
+    "work_type",
+    "manager_id",
+    "work_location",
+    "gender",
+    "birth_date",
+    "start_date",
+    "end_date",
+)
+STATEMENT_PARAM_NAMES = {
+    "INSERT_USER_STATUS": ("domain_rhonda_id",) + USER_STATUS_WRITE_FIELDS,
+    "UPDATE_USER_STATUS": USER_STATUS_WRITE_FIELDS + ("domain_rhonda_id",),
+}
 
-        conn = psycopg2.connect(host=HOST, database=DATABASE, user=USERNAME, password=PASSWORD)
-        return conn
+# Fixed statements run as server-side prepared statements (RP_PREPARED_STATEMENTS).
+# Projected (?fields=) and filtered (user-status-hr) variants are executed as plain SQL.
+PREPARED_STATEMENTS = {
+    "GET_ALL_USER_STATUS": GET_ALL_USER_STATUS,
+    "GET_ALL_USER_STATUS_WITH_COUNT": GET_ALL_USER_STATUS_WITH_COUNT,
+    "GET_ALL_USER_STATUS_AFTER": GET_ALL_USER_STATUS_AFTER,
+    "GET_ALL_USER_STATUS_AFTER_WITH_COUNT": GET_ALL_USER_STATUS_AFTER_WITH_COUNT,
+    "GET_ALL_USER_STATUS_BEFORE": GET_ALL_USER_STATUS_BEFORE,
+    "GET_ALL_USER_STATUS_BEFORE_WITH_COUNT": GET_ALL_USER_STATUS_BEFORE_WITH_COUNT,
+    "GET_ALL_USER_STATUS_JSON": GET_ALL_USER_STATUS_JSON,
+    "GET_ALL_USER_STATUS_JSON_WITH_COUNT": GET_ALL_USER_STATUS_JSON_WITH_COUNT,
+    "GET_USER_STATUS_BY_DOMAIN_RHONDA_ID": GET_USER_STATUS_BY_DOMAIN_RHONDA_ID,
+    "GET_USER_STATUS_BY_DOMAIN_RHONDA_IDS": GET_USER_STATUS_BY_DOMAIN_RHONDA_IDS,
+    "COUNT_USER_STATUS_ROWS": COUNT_USER_STATUS_ROWS,
+    "ESTIMATE_USER_STATUS_ROWS": ESTIMATE_USER_STATUS_ROWS,
+    "INSERT_USER_STATUS": INSERT_USER_STATUS,
+    "UPDATE_USER_STATUS": UPDATE_USER_STATUS,
+    "DELETE_USER_STATUS": DELETE_USER_STATUS,
+}
+for _name, _query in PREPARED_STATEMENTS.items():
+    prepared.registry.register(_name, _query)
+del _name, _query
 
-    except (Exception, psycopg2.DatabaseError) as error:
-        logging.error("DB Connection Exception:")
-        logging.error(error)
+
+# Functions
+
+
+
+
+def _execute(cursor, name, query, params=None):
+    """cursor.execute, timed as statement name for instrumentation and the slow-query log."""
+    metrics = instrumentation.current()
+    if metrics is None and not slow_queries.SLOW_QUERY_ENABLED:
+        prepared.registry.execute(cursor, query, params)
+        return
+    started = time.perf_counter()
+    prepared.registry.execute(cursor, query, params)
+    ms = (time.perf_counter() - started) * 1000
+    if metrics is not None:
+        metrics.add_statement(name, ms, cursor.rowcount)
+    if slow_queries.SLOW_QUERY_ENABLED and ms >= slow_queries.SLOW_QUERY_MS:
+        slow_queries.record(name, query, params, ms, STATEMENT_PARAM_NAMES.get(name))
+
+
+def _execute_values(cursor, name, query, rows, **kwargs):
+    """execute_values(..., fetch=True), timed like _execute."""
+    # psycopg2.extras is only needed by the bulk statements, so it isn't imported at cold start
+    from psycopg2.extras import execute_values
+
+    metrics = instrumentation.current()
+    if metrics is None and not slow_queries.SLOW_QUERY_ENABLED:
+        return execute_values(cursor, query, rows, fetch=True, **kwargs)
+    started = time.perf_counter()
+    results = execute_values(cursor, query, rows, fetch=True, **kwargs)
+    ms = (time.perf_counter() - started) * 1000
+    if metrics is not None:
+        metrics.add_statement(name, ms, len(results))
+    if slow_queries.SLOW_QUERY_ENABLED and ms >= slow_queries.SLOW_QUERY_MS:
+        slow_queries.record(name, query, (rows,), ms)
+    return results
+
+
+def parse_fields(fields_param, allowed):
+    """Parse a ?fields= value (comma separated) against a whitelist of columns.
+
+    Args:
+        fields_param ([str]): raw parameter, None or empty for all fields
+        allowed ([iterable]): fields that may be requested
+
+    Returns:
+        [tuple]: requested fields in request order without duplicates, None for all fields
+
+    Raises:
+        ValueError: a field is not in the whitelist
+    """
+    if not fields_param:
         return None
+    fields = tuple(dict.fromkeys(field.strip() for field in fields_param.split(",") if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed fields: {', '.join(allowed)}")
+    return fields or None
 
 
-connection = connection()
+def select_list(fields, column_exprs=None):
+    """SQL select list for the requested fields.
+    user_status_id is always selected, pages are ordered and cursored on it.
 
-# Functions
+    Args:
+        fields ([tuple]): whitelisted fields
+        column_exprs ([dict]): field -> select expression, plain column names when None
 
+    Returns:
+        [str]: select list
+    """
+    fields = ("user_status_id",) + tuple(field for field in fields if field != "user_status_id")
+    if column_exprs is None:
+        return ", ".join(fields)
+    return ",\n".join(column_exprs[field] for field in fields)
 
-def date_converter(obj):
-    """Transform date to str. If there is no date it will return 1900-01-01
+
+@functools.lru_cache(maxsize=256)
+def projected_query(template, columns, total_count="", where=""):
+    """Format a query template with a select list (and filters). Formatted queries are reused."""
+    return template.format(columns=columns, total_count=total_count, where=where)
+
+
+def _filter_value(value):
+    """None for a filter that wasn't supplied. "%" is the old match-anything default."""
+    if value in (None, "", "%"):
+        return None
+    return value
+
+
+def search_pattern(search_param):
+    """ILIKE pattern for the ?q= name search: the term (whitespace collapsed) anywhere in the name.
 
     Args:
-        obj ([date]): date
+        search_param ([str]): search term, None or empty for no search
+
+    Raises:
+        ValueError: the term is shorter than SEARCH_MIN_LENGTH
 
     Returns:
-        [str]: date as string
+        [str]: pattern with LIKE wildcards in the term escaped, None without a term
     """
-    if isinstance(obj, date):
-        return obj.strftime("%Y-%m-%d")
-    return "1900-01-01"
+    if search_param is None or not search_param.strip():
+        return None
+    term = " ".join(search_param.split())
+    if len(term) < SEARCH_MIN_LENGTH:
+        raise ValueError(f"q must be at least {SEARCH_MIN_LENGTH} characters!")
+    term = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{term}%"
 
 
-def datetime_converter(obj):
-    """Transform datetime to str. If there is no date it will return 1900-01-01T00:00:00
+def hr_filters(status_param, employee_environment_param, search_param=None):
+    """Equality conditions for the user-status-hr filters. Filters that aren't supplied are left out,
+    so the planner can use the (status, employee_environment, user_status_id) index.
 
     Args:
-        obj ([datetime]): datetime
+        status_param ([str]): status filter, None or "%" for any
+        employee_environment_param ([str]): employee_environment filter, None or "%" for any
+        search_param ([str]): employee/manager name search (see search_pattern), None for any
 
     Returns:
-        [str]: datetime as string
+        [list, tuple]: SQL conditions on us and their parameters
     """
-    if isinstance(obj, datetime):
-        return obj.strftime("%Y-%m-%dT%H:%M:%S")
-    return "1900-01-01T00:00:00"
+    conditions = []
+    params = ()
+    status_param = _filter_value(status_param)
+    if status_param is not None:
+        conditions.append("us.status = %s")
+        params += (status_param,)
+    employee_environment_param = _filter_value(employee_environment_param)
+    if employee_environment_param is not None:
+        conditions.append("us.employee_environment = %s")
+        params += (employee_environment_param,)
+    pattern = search_pattern(search_param)
+    if pattern is not None:
+        conditions.append(NAME_SEARCH_CONDITION)
+        params += (pattern, pattern)
+    return conditions, params
 
 
-def get_all_user_status(page_size, page):
+def where_clause(conditions):
+    """WHERE clause for a {where} placeholder, empty without conditions."""
+    if not conditions:
+        return ""
+    return "\nWHERE " + " AND ".join(conditions)
+
+
+def get_all_user_status(page_size, page, include_count=True, fields=None):
     """This function will return data from user_status table.
     Size will be defined by page_size and it will depen on page number.
+    The total row count is read in the same statement as the page (window count).
+
+    Args:
+        page_size ([int]): Number of rows per page.
+        page ([int]): Page number starting at 1.
+        include_count ([bool]): Whether to compute the total row count.
+        fields ([tuple]): columns to select (see parse_fields), all columns when None.
 
     Returns:
-        [list]: user_status data depending on page and page_size.
+        [list, int]: user_status data depending on page and page_size, and the total row count (None if not included).
     """
     try:
-        user_status_data = []
-
         page = int(page) - 1
         offset = int(page_size) * int(page)
+        name = "GET_ALL_USER_STATUS_WITH_COUNT" if include_count else "GET_ALL_USER_STATUS"
+        if fields:
+            query = projected_query(
+                ALL_USER_STATUS_PAGE, select_list(fields), WINDOW_TOTAL_COUNT if include_count else ""
+            )
+        else:
+            query = GET_ALL_USER_STATUS_WITH_COUNT if include_count else GET_ALL_USER_STATUS
 
-        with connection:
+        with db_pool.connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(GET_ALL_USER_STATUS, (page_size, offset))
+                _execute(cursor, name, query, (page_size, offset))
                 results = cursor.fetchall()
-                if not results:
-                    logging.info(f"message: There is no results for all users status.")
-                    return {}
-                for row in results:
-                    user_status = {
-                        "user_status_id": row[0],
-                        "domain_rhonda_id": row[1],
-                        "status": row[2],
-                        "employee_environment": row[3],
-                        "department": row[4],
-                        "work_type": row[5],
-                        "manager_id": row[6],
-                        "work_location": row[7],
-                        "gender": row[8],
-                        "birth_date": date_converter(row[9]),
-                        "start_date": date_converter(row[10]),
-                        "end_date": date_converter(row[11]),
-                        "created_at": datetime_converter(row[12]),
-                        "updated_at": datetime_converter(row[13]),
-                    }
-                    user_status_data.append(user_status)
-                return user_status_data
+                serializer = serializers.for_cursor(cursor)
+        if not results:
+            logging.info(f"message: There is no results for all users status.")
+            # Past the last page the window count has no row to ride on
+            return {}, count_user_status_rows() if include_count else None
+        user_status_data = serializer.rows(results)
+        total_count = results[0][-1] if include_count else None
+        return user_status_data, total_count
     except Exception as error:
         logging.error("Error: SELECT all user_status exception!")
         logging.error(error)
@@ -165,38 +576,111 @@ def get_all_user_status(page_size, page):
         return func.HttpResponse(f"{error}")
 
 
-def get_user_status_by_domain_rhonda_id(domain_rhonda_id):
+def iter_user_status_export(after=0, limit=EXPORT_MAX_ROWS, batch_size=EXPORT_BATCH_SIZE):
+    """Yield user_status rows in user_status_id order, batch by batch.
+    Rows are read through a server-side (named) cursor, so only one batch is held in memory.
+
+    Args:
+        after ([int]): user_status_id the export starts after, 0 for the first row
+        limit ([int]): maximum number of rows
+        batch_size ([int]): rows fetched per round trip
+
+    Yields:
+        [list]: user_status data for one batch
+    """
+    with db_pool.connection() as connection:
+        with connection.cursor(name="user_status_export") as cursor:
+            cursor.itersize = batch_size
+            _execute(cursor, "EXPORT_USER_STATUS", EXPORT_USER_STATUS, (after, limit))
+            while True:
+                with instrumentation.span("export_fetch"):
+                    results = cursor.fetchmany(batch_size)
+                if not results:
+                    break
+                yield serializers.for_cursor(cursor).rows(results)
+
+
+def get_all_user_status_json(page_size, page, include_count=True):
+    """Same page as get_all_user_status, but PostgreSQL builds the JSON array (json_agg)
+    and the encoded bytes are passed straight through.
+
+    Args:
+        page_size ([int]): Number of rows per page.
+        page ([int]): Page number starting at 1.
+        include_count ([bool]): Whether to compute the total row count.
+
+    Returns:
+        [bytes, int, int]: JSON encoded user_status data, rows on the page and the total row count (None if not included).
+    """
+    try:
+        page = int(page) - 1
+        offset = int(page_size) * int(page)
+        query = GET_ALL_USER_STATUS_JSON_WITH_COUNT if include_count else GET_ALL_USER_STATUS_JSON
+        name = "GET_ALL_USER_STATUS_JSON_WITH_COUNT" if include_count else "GET_ALL_USER_STATUS_JSON"
+
+        with db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                _execute(cursor, name, query, (page_size, offset))
+                user_status_json, page_rows, total_count = cursor.fetchone()
+        if include_count and total_count is None:
+            # Past the last page the window count has no row to ride on
+            total_count = count_user_status_rows()
+        return user_status_json.encode("utf-8"), page_rows, total_count
+    except Exception as error:
+        logging.error("Error: SELECT all user_status json exception!")
+        logging.error(error)
+        logging.error("Error: SELECT all user_status json exception end")
+        return func.HttpResponse(f"{error}")
+
+
+def _project(user_status, fields):
+    """Narrow a full (cached) row to fields, keeping user_status_id like select_list does."""
+    if not fields:
+        return user_status
+    return {
+        column: value
+        for column, value in user_status.items()
+        if column == "user_status_id" or column in fields
+    }
+
+
+def get_user_status_by_domain_rhonda_id(domain_rhonda_id, fields=None):
     """This function will return all data from user_status table filtered by domain_rhonda_id.
+    Rows are served from user_status_cache when present.
+    With the cache on, the full row is read (and cached) and narrowed to fields afterwards;
+    with the cache off only the requested columns are selected.
+
+    Args:
+        domain_rhonda_id ([str]): domain_rhonda_id to look up
+        fields ([tuple]): columns to return (see parse_fields), all columns when None.
 
     Returns:
         [list]: All user_status data filtered by domain_rhonda_id.
     """
     try:
-        with connection:
+        project_in_sql = bool(fields) and not user_status_cache.enabled
+        # Taken before the read: an invalidation while the row is read keeps it out of the cache
+        generation = user_status_cache.generation()
+        if not project_in_sql:
+            user_status = user_status_cache.get(domain_rhonda_id)
+            if user_status is not None:
+                return _project(user_status, fields)
+        if project_in_sql:
+            query = projected_query(USER_STATUS_BY_DOMAIN_RHONDA_ID, select_list(fields))
+        else:
+            query = GET_USER_STATUS_BY_DOMAIN_RHONDA_ID
+        with db_pool.connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(GET_USER_STATUS_BY_DOMAIN_RHONDA_ID, (domain_rhonda_id,))
+                _execute(cursor, "GET_USER_STATUS_BY_DOMAIN_RHONDA_ID", query, (domain_rhonda_id,))
                 results = cursor.fetchall()
                 if not results:
                     logging.info(f"message: There is no result for domain_rhonda_id: {domain_rhonda_id}")
                     return {}
-                for row in results:
-                    user_status = {
-                        "user_status_id": row[0],
-                        "domain_rhonda_id": row[1],
-                        "status": row[2],
-                        "employee_environment": row[3],
-                        "department": row[4],
-                        "work_type": row[5],
-                        "manager_id": row[6],
-                        "work_location": row[7],
-                        "gender": row[8],
-                        "birth_date": date_converter(row[9]),
-                        "start_date": date_converter(row[10]),
-                        "end_date": date_converter(row[11]),
-                        "created_at": datetime_converter(row[12]),
-                        "updated_at": datetime_converter(row[13]),
-                    }
-                return user_status
+                user_status = serializers.for_cursor(cursor).row(results[0])
+        if project_in_sql:
+            return user_status
+        user_status_cache.set(domain_rhonda_id, user_status, generation)
+        return _project(user_status, fields)
     except Exception as error:
         logging.error("Error: SELECT user_status by domain_rhonda_id exception!")
         logging.error(error)
@@ -204,46 +688,107 @@ def get_user_status_by_domain_rhonda_id(domain_rhonda_id):
         return func.HttpResponse(f"{error}")
 
 
-def get_all_user_status_with_manager(status_param, employee_environment_param, page_size, page):
+def get_user_status_by_domain_rhonda_ids(domain_rhonda_ids, fields=None):
+    """This function will return user_status rows for many domain_rhonda_ids with one query.
+    Cached rows are served from user_status_cache, only the misses are read (= ANY(%s)).
+
+    Args:
+        domain_rhonda_ids ([list]): domain_rhonda_ids to look up, without duplicates
+        fields ([tuple]): columns to return (see parse_fields), all columns when None.
+
+    Returns:
+        [dict]: domain_rhonda_id -> user_status data, None for ids that don't exist
+    """
+    try:
+        project_in_sql = bool(fields) and not user_status_cache.enabled
+        found = {}
+        missing = list(domain_rhonda_ids)
+        generation = user_status_cache.generation()
+        if not project_in_sql:
+            missing = []
+            for domain_rhonda_id in domain_rhonda_ids:
+                user_status = user_status_cache.get(domain_rhonda_id)
+                if user_status is None:
+                    missing.append(domain_rhonda_id)
+                else:
+                    found[domain_rhonda_id] = user_status
+        if missing:
+            if project_in_sql:
+                # domain_rhonda_id is needed to key the result
+                query = projected_query(
+                    USER_STATUS_BY_DOMAIN_RHONDA_IDS, select_list(("domain_rhonda_id",) + tuple(fields))
+                )
+            else:
+                query = GET_USER_STATUS_BY_DOMAIN_RHONDA_IDS
+            with db_pool.connection() as connection:
+                with connection.cursor() as cursor:
+                    _execute(cursor, "GET_USER_STATUS_BY_DOMAIN_RHONDA_IDS", query, (missing,))
+                    results = cursor.fetchall()
+                    rows = serializers.for_cursor(cursor).rows(results)
+            for user_status in rows:
+                domain_rhonda_id = user_status["domain_rhonda_id"]
+                if not project_in_sql:
+                    user_status_cache.set(domain_rhonda_id, user_status, generation)
+                elif "domain_rhonda_id" not in fields:
+                    del user_status["domain_rhonda_id"]
+                found[domain_rhonda_id] = user_status
+        if project_in_sql:
+            return {domain_rhonda_id: found.get(domain_rhonda_id) for domain_rhonda_id in domain_rhonda_ids}
+        return {
+            domain_rhonda_id: _project(found[domain_rhonda_id], fields) if domain_rhonda_id in found else None
+            for domain_rhonda_id in domain_rhonda_ids
+        }
+    except Exception as error:
+        logging.error("Error: SELECT user_status by domain_rhonda_ids exception!")
+        logging.error(error)
+        logging.error("Error: SELECT user_status by domain_rhonda_ids exception end")
+        return func.HttpResponse(f"{error}")
+
+def get_all_user_status_with_manager(
+    status_param, employee_environment_param, page_size, page, include_count=True, fields=None, search_param=None
+):
     """This function will return data from user_status table with manager name.
     Size will be defined by page_size and it will depen on page number.
+    The total row count is read in the same statement as the page (window count).
+
+    Args:
+        status_param ([str]): status filter
+        employee_environment_param ([str]): employee_environment filter
+        page_size ([int]): Number of rows per page.
+        page ([int]): Page number starting at 1.
+        include_count ([bool]): Whether to compute the total row count.
+        fields ([tuple]): fields to select (see parse_fields), all fields when None.
+        search_param ([str]): employee/manager name search (see search_pattern)
 
     Returns:
-        [list]: user_status data depending on page and page_size.
+        [list, int]: user_status data depending on page and page_size, and the total row count (None if not included).
     """
     try:
-        user_status_manager_data = []
-
         page = int(page) - 1
         offset = int(page_size) * int(page)
+        columns = select_list(fields, USER_STATUS_WITH_MANAGER_COLUMNS) if fields else USER_STATUS_WITH_MANAGER_SELECT_LIST
+        conditions, params = hr_filters(status_param, employee_environment_param, search_param)
+        name = "GET_ALL_USER_STATUS_WITH_MANAGER_WITH_COUNT" if include_count else "GET_ALL_USER_STATUS_WITH_MANAGER"
+        query = projected_query(
+            USER_STATUS_WITH_MANAGER_PAGE,
+            columns,
+            WINDOW_TOTAL_COUNT if include_count else "",
+            where_clause(conditions),
+        )
 
-        with connection:
+        with db_pool.connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(
-                    GET_ALL_USER_STATUS_WITH_MANAGER, (status_param, employee_environment_param, page_size, offset)
-                )
+                _execute(cursor, name, query, params + (page_size, offset))
                 results = cursor.fetchall()
-                if not results:
-                    logging.info(f"message: There is no results for all users status with manager.")
-                    return {}
-                for row in results:
-                    user_status_with_manager = {
-                        "user_status_id": row[0],
-                        "domain_rhonda_id": row[1],
-                        "employee": row[2],
-                        "manager": row[3],
-                        "status": row[4],
-                        "employee_environment": row[5],
-                        "department": row[6],
-                        "work_type": row[7],
-                        "work_location": row[8],
-                        "gender": row[9],
-                        "birth_date": date_converter(row[10]),
-                        "start_date": date_converter(row[11]),
-                        "end_date": date_converter(row[12]),
-                    }
-                    user_status_manager_data.append(user_status_with_manager)
-                return user_status_manager_data
+                serializer = serializers.for_cursor(cursor)
+        if not results:
+            logging.info(f"message: There is no results for all users status with manager.")
+            if include_count:
+                return {}, count_user_status_with_manager_rows(status_param, employee_environment_param, search_param)
+            return {}, None
+        user_status_manager_data = serializer.rows(results)
+        total_count = results[0][-1] if include_count else None
+        return user_status_manager_data, total_count
     except Exception as error:
         logging.error("Error: SELECT all user_status with manager exception!")
         logging.error(error)
@@ -251,6 +796,298 @@ def get_all_user_status_with_manager(status_param, employee_environment_param, p
         return func.HttpResponse(f"{error}")
 
 
+def _fetch_keyset_page(name, query, params, page_size, direction, include_count, count_rows):
+    """Run a keyset query that asks for page_size + 1 rows and shape the result."""
+    with db_pool.connection() as connection:
+        with connection.cursor() as cursor:
+            # One extra row tells us whether another page exists
+            _execute(cursor, name, query, params + (int(page_size) + 1,))
+            results = cursor.fetchall()
+            serializer = serializers.for_cursor(cursor)
+    has_more = len(results) > int(page_size)
+    results = results[: int(page_size)]
+    if direction == pagination.PREVIOUS:
+        results.reverse()
+    if not include_count:
+        total_count = None
+    elif results:
+        total_count = results[0][-1]
+    else:
+        total_count = count_rows()
+    return serializer.rows(results), has_more, total_count
+
+
+def get_all_user_status_keyset(page_size, user_status_id, direction, include_count=True, fields=None):
+    """This function will return one keyset page from user_status table.
+    Rows are read after (next) or before (prev) user_status_id, so every page costs the same.
+
+    Args:
+        page_size ([int]): Number of rows per page.
+        user_status_id ([int]): user_status_id from the request cursor, 0 for the first page.
+        direction ([str]): pagination.NEXT or pagination.PREVIOUS
+        include_count ([bool]): Whether to compute the total row count.
+        fields ([tuple]): columns to select (see parse_fields), all columns when None.
+
+    Returns:
+        [list, bool, int]: user_status data ordered by user_status_id, whether more rows exist in that direction
+        and the total row count (None if not included).
+    """
+    try:
+        if fields:
+            query = projected_query(
+                ALL_USER_STATUS_AFTER if direction == pagination.NEXT else ALL_USER_STATUS_BEFORE,
+                select_list(fields),
+                TABLE_TOTAL_COUNT if include_count else "",
+            )
+        elif direction == pagination.NEXT:
+            query = GET_ALL_USER_STATUS_AFTER_WITH_COUNT if include_count else GET_ALL_USER_STATUS_AFTER
+        else:
+            query = GET_ALL_USER_STATUS_BEFORE_WITH_COUNT if include_count else GET_ALL_USER_STATUS_BEFORE
+        name = "GET_ALL_USER_STATUS_AFTER" if direction == pagination.NEXT else "GET_ALL_USER_STATUS_BEFORE"
+        if include_count:
+            name += "_WITH_COUNT"
+        return _fetch_keyset_page(
+            name, query, (user_status_id,), page_size, direction, include_count, count_user_status_rows
+        )
+    except Exception as error:
+        logging.error("Error: SELECT user_status keyset page exception!")
+        logging.error(error)
+        logging.error("Error: SELECT user_status keyset page exception end")
+        return func.HttpResponse(f"{error}")
+
+
+def get_all_user_status_with_manager_keyset(
+    status_param,
+    employee_environment_param,
+    page_size,
+    user_status_id,
+    direction,
+    include_count=True,
+    fields=None,
+    search_param=None,
+):
+    """This function will return one keyset page from user_status table with manager name.
+
+    Args:
+        status_param ([str]): status filter
+        employee_environment_param ([str]): employee_environment filter
+        page_size ([int]): Number of rows per page.
+        user_status_id ([int]): user_status_id from the request cursor, 0 for the first page.
+        direction ([str]): pagination.NEXT or pagination.PREVIOUS
+        include_count ([bool]): Whether to compute the total row count.
+        fields ([tuple]): fields to select (see parse_fields), all fields when None.
+        search_param ([str]): employee/manager name search (see search_pattern)
+
+    Returns:
+        [list, bool, int]: user_status data ordered by user_status_id, whether more rows exist in that direction
+        and the total row count (None if not included).
+    """
+    try:
+        columns = select_list(fields, USER_STATUS_WITH_MANAGER_COLUMNS) if fields else USER_STATUS_WITH_MANAGER_SELECT_LIST
+        conditions, filter_params = hr_filters(status_param, employee_environment_param, search_param)
+        if direction == pagination.NEXT:
+            name = "GET_ALL_USER_STATUS_WITH_MANAGER_AFTER"
+            template = USER_STATUS_WITH_MANAGER_AFTER
+            keyset_condition = "us.user_status_id > %s"
+        else:
+            name = "GET_ALL_USER_STATUS_WITH_MANAGER_BEFORE"
+            template = USER_STATUS_WITH_MANAGER_BEFORE
+            keyset_condition = "us.user_status_id < %s"
+        total_count = ""
+        params = filter_params + (user_status_id,)
+        if include_count:
+            name += "_WITH_COUNT"
+            total_count = FILTERED_TOTAL_COUNT.format(where=where_clause(conditions))
+            # The filtered count subquery sits in the select list, ahead of the page filters
+            params = filter_params + params
+        query = projected_query(template, columns, total_count, where_clause(conditions + [keyset_condition]))
+        return _fetch_keyset_page(
+            name,
+            query,
+            params,
+            page_size,
+            direction,
+            include_count,
+            lambda: count_user_status_with_manager_rows(status_param, employee_environment_param, search_param),
+        )
+    except Exception as error:
+        logging.error("Error: SELECT user_status with manager keyset page exception!")
+        logging.error(error)
+        logging.error("Error: SELECT user_status with manager keyset page exception end")
+        return func.HttpResponse(f"{error}")
+
+
+def load_org_index():
+    """Load org_index with every (domain_rhonda_id, manager_id) pair in one query."""
+    with db_pool.connection() as connection:
+        with connection.cursor() as cursor:
+            _execute(cursor, "GET_ORG_EDGES", GET_ORG_EDGES)
+            org_index.load(cursor.fetchall())
+
+
+def _org_rows(found):
+    """user_status rows for (domain_rhonda_id, depth) pairs from org_index, read with one batch lookup."""
+    if not found:
+        return []
+    depths = dict(found)
+    user_status = get_user_status_by_domain_rhonda_ids(list(depths))
+    rows = [
+        {"depth": depths[domain_rhonda_id], **row}
+        for domain_rhonda_id, row in user_status.items()
+        if row is not None
+    ]
+    rows.sort(key=lambda row: (row["depth"], row["user_status_id"]))
+    return rows
+
+
+def get_user_status_org(domain_rhonda_id, direction, max_depth):
+    """This function will return the reports (down) or the management chain (up) of domain_rhonda_id.
+    One recursive query on manager_id, or org_index plus one batch lookup when RP_ORG_INDEX is on.
+
+    Args:
+        domain_rhonda_id ([str]): employee the walk starts from
+        direction ([str]): org.DOWN for direct and transitive reports, org.UP for managers
+        max_depth ([int]): levels to walk, 1 = direct reports / direct manager
+
+    Returns:
+        [list]: user_status data with the depth of each row, ordered by depth.
+    """
+    try:
+        if org.ORG_INDEX_ENABLED:
+            if not org_index.loaded:
+                load_org_index()
+            if direction == org.DOWN:
+                return _org_rows(org_index.reports(domain_rhonda_id, max_depth))
+            return _org_rows(org_index.chain(domain_rhonda_id, max_depth))
+
+        with db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                if direction == org.DOWN:
+                    _execute(cursor, "GET_USER_STATUS_REPORTS", GET_USER_STATUS_REPORTS, (domain_rhonda_id, domain_rhonda_id, max_depth))
+                else:
+                    _execute(cursor, "GET_USER_STATUS_MANAGERS", GET_USER_STATUS_MANAGERS, (domain_rhonda_id, max_depth))
+                results = cursor.fetchall()
+                return serializers.for_cursor(cursor).rows(results)
+    except Exception as error:
+        logging.error("Error: SELECT user_status org chart exception!")
+        logging.error(error)
+        logging.error("Error: SELECT user_status org chart exception end")
+        return func.HttpResponse(f"{error}")
+
+
+def get_user_status_changes(since_at, since_id, page_size, safety_seconds):
+    """This function will return the user_status changes after a watermark, oldest first.
+    Inserted and updated rows come back whole, deleted rows as tombstones.
+
+    Args:
+        since_at ([datetime]): changed_at of the watermark, None to read from the beginning
+        since_id ([str]): domain_rhonda_id of the watermark
+        page_size ([int]): Number of changes per page.
+        safety_seconds ([float]): changes younger than this are left for the next pull
+
+    Returns:
+        [list, bool, tuple]: changes, whether more changes are waiting and the (changed_at, domain_rhonda_id)
+        of the last change (None without changes)
+    """
+    try:
+        if since_at is None:
+            since_at, since_id = CHANGES_START
+        params = {
+            "since_at": since_at,
+            "since_id": since_id,
+            "safety_seconds": safety_seconds,
+            # One extra change tells us whether another page is waiting
+            "limit": int(page_size) + 1,
+        }
+        with db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                _execute(cursor, "GET_USER_STATUS_CHANGES", GET_USER_STATUS_CHANGES, params)
+                results = cursor.fetchall()
+                serializer = serializers.for_cursor(cursor)
+        has_more = len(results) > int(page_size)
+        results = results[: int(page_size)]
+        changes = []
+        for result in results:
+            change, changed_at = result[0], result[1]
+            if change == CHANGE_DELETE:
+                changes.append(
+                    {
+                        "change": change,
+                        "user_status_id": result[2],
+                        "domain_rhonda_id": result[3],
+                        "deleted_at": serializers.datetime_converter(changed_at),
+                    }
+                )
+            else:
+                user_status = serializer.row(result)
+                del user_status["changed_at"]
+                changes.append(user_status)
+        last = (results[-1][1], results[-1][3]) if results else None
+        return changes, has_more, last
+    except Exception as error:
+        logging.error("Error: SELECT user_status changes exception!")
+        logging.error(error)
+        logging.error("Error: SELECT user_status changes exception end")
+        return func.HttpResponse(f"{error}")
+
+
+def get_user_status_stats(group_by, filters):
+    """This function will return headcounts from the user_status_stats summary table.
+
+    Args:
+        group_by ([tuple]): dimensions counted together, empty to count each dimension on its own
+        filters ([dict]): equality filters by dimension, None or "%" for any
+
+    Returns:
+        [int, dict|list]: total headcount and the counts, {dimension: [{"value", "headcount"}]} without
+        group_by, [{dimension: value, ..., "headcount"}] with it
+    """
+    try:
+        conditions = []
+        params = ()
+        for dimension in STATS_DIMENSIONS:
+            value = _filter_value(filters.get(dimension))
+            if value is not None:
+                conditions.append(f"{dimension} = %s")
+                params += (value,)
+        if group_by:
+            grouping_sets = f"({', '.join(group_by)}), ()"
+        else:
+            grouping_sets = ", ".join(f"({dimension})" for dimension in STATS_DIMENSIONS) + ", ()"
+        query = USER_STATUS_STATS.format(where=where_clause(conditions), grouping_sets=grouping_sets)
+        with db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                _execute(cursor, "GET_USER_STATUS_STATS", query, params)
+                results = cursor.fetchall()
+
+        total = 0
+        by_dimension = {dimension: [] for dimension in STATS_DIMENSIONS}
+        groups = []
+        for result in results:
+            # GROUPING() sets the bit of every dimension the row is *not* grouped by, first dimension highest
+            grouped = [
+                index
+                for index in range(len(STATS_DIMENSIONS))
+                if not result[0] & (1 << (len(STATS_DIMENSIONS) - 1 - index))
+            ]
+            headcount = int(result[-1])
+            if not grouped:
+                total = headcount
+            elif group_by:
+                group = {STATS_DIMENSIONS[index]: result[index + 1] for index in grouped}
+                group["headcount"] = headcount
+                groups.append(group)
+            else:
+                index = grouped[0]
+                by_dimension[STATS_DIMENSIONS[index]].append({"value": result[index + 1], "headcount": headcount})
+        return total, groups if group_by else by_dimension
+    except Exception as error:
+        logging.error("Error: SELECT user_status stats exception!")
+        logging.error(error)
+        logging.error("Error: SELECT user_status stats exception end")
+        return func.HttpResponse(f"{error}")
+
+
 def add_user_status(
     domain_rhonda_id,
     status,
@@ -280,9 +1117,11 @@ def add_user_status(
         end_date ([str]): "YYYY-MM-DD" format, it can be null
     """
     try:
-        with connection:
+        with db_pool.connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(
+                _execute(
+                    cursor,
+                    "INSERT_USER_STATUS",
                     INSERT_USER_STATUS,
                     (
                         domain_rhonda_id,
@@ -298,7 +1137,14 @@ def add_user_status(
                         end_date,
                     ),
                 )
-                return f"{cursor.fetchone()[0]} has been added successfully!"
+                inserted = cursor.fetchone()
+        # Only once committed: a read before the commit would put the old row back in the cache
+        user_status_cache.invalidate(domain_rhonda_id)
+        if not inserted:
+            return None
+        count_cache.clear()
+        org_index.set_manager(domain_rhonda_id, manager_id)
+        return f"{inserted[0]} has been added successfully!"
     except Exception as error:
         logging.error("Error: INSERT user_status exception!")
         logging.error(error)
@@ -335,9 +1181,11 @@ def update_user_status(
         end_date ([str]): "YYYY-MM-DD" format, it can be null
     """
     try:
-        with connection:
+        with db_pool.connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(
+                _execute(
+                    cursor,
+                    "UPDATE_USER_STATUS",
                     UPDATE_USER_STATUS,
                     (
                         status,
@@ -354,7 +1202,16 @@ def update_user_status(
                     ),
                 )
 
-                return f"{cursor.fetchone()[0]} has been updated successfully!"
+                updated = cursor.fetchone()
+        # Only once committed, see add_user_status
+        user_status_cache.invalidate(domain_rhonda_id)
+        if not updated:
+            return None
+        count_cache.clear()
+        if manager_id is not None:
+            # COALESCE keeps the old manager_id when none is passed
+            org_index.set_manager(domain_rhonda_id, manager_id)
+        return f"{updated[0]} has been updated successfully!"
     except Exception as error:
         logging.error("Error: UPDATE user_status exception!")
         logging.error(error)
@@ -369,9 +1226,9 @@ def count_user_status_rows():
         [int]: Number of rows in db.
     """
     try:
-        with connection:
+        with db_pool.connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(COUNT_USER_STATUS_ROWS)
+                _execute(cursor, "COUNT_USER_STATUS_ROWS", COUNT_USER_STATUS_ROWS)
                 return cursor.fetchall()[0][0]
     except Exception as error:
         logging.error("Error: count_user_status_rows exception!")
@@ -380,17 +1237,120 @@ def count_user_status_rows():
         return func.HttpResponse(f"{error}")
 
 
-def user_status_max_page(page_size):
+def count_user_status_with_manager_rows(status_param, employee_environment_param, search_param=None):
+    """Count rows matching the user-status-hr filters.
+
+    Args:
+        status_param ([str]): status filter
+        employee_environment_param ([str]): employee_environment filter
+        search_param ([str]): employee/manager name search
+
+    Returns:
+        [int]: Number of rows matching the filters.
+    """
+    try:
+        with db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                conditions, params = hr_filters(status_param, employee_environment_param, search_param)
+                _execute(
+                    cursor,
+                    "COUNT_USER_STATUS_WITH_MANAGER_ROWS",
+                    COUNT_USER_STATUS_WITH_MANAGER_ROWS.format(where=where_clause(conditions)),
+                    params,
+                )
+                return cursor.fetchall()[0][0]
+    except Exception as error:
+        logging.error("Error: count_user_status_with_manager_rows exception!")
+        logging.error(error)
+        logging.error("Error: count_user_status_with_manager_rows exception end")
+        return func.HttpResponse(f"{error}")
+
+
+def estimate_user_status_rows(status_param=None, employee_environment_param=None, search_param=None):
+    """Estimate matching rows from planner statistics instead of counting them.
+    Unfiltered totals come from pg_class.reltuples, filtered ones from the plan row estimate.
+
+    Args:
+        status_param ([str]): status filter
+        employee_environment_param ([str]): employee_environment filter
+        search_param ([str]): employee/manager name search
+
+    Returns:
+        [int]: Estimated number of rows.
+    """
+    try:
+        with db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                conditions, params = hr_filters(status_param, employee_environment_param, search_param)
+                if not conditions:
+                    _execute(cursor, "ESTIMATE_USER_STATUS_ROWS", ESTIMATE_USER_STATUS_ROWS)
+                    estimate = cursor.fetchone()[0]
+                else:
+                    _execute(
+                        cursor,
+                        "EXPLAIN_USER_STATUS_WITH_MANAGER_ROWS",
+                        EXPLAIN_USER_STATUS_WITH_MANAGER_ROWS.format(where=where_clause(conditions)),
+                        params,
+                    )
+                    plan = cursor.fetchone()[0]
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    estimate = plan[0]["Plan"]["Plan Rows"]
+        # reltuples is -1 (or 0) until the table has been vacuumed/analyzed
+        if estimate is None or estimate < 0:
+            return count_user_status_with_manager_rows(status_param, employee_environment_param, search_param)
+        return int(estimate)
+    except Exception as error:
+        logging.error("Error: estimate_user_status_rows exception!")
+        logging.error(error)
+        logging.error("Error: estimate_user_status_rows exception end")
+        return func.HttpResponse(f"{error}")
+
+
+def list_total_count(count_mode, status_param=None, employee_environment_param=None, search_param=None):
+    """Total for a list page in the requested count mode.
+
+    Args:
+        count_mode ([str]): exact, estimate or cached
+        status_param ([str]): status filter
+        employee_environment_param ([str]): employee_environment filter
+        search_param ([str]): employee/manager name search
+
+    Returns:
+        [int]: Number of rows matching the filters.
+    """
+    if count_mode == COUNT_MODE_ESTIMATE:
+        return estimate_user_status_rows(status_param, employee_environment_param, search_param)
+
+    key = (_filter_value(status_param), _filter_value(employee_environment_param), search_pattern(search_param))
+    if count_mode == COUNT_MODE_CACHED:
+        total_count = count_cache.get(key)
+        if total_count is not None:
+            return total_count
+
+    if key == (None, None, None):
+        total_count = count_user_status_rows()
+    else:
+        total_count = count_user_status_with_manager_rows(status_param, employee_environment_param, search_param)
+    if isinstance(total_count, int):
+        count_cache.set(key, total_count)
+    return total_count
+
+
+def user_status_max_page(page_size, total_rows=None):
     """Depending on page_size we will get number of pages.
 
     Args:
         page_size ([int]): Number of rows per page.
+        total_rows ([int]): Number of rows, counted in DB when not passed.
 
     Returns:
         [int]: Number of pages
     """
     try:
-        total_rows = int(count_user_status_rows())
+        if total_rows is None:
+            total_rows = count_user_status_rows()
+        total_rows = int(total_rows)
         if total_rows % int(page_size) != 0:
             max_page = int(total_rows / int(page_size)) + 1
         else:
@@ -414,12 +1374,217 @@ def delete_user_status(domain_rhonda_id):
         [str]: domain_rhonda_id that has been deleted.
     """
     try:
-        with connection:
+        with db_pool.connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(DELETE_USER_STATUS, (domain_rhonda_id,))
-                print(f"Delete cursor: {cursor.fetchone()[0]}")
+                _execute(cursor, "DELETE_USER_STATUS", DELETE_USER_STATUS, (domain_rhonda_id,))
+                deleted = cursor.fetchone()
+        # Only once committed, see add_user_status
+        user_status_cache.invalidate(domain_rhonda_id)
+        if not deleted:
+            return None
+        count_cache.clear()
+        org_index.remove(domain_rhonda_id)
+        return deleted[0]
     except Exception as error:
         logging.error("Error: DELETE user_status by domain_rhonda_id exception!")
         logging.error(error)
         logging.error("Error: DELETE user_status by domain_rhonda_id exception end")
         return func.HttpResponse(f"{error}")
+
+
+def _chunks(rows, chunk_size):
+    for start in range(0, len(rows), chunk_size):
+        yield rows[start : start + chunk_size]
+
+
+def bulk_add_user_status(rows, chunk_size):
+    """Insert many user_status rows with one multi-row INSERT per chunk. Each chunk is committed on its own.
+
+    Args:
+        rows ([list]): tuples in INSERT_USER_STATUS column order
+        chunk_size ([int]): rows per statement
+
+    Returns:
+        [tuple]: domain_rhonda_ids that were inserted (ids that already existed are left out), number of
+        rows in committed chunks and the error that stopped the remaining chunks, None when all were committed.
+    """
+    created = set()
+    committed = 0
+    try:
+        if not rows:
+            return created, committed, None
+        with db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                for chunk in _chunks(rows, chunk_size):
+                    results = _execute_values(
+                        cursor, "BULK_INSERT_USER_STATUS", BULK_INSERT_USER_STATUS, chunk, page_size=len(chunk)
+                    )
+                    connection.commit()
+                    chunk_created = {row[0] for row in results}
+                    created.update(chunk_created)
+                    # Caches are invalidated as each chunk is committed, a later chunk may fail
+                    if chunk_created:
+                        count_cache.clear()
+                    for domain_rhonda_id in chunk_created:
+                        user_status_cache.invalidate(domain_rhonda_id)
+                    # Only the first row of a repeated id was inserted
+                    for row in chunk:
+                        if row[0] in chunk_created:
+                            chunk_created.discard(row[0])
+                            org_index.set_manager(row[0], row[5])
+                    committed += len(chunk)
+        return created, committed, None
+    except Exception as error:
+        logging.error("Error: bulk INSERT user_status exception!")
+        logging.error(error)
+        logging.error("Error: bulk INSERT user_status exception end")
+        return created, committed, f"{error}"
+
+
+def bulk_update_user_status(rows, chunk_size):
+    """Update many user_status rows with one UPDATE ... FROM (VALUES ...) per chunk. Each chunk is committed on its own.
+
+    Args:
+        rows ([list]): tuples of domain_rhonda_id followed by the UPDATE_USER_STATUS fields
+        chunk_size ([int]): rows per statement
+
+    Returns:
+        [tuple]: domain_rhonda_ids that were updated (unknown ids are left out), number of rows in
+        committed chunks and the error that stopped the remaining chunks, None when all were committed.
+    """
+    updated = set()
+    committed = 0
+    try:
+        if not rows:
+            return updated, committed, None
+        with db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                for chunk in _chunks(rows, chunk_size):
+                    results = _execute_values(
+                        cursor,
+                        "BULK_UPDATE_USER_STATUS",
+                        BULK_UPDATE_USER_STATUS,
+                        chunk,
+                        template=BULK_UPDATE_USER_STATUS_TEMPLATE,
+                        page_size=len(chunk),
+                    )
+                    connection.commit()
+                    chunk_updated = {row[0] for row in results}
+                    updated.update(chunk_updated)
+                    if chunk_updated:
+                        count_cache.clear()
+                    for domain_rhonda_id in chunk_updated:
+                        user_status_cache.invalidate(domain_rhonda_id)
+                    for row in chunk:
+                        if row[0] in chunk_updated and row[5] is not None:
+                            org_index.set_manager(row[0], row[5])
+                    committed += len(chunk)
+        return updated, committed, None
+    except Exception as error:
+        logging.error("Error: bulk UPDATE user_status exception!")
+        logging.error(error)
+        logging.error("Error: bulk UPDATE user_status exception end")
+        return updated, committed, f"{error}"
+
+
+def bulk_delete_user_status(domain_rhonda_ids, chunk_size):
+    """Delete many user_status rows with one DELETE ... = ANY() per chunk. Each chunk is committed on its own.
+
+    Args:
+        domain_rhonda_ids ([list]): domain_rhonda_ids to delete
+        chunk_size ([int]): ids per statement
+
+    Returns:
+        [tuple]: domain_rhonda_ids that were deleted (unknown ids are left out), number of ids in
+        committed chunks and the error that stopped the remaining chunks, None when all were committed.
+    """
+    deleted = set()
+    committed = 0
+    try:
+        if not domain_rhonda_ids:
+            return deleted, committed, None
+        with db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                for chunk in _chunks(domain_rhonda_ids, chunk_size):
+                    _execute(cursor, "BULK_DELETE_USER_STATUS", BULK_DELETE_USER_STATUS, (list(chunk),))
+                    chunk_deleted = {row[0] for row in cursor.fetchall()}
+                    connection.commit()
+                    deleted.update(chunk_deleted)
+                    if chunk_deleted:
+                        count_cache.clear()
+                    for domain_rhonda_id in chunk_deleted:
+                        user_status_cache.invalidate(domain_rhonda_id)
+                        org_index.remove(domain_rhonda_id)
+                    committed += len(chunk)
+        return deleted, committed, None
+    except Exception as error:
+        logging.error("Error: bulk DELETE user_status exception!")
+        logging.error(error)
+        logging.error("Error: bulk DELETE user_status exception end")
+        return deleted, committed, f"{error}"
+
+
+def claim_idempotency_key(key, request_hash, ttl, lock_seconds):
+    """Claim an Idempotency-Key for one request, or read what it already holds.
+
+    Args:
+        key ([str]): Idempotency-Key header value
+        request_hash ([bytes]): SHA-256 of the request (see idempotency.request_hash)
+        ttl ([float]): seconds the key and its response are kept
+        lock_seconds ([float]): seconds after which an unfinished request's claim may be taken over
+
+    Returns:
+        [tuple]: None when the key was claimed for this request, otherwise the stored
+        (request_hash, status_code, mimetype, charset, headers, body); status_code is None while
+        the first request is still running
+    """
+    params = {"key": key, "request_hash": request_hash, "ttl": ttl, "lock_seconds": lock_seconds}
+    with db_pool.connection() as connection:
+        with connection.cursor() as cursor:
+            _execute(cursor, "CLAIM_IDEMPOTENCY_KEY", CLAIM_IDEMPOTENCY_KEY, params)
+            if cursor.fetchone() is not None:
+                return None
+            _execute(cursor, "GET_IDEMPOTENCY_KEY", GET_IDEMPOTENCY_KEY, params)
+            stored = cursor.fetchone()
+    # Pruned between both statements: report it as running, the client retries
+    if stored is None:
+        return request_hash, None, None, None, None, None
+    request_hash, status_code, mimetype, charset, headers, body = stored
+    return bytes(request_hash), status_code, mimetype, charset, headers, bytes(body) if body is not None else None
+
+
+def save_idempotency_response(key, request_hash, status_code, mimetype, charset, headers, body):
+    """Store the response of the request holding an Idempotency-Key."""
+    params = {
+        "key": key,
+        "request_hash": request_hash,
+        "status_code": status_code,
+        "mimetype": mimetype,
+        "charset": charset,
+        "headers": headers,
+        "body": body,
+    }
+    with db_pool.connection() as connection:
+        with connection.cursor() as cursor:
+            _execute(cursor, "SAVE_IDEMPOTENCY_RESPONSE", SAVE_IDEMPOTENCY_RESPONSE, params)
+
+
+def release_idempotency_key(key, request_hash):
+    """Drop an unfinished claim (the request failed), so a retry runs the request again."""
+    with db_pool.connection() as connection:
+        with connection.cursor() as cursor:
+            _execute(
+                cursor, "RELEASE_IDEMPOTENCY_KEY", RELEASE_IDEMPOTENCY_KEY, {"key": key, "request_hash": request_hash}
+            )
+
+
+def prune_idempotency_keys(limit):
+    """Delete up to limit expired Idempotency-Keys.
+
+    Returns:
+        [int]: Number of keys deleted.
+    """
+    with db_pool.connection() as connection:
+        with connection.cursor() as cursor:
+            _execute(cursor, "PRUNE_IDEMPOTENCY_KEYS", PRUNE_IDEMPOTENCY_KEYS, {"limit": limit})
+            return cursor.rowcount
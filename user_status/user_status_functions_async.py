@@ -0,0 +1,609 @@
+#!/usr/bin/python
+import azure.functions as func
+import asyncio
+import json
+import logging
+import time
+from . import async_db_pool
+from . import pagination
+from . import serializers
+from . import instrumentation
+from . import slow_queries
+from .user_status_functions import (
+    ALL_USER_STATUS_AFTER,
+    ALL_USER_STATUS_BEFORE,
+    ALL_USER_STATUS_PAGE,
+    CLAIM_IDEMPOTENCY_KEY,
+    COUNT_MODE_CACHED,
+    COUNT_MODE_ESTIMATE,
+    COUNT_MODE_EXACT,
+    COUNT_USER_STATUS_ROWS,
+    COUNT_USER_STATUS_WITH_MANAGER_ROWS,
+    DELETE_USER_STATUS,
+    ESTIMATE_USER_STATUS_ROWS,
+    EXPLAIN_USER_STATUS_WITH_MANAGER_ROWS,
+    GET_ALL_USER_STATUS,
+    GET_ALL_USER_STATUS_AFTER,
+    GET_ALL_USER_STATUS_BEFORE,
+    GET_IDEMPOTENCY_KEY,
+    GET_USER_STATUS_BY_DOMAIN_RHONDA_ID,
+    INSERT_USER_STATUS,
+    PRUNE_IDEMPOTENCY_KEYS,
+    RELEASE_IDEMPOTENCY_KEY,
+    SAVE_IDEMPOTENCY_RESPONSE,
+    STATEMENT_PARAM_NAMES,
+    UPDATE_USER_STATUS,
+    USER_STATUS_BY_DOMAIN_RHONDA_ID,
+    USER_STATUS_WITH_MANAGER_AFTER,
+    USER_STATUS_WITH_MANAGER_BEFORE,
+    USER_STATUS_WITH_MANAGER_COLUMNS,
+    USER_STATUS_WITH_MANAGER_PAGE,
+    USER_STATUS_WITH_MANAGER_SELECT_LIST,
+    _filter_value,
+    _project,
+    count_cache,
+    hr_filters,
+    search_pattern,
+    org_index,
+    projected_query,
+    select_list,
+    user_status_cache,
+    where_clause,
+)
+
+
+# Async versions of the user_status_functions reads and writes, on async_db_pool.
+# Queries, caches and the org index are the ones of user_status_functions, so both
+# handlers see each other's writes. Totals are never folded into the page query:
+# the count runs on a second connection at the same time as the page.
+
+
+async def _execute(cursor, name, query, params=None):
+    """await cursor.execute, timed as statement name for instrumentation and the slow-query log."""
+    metrics = instrumentation.current()
+    if metrics is None and not slow_queries.SLOW_QUERY_ENABLED:
+        await cursor.execute(query, params)
+        return
+    started = time.perf_counter()
+    await cursor.execute(query, params)
+    ms = (time.perf_counter() - started) * 1000
+    if metrics is not None:
+        metrics.add_statement(name, ms, cursor.rowcount)
+    if slow_queries.SLOW_QUERY_ENABLED and ms >= slow_queries.SLOW_QUERY_MS:
+        slow_queries.record(name, query, params, ms, STATEMENT_PARAM_NAMES.get(name))
+
+
+async def _fetch_rows(name, query, params):
+    """Run a read on its own pooled connection. Returns the result tuples and their serializer."""
+    async with async_db_pool.connection() as connection:
+        async with connection.cursor() as cursor:
+            await _execute(cursor, name, query, params)
+            results = await cursor.fetchall()
+            return results, serializers.for_cursor(cursor)
+
+
+async def _fetch_one(name, query, params=None):
+    async with async_db_pool.connection() as connection:
+        async with connection.cursor() as cursor:
+            await _execute(cursor, name, query, params)
+            return await cursor.fetchone()
+
+
+async def _with_total(
+    page, include_count, count_mode, status_param=None, employee_environment_param=None, search_param=None
+):
+    """Await a page coroutine and, when include_count, its total concurrently (see list_total_count).
+
+    Returns:
+        [tuple]: page result and total count (None if not included)
+    """
+    if not include_count:
+        return await page, None
+    page_result, total_count = await asyncio.gather(
+        page, list_total_count(count_mode, status_param, employee_environment_param, search_param)
+    )
+    return page_result, total_count
+
+
+async def get_all_user_status(page_size, page, include_count=True, fields=None, count_mode=COUNT_MODE_EXACT):
+    """Async get_all_user_status: one page of user_status, the total counted alongside it.
+
+    Args:
+        page_size ([int]): Number of rows per page.
+        page ([int]): Page number starting at 1.
+        include_count ([bool]): Whether to compute the total row count.
+        fields ([tuple]): columns to select (see parse_fields), all columns when None.
+        count_mode ([str]): exact, estimate or cached (see list_total_count)
+
+    Returns:
+        [list, int]: user_status data depending on page and page_size, and the total row count (None if not included).
+    """
+    try:
+        offset = int(page_size) * (int(page) - 1)
+        query = projected_query(ALL_USER_STATUS_PAGE, select_list(fields)) if fields else GET_ALL_USER_STATUS
+        (results, serializer), total_count = await _with_total(
+            _fetch_rows("GET_ALL_USER_STATUS", query, (page_size, offset)), include_count, count_mode
+        )
+        if not results:
+            logging.info(f"message: There is no results for all users status.")
+            return {}, total_count
+        return serializer.rows(results), total_count
+    except Exception as error:
+        logging.error("Error: SELECT all user_status exception!")
+        logging.error(error)
+        logging.error("Error: SELECT all user_status exception end")
+        return func.HttpResponse(f"{error}")
+
+
+async def get_user_status_by_domain_rhonda_id(domain_rhonda_id, fields=None):
+    """Async get_user_status_by_domain_rhonda_id, served from user_status_cache when present.
+
+    Args:
+        domain_rhonda_id ([str]): domain_rhonda_id to look up
+        fields ([tuple]): columns to return (see parse_fields), all columns when None.
+
+    Returns:
+        [dict]: user_status data, empty when domain_rhonda_id doesn't exist.
+    """
+    try:
+        project_in_sql = bool(fields) and not user_status_cache.enabled
+        # Taken before the read, see user_status_functions.get_user_status_by_domain_rhonda_id
+        generation = user_status_cache.generation()
+        if not project_in_sql:
+            user_status = user_status_cache.get(domain_rhonda_id)
+            if user_status is not None:
+                return _project(user_status, fields)
+        if project_in_sql:
+            query = projected_query(USER_STATUS_BY_DOMAIN_RHONDA_ID, select_list(fields))
+        else:
+            query = GET_USER_STATUS_BY_DOMAIN_RHONDA_ID
+        results, serializer = await _fetch_rows("GET_USER_STATUS_BY_DOMAIN_RHONDA_ID", query, (domain_rhonda_id,))
+        if not results:
+            logging.info(f"message: There is no result for domain_rhonda_id: {domain_rhonda_id}")
+            return {}
+        user_status = serializer.row(results[0])
+        if project_in_sql:
+            return user_status
+        user_status_cache.set(domain_rhonda_id, user_status, generation)
+        return _project(user_status, fields)
+    except Exception as error:
+        logging.error("Error: SELECT user_status by domain_rhonda_id exception!")
+        logging.error(error)
+        logging.error("Error: SELECT user_status by domain_rhonda_id exception end")
+        return func.HttpResponse(f"{error}")
+
+
+async def get_all_user_status_with_manager(
+    status_param,
+    employee_environment_param,
+    page_size,
+    page,
+    include_count=True,
+    fields=None,
+    count_mode=COUNT_MODE_EXACT,
+    search_param=None,
+):
+    """Async get_all_user_status_with_manager: one filtered page with manager name, the total counted alongside it.
+
+    Args:
+        status_param ([str]): status filter
+        employee_environment_param ([str]): employee_environment filter
+        page_size ([int]): Number of rows per page.
+        page ([int]): Page number starting at 1.
+        include_count ([bool]): Whether to compute the total row count.
+        fields ([tuple]): fields to select (see parse_fields), all fields when None.
+        count_mode ([str]): exact, estimate or cached (see list_total_count)
+        search_param ([str]): employee/manager name search (see search_pattern)
+
+    Returns:
+        [list, int]: user_status data depending on page and page_size, and the total row count (None if not included).
+    """
+    try:
+        offset = int(page_size) * (int(page) - 1)
+        columns = select_list(fields, USER_STATUS_WITH_MANAGER_COLUMNS) if fields else USER_STATUS_WITH_MANAGER_SELECT_LIST
+        conditions, params = hr_filters(status_param, employee_environment_param, search_param)
+        query = projected_query(USER_STATUS_WITH_MANAGER_PAGE, columns, "", where_clause(conditions))
+        (results, serializer), total_count = await _with_total(
+            _fetch_rows("GET_ALL_USER_STATUS_WITH_MANAGER", query, params + (page_size, offset)),
+            include_count,
+            count_mode,
+            status_param,
+            employee_environment_param,
+            search_param,
+        )
+        if not results:
+            logging.info(f"message: There is no results for all users status with manager.")
+            return {}, total_count
+        return serializer.rows(results), total_count
+    except Exception as error:
+        logging.error("Error: SELECT all user_status with manager exception!")
+        logging.error(error)
+        logging.error("Error: SELECT all user_status with manager exception end")
+        return func.HttpResponse(f"{error}")
+
+
+async def _fetch_keyset_page(name, query, params, page_size, direction):
+    """Run a keyset query that asks for page_size + 1 rows and shape the result."""
+    # One extra row tells us whether another page exists
+    results, serializer = await _fetch_rows(name, query, params + (int(page_size) + 1,))
+    has_more = len(results) > int(page_size)
+    results = results[: int(page_size)]
+    if direction == pagination.PREVIOUS:
+        results.reverse()
+    return serializer.rows(results), has_more
+
+
+async def get_all_user_status_keyset(
+    page_size, user_status_id, direction, include_count=True, fields=None, count_mode=COUNT_MODE_EXACT
+):
+    """Async get_all_user_status_keyset: one keyset page, the total counted alongside it.
+
+    Args:
+        page_size ([int]): Number of rows per page.
+        user_status_id ([int]): user_status_id from the request cursor, 0 for the first page.
+        direction ([str]): pagination.NEXT or pagination.PREVIOUS
+        include_count ([bool]): Whether to compute the total row count.
+        fields ([tuple]): columns to select (see parse_fields), all columns when None.
+        count_mode ([str]): exact, estimate or cached (see list_total_count)
+
+    Returns:
+        [list, bool, int]: user_status data ordered by user_status_id, whether more rows exist in that direction
+        and the total row count (None if not included).
+    """
+    try:
+        if fields:
+            template = ALL_USER_STATUS_AFTER if direction == pagination.NEXT else ALL_USER_STATUS_BEFORE
+            query = projected_query(template, select_list(fields))
+        else:
+            query = GET_ALL_USER_STATUS_AFTER if direction == pagination.NEXT else GET_ALL_USER_STATUS_BEFORE
+        name = "GET_ALL_USER_STATUS_AFTER" if direction == pagination.NEXT else "GET_ALL_USER_STATUS_BEFORE"
+        (user_status_data, has_more), total_count = await _with_total(
+            _fetch_keyset_page(name, query, (user_status_id,), page_size, direction), include_count, count_mode
+        )
+        return user_status_data, has_more, total_count
+    except Exception as error:
+        logging.error("Error: SELECT user_status keyset page exception!")
+        logging.error(error)
+        logging.error("Error: SELECT user_status keyset page exception end")
+        return func.HttpResponse(f"{error}")
+
+
+async def get_all_user_status_with_manager_keyset(
+    status_param,
+    employee_environment_param,
+    page_size,
+    user_status_id,
+    direction,
+    include_count=True,
+    fields=None,
+    count_mode=COUNT_MODE_EXACT,
+    search_param=None,
+):
+    """Async get_all_user_status_with_manager_keyset: one filtered keyset page, the total counted alongside it.
+
+    Args:
+        status_param ([str]): status filter
+        employee_environment_param ([str]): employee_environment filter
+        page_size ([int]): Number of rows per page.
+        user_status_id ([int]): user_status_id from the request cursor, 0 for the first page.
+        direction ([str]): pagination.NEXT or pagination.PREVIOUS
+        include_count ([bool]): Whether to compute the total row count.
+        fields ([tuple]): fields to select (see parse_fields), all fields when None.
+        count_mode ([str]): exact, estimate or cached (see list_total_count)
+        search_param ([str]): employee/manager name search (see search_pattern)
+
+    Returns:
+        [list, bool, int]: user_status data ordered by user_status_id, whether more rows exist in that direction
+        and the total row count (None if not included).
+    """
+    try:
+        columns = select_list(fields, USER_STATUS_WITH_MANAGER_COLUMNS) if fields else USER_STATUS_WITH_MANAGER_SELECT_LIST
+        conditions, params = hr_filters(status_param, employee_environment_param, search_param)
+        if direction == pagination.NEXT:
+            name = "GET_ALL_USER_STATUS_WITH_MANAGER_AFTER"
+            template = USER_STATUS_WITH_MANAGER_AFTER
+            keyset_condition = "us.user_status_id > %s"
+        else:
+            name = "GET_ALL_USER_STATUS_WITH_MANAGER_BEFORE"
+            template = USER_STATUS_WITH_MANAGER_BEFORE
+            keyset_condition = "us.user_status_id < %s"
+        query = projected_query(template, columns, "", where_clause(conditions + [keyset_condition]))
+        (user_status_data, has_more), total_count = await _with_total(
+            _fetch_keyset_page(name, query, params + (user_status_id,), page_size, direction),
+            include_count,
+            count_mode,
+            status_param,
+            employee_environment_param,
+            search_param,
+        )
+        return user_status_data, has_more, total_count
+    except Exception as error:
+        logging.error("Error: SELECT user_status with manager keyset page exception!")
+        logging.error(error)
+        logging.error("Error: SELECT user_status with manager keyset page exception end")
+        return func.HttpResponse(f"{error}")
+
+
+async def add_user_status(
+    domain_rhonda_id,
+    status,
+    employee_environment,
+    department,
+    work_type,
+    manager_id,
+    work_location,
+    gender,
+    birth_date,
+    start_date,
+    end_date,
+):
+    """Async add_user_status: insert a user_status row unless domain_rhonda_id already exists.
+
+    Args: see user_status_functions.add_user_status
+
+    Returns:
+        [str]: success message, None when domain_rhonda_id already exists.
+    """
+    try:
+        inserted = await _fetch_one(
+            "INSERT_USER_STATUS",
+            INSERT_USER_STATUS,
+            (
+                domain_rhonda_id,
+                status,
+                employee_environment,
+                department,
+                work_type,
+                manager_id,
+                work_location,
+                gender,
+                birth_date,
+                start_date,
+                end_date,
+            ),
+        )
+        user_status_cache.invalidate(domain_rhonda_id)
+        if not inserted:
+            return None
+        count_cache.clear()
+        org_index.set_manager(domain_rhonda_id, manager_id)
+        return f"{inserted[0]} has been added successfully!"
+    except Exception as error:
+        logging.error("Error: INSERT user_status exception!")
+        logging.error(error)
+        logging.error("Error: INSERT user_status exception end")
+        return func.HttpResponse(f"{error}")
+
+
+async def update_user_status(
+    status,
+    employee_environment,
+    department,
+    work_type,
+    manager_id,
+    work_location,
+    gender,
+    birth_date,
+    start_date,
+    end_date,
+    domain_rhonda_id,
+):
+    """Async update_user_status: update the user_status row of domain_rhonda_id.
+
+    Args: see user_status_functions.update_user_status
+
+    Returns:
+        [str]: success message, None when domain_rhonda_id doesn't exist.
+    """
+    try:
+        updated = await _fetch_one(
+            "UPDATE_USER_STATUS",
+            UPDATE_USER_STATUS,
+            (
+                status,
+                employee_environment,
+                department,
+                work_type,
+                manager_id,
+                work_location,
+                gender,
+                birth_date,
+                start_date,
+                end_date,
+                domain_rhonda_id,
+            ),
+        )
+        user_status_cache.invalidate(domain_rhonda_id)
+        if not updated:
+            return None
+        count_cache.clear()
+        if manager_id is not None:
+            # COALESCE keeps the old manager_id when none is passed
+            org_index.set_manager(domain_rhonda_id, manager_id)
+        return f"{updated[0]} has been updated successfully!"
+    except Exception as error:
+        logging.error("Error: UPDATE user_status exception!")
+        logging.error(error)
+        logging.error("Error: UPDATE user_status exception end")
+        return func.HttpResponse(f"{error}")
+
+
+async def delete_user_status(domain_rhonda_id):
+    """Async delete_user_status: delete the user_status row of domain_rhonda_id.
+
+    Args:
+        domain_rhonda_id ([str]): domain_rhonda_id
+
+    Returns:
+        [str]: domain_rhonda_id that has been deleted, None when it doesn't exist.
+    """
+    try:
+        deleted = await _fetch_one("DELETE_USER_STATUS", DELETE_USER_STATUS, (domain_rhonda_id,))
+        user_status_cache.invalidate(domain_rhonda_id)
+        if not deleted:
+            return None
+        count_cache.clear()
+        org_index.remove(domain_rhonda_id)
+        return deleted[0]
+    except Exception as error:
+        logging.error("Error: DELETE user_status by domain_rhonda_id exception!")
+        logging.error(error)
+        logging.error("Error: DELETE user_status by domain_rhonda_id exception end")
+        return func.HttpResponse(f"{error}")
+
+
+async def count_user_status_rows():
+    """Count rows in DB.
+
+    Returns:
+        [int]: Number of rows in db.
+    """
+    try:
+        return (await _fetch_one("COUNT_USER_STATUS_ROWS", COUNT_USER_STATUS_ROWS))[0]
+    except Exception as error:
+        logging.error("Error: count_user_status_rows exception!")
+        logging.error(error)
+        logging.error("Error: count_user_status_rows exception end")
+        return func.HttpResponse(f"{error}")
+
+
+async def count_user_status_with_manager_rows(status_param, employee_environment_param, search_param=None):
+    """Count rows matching the user-status-hr filters.
+
+    Args:
+        status_param ([str]): status filter
+        employee_environment_param ([str]): employee_environment filter
+        search_param ([str]): employee/manager name search
+
+    Returns:
+        [int]: Number of rows matching the filters.
+    """
+    try:
+        conditions, params = hr_filters(status_param, employee_environment_param, search_param)
+        counted = await _fetch_one(
+            "COUNT_USER_STATUS_WITH_MANAGER_ROWS",
+            COUNT_USER_STATUS_WITH_MANAGER_ROWS.format(where=where_clause(conditions)),
+            params,
+        )
+        return counted[0]
+    except Exception as error:
+        logging.error("Error: count_user_status_with_manager_rows exception!")
+        logging.error(error)
+        logging.error("Error: count_user_status_with_manager_rows exception end")
+        return func.HttpResponse(f"{error}")
+
+
+async def estimate_user_status_rows(status_param=None, employee_environment_param=None, search_param=None):
+    """Estimate matching rows from planner statistics, like user_status_functions.estimate_user_status_rows.
+
+    Args:
+        status_param ([str]): status filter
+        employee_environment_param ([str]): employee_environment filter
+        search_param ([str]): employee/manager name search
+
+    Returns:
+        [int]: Estimated number of rows.
+    """
+    try:
+        conditions, params = hr_filters(status_param, employee_environment_param, search_param)
+        if not conditions:
+            estimate = (await _fetch_one("ESTIMATE_USER_STATUS_ROWS", ESTIMATE_USER_STATUS_ROWS))[0]
+        else:
+            plan = (
+                await _fetch_one(
+                    "EXPLAIN_USER_STATUS_WITH_MANAGER_ROWS",
+                    EXPLAIN_USER_STATUS_WITH_MANAGER_ROWS.format(where=where_clause(conditions)),
+                    params,
+                )
+            )[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = plan[0]["Plan"]["Plan Rows"]
+        # reltuples is -1 (or 0) until the table has been vacuumed/analyzed
+        if estimate is None or estimate < 0:
+            return await count_user_status_with_manager_rows(status_param, employee_environment_param, search_param)
+        return int(estimate)
+    except Exception as error:
+        logging.error("Error: estimate_user_status_rows exception!")
+        logging.error(error)
+        logging.error("Error: estimate_user_status_rows exception end")
+        return func.HttpResponse(f"{error}")
+
+
+async def list_total_count(count_mode, status_param=None, employee_environment_param=None, search_param=None):
+    """Total for a list page in the requested count mode, sharing count_cache with the sync handler.
+
+    Args:
+        count_mode ([str]): exact, estimate or cached
+        status_param ([str]): status filter
+        employee_environment_param ([str]): employee_environment filter
+        search_param ([str]): employee/manager name search
+
+    Returns:
+        [int]: Number of rows matching the filters.
+    """
+    if count_mode == COUNT_MODE_ESTIMATE:
+        return await estimate_user_status_rows(status_param, employee_environment_param, search_param)
+
+    key = (_filter_value(status_param), _filter_value(employee_environment_param), search_pattern(search_param))
+    if count_mode == COUNT_MODE_CACHED:
+        total_count = count_cache.get(key)
+        if total_count is not None:
+            return total_count
+
+    if key == (None, None, None):
+        total_count = await count_user_status_rows()
+    else:
+        total_count = await count_user_status_with_manager_rows(status_param, employee_environment_param, search_param)
+    if isinstance(total_count, int):
+        count_cache.set(key, total_count)
+    return total_count
+
+
+async def claim_idempotency_key(key, request_hash, ttl, lock_seconds):
+    """Async user_status_functions.claim_idempotency_key: claim an Idempotency-Key or read what it holds."""
+    params = {"key": key, "request_hash": request_hash, "ttl": ttl, "lock_seconds": lock_seconds}
+    async with async_db_pool.connection() as connection:
+        async with connection.cursor() as cursor:
+            await _execute(cursor, "CLAIM_IDEMPOTENCY_KEY", CLAIM_IDEMPOTENCY_KEY, params)
+            if await cursor.fetchone() is not None:
+                return None
+            await _execute(cursor, "GET_IDEMPOTENCY_KEY", GET_IDEMPOTENCY_KEY, params)
+            stored = await cursor.fetchone()
+    if stored is None:
+        return request_hash, None, None, None, None, None
+    request_hash, status_code, mimetype, charset, headers, body = stored
+    return bytes(request_hash), status_code, mimetype, charset, headers, bytes(body) if body is not None else None
+
+
+async def save_idempotency_response(key, request_hash, status_code, mimetype, charset, headers, body):
+    """Async user_status_functions.save_idempotency_response."""
+    params = {
+        "key": key,
+        "request_hash": request_hash,
+        "status_code": status_code,
+        "mimetype": mimetype,
+        "charset": charset,
+        "headers": headers,
+        "body": body,
+    }
+    async with async_db_pool.connection() as connection:
+        async with connection.cursor() as cursor:
+            await _execute(cursor, "SAVE_IDEMPOTENCY_RESPONSE", SAVE_IDEMPOTENCY_RESPONSE, params)
+
+
+async def release_idempotency_key(key, request_hash):
+    """Async user_status_functions.release_idempotency_key."""
+    async with async_db_pool.connection() as connection:
+        async with connection.cursor() as cursor:
+            await _execute(
+                cursor, "RELEASE_IDEMPOTENCY_KEY", RELEASE_IDEMPOTENCY_KEY, {"key": key, "request_hash": request_hash}
+            )
+
+
+async def prune_idempotency_keys(limit):
+    """Async user_status_functions.prune_idempotency_keys."""
+    async with async_db_pool.connection() as connection:
+        async with connection.cursor() as cursor:
+            await _execute(cursor, "PRUNE_IDEMPOTENCY_KEYS", PRUNE_IDEMPOTENCY_KEYS, {"limit": limit})
+            return cursor.rowcount
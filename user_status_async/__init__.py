@@ -0,0 +1,2 @@
+# async def main on psycopg (3): same API as user_status, served at user-status-async/
+from user_status.async_handler import main  # noqa: F401